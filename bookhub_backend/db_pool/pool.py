@@ -0,0 +1,191 @@
+"""
+数据库连接池
+
+每个进程、每个数据库别名一个池，最多保持 size 个空闲连接。取连接时：
+
+- 池里有空闲连接：超过 recycle 秒的直接关闭重建，空闲超过 ping_after 秒的先 ping 一次，失败则重建；
+- 池空且已借出的连接数未达 size：新建连接；
+- 已借出 size 个：最多等待 timeout 秒，仍没有连接归还时新建一个临时连接（溢出连接），
+  归还时直接关闭，不进池。
+
+归还时先回滚未提交的事务，回滚失败的连接直接丢弃。fork 出的子进程不会复用、回滚或关闭父进程的连接
+（子进程与父进程共用同一个套接字，在上面发 ROLLBACK 或断开会打乱其他进程的会话）。
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger('bookhub.db_pool')
+
+
+class PooledConnection:
+    """池中连接的包装，记录创建时间和最近归还时间"""
+    __slots__ = ('raw', 'created_at', 'released_at', 'overflow')
+
+    def __init__(self, raw, overflow=False):
+        self.raw = raw
+        self.created_at = self.released_at = time.monotonic()
+        self.overflow = overflow
+
+
+class ConnectionPool:
+    """有上限的连接池，connect 为新建原始连接的函数"""
+
+    def __init__(self, connect, size=10, timeout=1.0, recycle=3600, ping_after=30):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self._idle = deque()
+        self._checked_out = {}
+        self._condition = threading.Condition()
+        self._pid = os.getpid()
+        self._inherited = []
+        self.created = self.reused = self.overflowed = self.discarded = 0
+
+    def _check_fork(self):
+        # 子进程丢弃从父进程继承的连接（不能关闭，父进程还在用）；
+        # 保留引用，免得连接对象被回收时自行断开
+        if self._pid != os.getpid():
+            self._inherited.extend(pooled.raw for pooled in self._idle)
+            self._inherited.extend(pooled.raw for pooled in self._checked_out.values() if pooled is not None)
+            self._idle.clear()
+            self._checked_out.clear()
+            self._pid = os.getpid()
+
+    def _healthy(self, pooled):
+        now = time.monotonic()
+        if self.recycle is not None and now - pooled.created_at > self.recycle:
+            return False
+        if self.ping_after is not None and now - pooled.released_at > self.ping_after:
+            try:
+                pooled.raw.ping()
+            except Exception:
+                return False
+        return True
+
+    def _close(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """借出一个原始连接"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            pooled = slot = None
+            with self._condition:
+                self._check_fork()
+                while not self._idle and len(self._checked_out) >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if self._idle:
+                    pooled = self._idle.pop()
+                    self._checked_out[id(pooled.raw)] = pooled
+                elif len(self._checked_out) < self.size:
+                    # 先占位，在锁外建立连接
+                    slot = object()
+                    self._checked_out[id(slot)] = None
+
+            if pooled is None:
+                return self._open(slot)
+            # 健康检查可能要访问数据库，放在锁外
+            if self._healthy(pooled):
+                with self._condition:
+                    self.reused += 1
+                return pooled.raw
+            with self._condition:
+                del self._checked_out[id(pooled.raw)]
+                self.discarded += 1
+            self._close(pooled.raw)
+
+    def _open(self, slot):
+        """新建连接，slot 为 None 时是溢出连接"""
+        overflow = slot is None
+        try:
+            raw = self.connect()
+        except Exception:
+            if not overflow:
+                with self._condition:
+                    del self._checked_out[id(slot)]
+                    self._condition.notify()
+            raise
+        with self._condition:
+            if not overflow:
+                del self._checked_out[id(slot)]
+            self._checked_out[id(raw)] = PooledConnection(raw, overflow=overflow)
+            if overflow:
+                self.overflowed += 1
+            else:
+                self.created += 1
+        if overflow:
+            logger.warning('数据库连接池已满（%d），使用临时连接', self.size)
+        return raw
+
+    def release(self, raw):
+        """归还原始连接"""
+        with self._condition:
+            self._check_fork()
+            pooled = self._checked_out.pop(id(raw), None)
+        if pooled is None:
+            # fork 之前借出的连接，已在 _check_fork 中丢弃
+            return
+        if pooled.overflow:
+            self._close(raw)
+            return
+        try:
+            raw.rollback()
+        except Exception:
+            with self._condition:
+                self.discarded += 1
+                self._condition.notify()
+            self._close(raw)
+            return
+        pooled.released_at = time.monotonic()
+        with self._condition:
+            self._idle.append(pooled)
+            self._condition.notify()
+
+    def close_all(self):
+        """关闭全部空闲连接"""
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+        for pooled in idle:
+            self._close(pooled.raw)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'size': self.size,
+                'idle': len(self._idle),
+                'checkedOut': len(self._checked_out),
+                'created': self.created,
+                'reused': self.reused,
+                'overflowed': self.overflowed,
+                'discarded': self.discarded,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, connect, options):
+    """返回别名对应的连接池，不存在时按 options（DATABASES 中的 POOL 配置）创建"""
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = ConnectionPool(
+                connect,
+                size=options.get('SIZE', 10),
+                timeout=options.get('TIMEOUT', 1.0),
+                recycle=options.get('RECYCLE', 3600),
+                ping_after=options.get('PING_AFTER', 30),
+            )
+        return pool
@@ -0,0 +1,136 @@
+"""
+读写分离
+
+ReplicaMiddleware 为 GET / HEAD / OPTIONS 请求开启副本读：请求内的读查询由 ReplicaRouter
+随机分到 REPLICA_DATABASES 中的副本，写查询始终走主库。以下情况读查询仍走主库，保证读到自己的写入：
+
+- 非安全方法的请求，以及请求之外的代码（管理命令、后台刷写线程、流式响应在视图返回后的分块查询等）；
+- 同一请求内发生过写操作之后（例如读接口先把阅读进度缓冲刷入数据库再查询）；
+- 同一客户端（按 Authorization 头或会话 Cookie 识别）发出非安全方法请求或写入数据库后的
+  REPLICA_PIN_SECONDS 秒内（写后缓冲的上报不会立即写库，所以按请求方法判断），
+  标记记在 Django 缓存里，多进程部署时需要共享缓存；
+- Token 表：刚登录拿到的 token 可能还没同步到副本，认证查询本身又有缓存，直接读主库；
+- use_primary() 块内：结果要写入共享缓存的查询（响应缓存、书单缓存未命中时的重建）。
+  写入信号在提交后立即让缓存失效，此时副本可能还没同步，从副本重建会把旧数据按新版本号
+  缓存整个 TTL，所有客户端都会读到旧数据，而不只是复制延迟那么久。
+"""
+import hashlib
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+PRIMARY = 'default'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY_ONLY_MODELS = {'authtoken.token'}
+
+
+class RoutingState:
+    """当前请求的读写分离状态"""
+
+    def __init__(self, use_replicas):
+        self.use_replicas = use_replicas
+        self.wrote = False
+
+
+_state = ContextVar('bookhub_db_routing', default=None)
+
+
+@contextmanager
+def use_primary():
+    """块内的读查询走主库"""
+    state = _state.get()
+    if state is None or not state.use_replicas:
+        yield
+        return
+    state.use_replicas = False
+    try:
+        yield
+    finally:
+        state.use_replicas = True
+
+
+class ReplicaRouter:
+    """读查询分到副本，写查询走主库"""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        replicas = settings.REPLICA_DATABASES
+        if state is None or not state.use_replicas or state.wrote or not replicas:
+            return PRIMARY
+        if model._meta.label_lower in PRIMARY_ONLY_MODELS:
+            return PRIMARY
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本的数据由主库复制而来
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
+
+
+def client_key(request):
+    """识别客户端的缓存键，无法识别时返回 None"""
+    identity = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not identity:
+        return None
+    return f'db:pin:{hashlib.sha1(identity.encode()).hexdigest()}'
+
+
+class ReplicaMiddleware:
+    """为安全方法的请求开启副本读，写入后在短时间内把该客户端固定到主库"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _begin(self, request):
+        key = client_key(request)
+        use_replicas = (
+            bool(settings.REPLICA_DATABASES)
+            and request.method in SAFE_METHODS
+            and not (key and cache.get(key))
+        )
+        return key, RoutingState(use_replicas)
+
+    def _finish(self, request, key, state):
+        if key and (state.wrote or request.method not in SAFE_METHODS):
+            cache.set(key, True, settings.REPLICA_PIN_SECONDS)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        key, state = self._begin(request)
+        token = _state.set(state)
+        try:
+            return self.get_response(request)
+        finally:
+            _state.reset(token)
+            self._finish(request, key, state)
+
+    async def __acall__(self, request):
+        key, state = self._begin(request)
+        token = _state.set(state)
+        try:
+            return await self.get_response(request)
+        finally:
+            _state.reset(token)
+            self._finish(request, key, state)
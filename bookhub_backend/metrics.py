@@ -0,0 +1,256 @@
+"""
+请求性能指标
+
+MetricsMiddleware 对每个请求记录：SQL 条数、SQL 耗时、视图内 Python 耗时（视图总耗时减去 SQL 耗时，
+即 ORM 组装对象与序列化的时间）、响应渲染耗时和总耗时，按路由（URL 名称）写入进程内直方图，
+由 metrics_view 以 Prometheus 文本格式输出（仅管理员可访问，统计范围为当前进程）。
+
+PERFORMANCE_BUDGETS 配置每个路由的 SQL 条数和延迟上限，超出时记录警告日志并附上本次请求执行的 SQL。
+流式响应在中间件返回之后才查询数据库，这部分 SQL 不计入。
+
+SQL 通过常驻在每个数据库连接上的 execute_wrapper 统计，当前请求经 ContextVar 传递：
+异步视图的 ORM 调用在线程池中用的是另一组连接对象，但 ContextVar 会随 sync_to_async 传过去。
+"""
+import bisect
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+
+logger = logging.getLogger('bookhub.performance')
+
+# 超预算日志中最多附带的 SQL 条数
+MAX_LOGGED_QUERIES = 50
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    """带标签的累积直方图"""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count) in self._series.items())
+        for labels, (counts, total, count) in series:
+            label_text = ','.join(f'{key}="{_escape(value)}"' for key, value in labels)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+            lines.append(f'{self.name}_count{{{label_text}}} {count}')
+        return '\n'.join(lines)
+
+
+REQUEST_DURATION = Histogram('bookhub_request_duration_seconds', '请求总耗时', LATENCY_BUCKETS)
+DB_QUERIES = Histogram('bookhub_request_db_queries', '每个请求执行的 SQL 条数', QUERY_BUCKETS)
+DB_DURATION = Histogram('bookhub_request_db_duration_seconds', '每个请求的 SQL 耗时', LATENCY_BUCKETS)
+VIEW_PYTHON_DURATION = Histogram(
+    'bookhub_request_view_python_seconds', '视图内除 SQL 外的耗时（ORM 组装对象与序列化）', LATENCY_BUCKETS
+)
+RENDER_DURATION = Histogram('bookhub_request_render_duration_seconds', '响应渲染耗时', LATENCY_BUCKETS)
+HISTOGRAMS = [REQUEST_DURATION, DB_QUERIES, DB_DURATION, VIEW_PYTHON_DURATION, RENDER_DURATION]
+
+
+def render_metrics():
+    return '\n'.join(histogram.render() for histogram in HISTOGRAMS) + '\n'
+
+
+def clear_metrics():
+    for histogram in HISTOGRAMS:
+        histogram.clear()
+
+
+def get_budget(method, route):
+    """
+    返回请求的预算 {'queries': n, 'latency_ms': n}，
+    依次查找 '<方法> <路由>'、'<路由>'，都未配置时使用 '*'
+    """
+    budgets = getattr(settings, 'PERFORMANCE_BUDGETS', {})
+    for key in (f'{method} {route}', route, '*'):
+        if key in budgets:
+            return budgets[key]
+    return {}
+
+
+class RequestMetrics:
+    """单个请求的计时与 SQL 记录"""
+
+    def __init__(self):
+        self.queries = []
+        self.db_time = 0.0
+        self.view_start = self.view_end = self.render_end = None
+        self.view_db_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.db_time += elapsed
+            self.queries.append((sql, elapsed))
+
+    def start_view(self):
+        self.view_start = time.perf_counter()
+        self.view_db_time = self.db_time
+
+    def end_view(self):
+        self.view_end = time.perf_counter()
+        self.view_db_time = self.db_time - self.view_db_time
+
+    def end_render(self, response):
+        self.render_end = time.perf_counter()
+
+
+_current_metrics = ContextVar('bookhub_request_metrics', default=None)
+
+
+def _dispatch(execute, sql, params, many, context):
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def _install(connection):
+    if _dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_dispatch)
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    """新建的数据库连接上挂载 SQL 统计"""
+    _install(connection)
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+class MetricsMiddleware:
+    """记录每个请求的 SQL 条数与各阶段耗时，检查性能预算"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        metrics = request._metrics = RequestMetrics()
+        for connection in connections.all():
+            _install(connection)
+        token = _current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        self._record(request, response, metrics, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        metrics = request._metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        self._record(request, response, metrics, time.perf_counter() - start)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics.start_view()
+
+    def process_template_response(self, request, response):
+        # DRF 的 Response 在这之后才渲染
+        request._metrics.end_view()
+        response.add_post_render_callback(request._metrics.end_render)
+        return response
+
+    def _record(self, request, response, metrics, duration):
+        route = _route(request)
+        labels = (('method', request.method), ('route', route))
+        if metrics.view_start is not None and metrics.view_end is None:
+            # 非模板响应（如 HttpResponse）没有渲染阶段，视图耗时算到返回为止
+            metrics.end_view()
+        if metrics.view_start is not None:
+            view_python = metrics.view_end - metrics.view_start - metrics.view_db_time
+            VIEW_PYTHON_DURATION.observe(labels, max(view_python, 0.0))
+        if metrics.render_end is not None:
+            RENDER_DURATION.observe(labels, metrics.render_end - metrics.view_end)
+        REQUEST_DURATION.observe(labels, duration)
+        DB_QUERIES.observe(labels, len(metrics.queries))
+        DB_DURATION.observe(labels, metrics.db_time)
+        self._check_budget(request, response, route, metrics, duration)
+
+    def _check_budget(self, request, response, route, metrics, duration):
+        budget = get_budget(request.method, route)
+        max_queries = budget.get('queries')
+        max_latency = budget.get('latency_ms')
+        over_queries = max_queries is not None and len(metrics.queries) > max_queries
+        over_latency = max_latency is not None and duration * 1000 > max_latency
+        if not (over_queries or over_latency):
+            return
+        statements = '\n'.join(
+            f'  [{elapsed * 1000:.2f}ms] {sql}' for sql, elapsed in metrics.queries[:MAX_LOGGED_QUERIES]
+        )
+        logger.warning(
+            '请求超出性能预算: %s %s (路由 %s, 状态 %s) SQL %d 条 / 预算 %s, 耗时 %.1fms / 预算 %s, SQL 耗时 %.1fms\n%s',
+            request.method, request.get_full_path(), route, response.status_code,
+            len(metrics.queries), max_queries, duration * 1000, max_latency,
+            metrics.db_time * 1000, statements,
+        )
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    """Prometheus 文本格式的请求指标（本进程）"""
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
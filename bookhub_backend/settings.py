@@ -2,6 +2,7 @@
 Django settings for bookhub_backend project.
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -37,6 +38,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'bookhub_backend.metrics.MetricsMiddleware',  # 请求性能指标，放在最外层以统计总耗时
+    'bookhub_backend.db_router.ReplicaMiddleware',  # 安全方法的请求读副本
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS中间件
@@ -69,20 +72,54 @@ WSGI_APPLICATION = 'bookhub_backend.wsgi.application'
 
 
 # Database
+# 连接参数可由环境变量覆盖；DB_POOL_SIZE > 0 时使用带连接池的 MySQL 后端（每个进程每个数据库一个池），
+# 设为 0 时改用 Django 的持久连接（CONN_MAX_AGE 秒）
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'bookhub',        # 数据库名称
-        'USER': 'root',          # 数据库用户名
-        'PASSWORD': 'Lzf@20051023',    # 数据库密码
-        'HOST': '127.0.0.1',
-        'PORT': 3306,
+        'ENGINE': 'bookhub_backend.db_pool' if DB_POOL_SIZE > 0 else 'django.db.backends.mysql',
+        'NAME': os.environ.get('DB_NAME', 'bookhub'),        # 数据库名称
+        'USER': os.environ.get('DB_USER', 'root'),          # 数据库用户名
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'Lzf@20051023'),    # 数据库密码
+        'HOST': os.environ.get('DB_HOST', '127.0.0.1'),
+        'PORT': int(os.environ.get('DB_PORT', 3306)),
         'OPTIONS': {
             'charset': 'utf8mb4',
-        }
+        },
+        # 使用连接池时每个请求结束即把连接归还池中
+        'CONN_MAX_AGE': 0 if DB_POOL_SIZE > 0 else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            'SIZE': DB_POOL_SIZE,
+            # 池满时等待归还的秒数，超时后新建不进池的临时连接
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 1)),
+            # 连接最长使用时间（秒），应小于 MySQL 的 wait_timeout
+            'RECYCLE': int(os.environ.get('DB_POOL_RECYCLE', 3600)),
+            # 空闲超过该秒数的连接借出前先 ping
+            'PING_AFTER': int(os.environ.get('DB_POOL_PING_AFTER', 30)),
+        },
     }
 }
 
+# 只读副本：DATABASE_REPLICAS 为逗号分隔的 host[:port]，其余连接参数与主库相同
+REPLICA_DATABASES = []
+for index, address in enumerate(filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')), start=1):
+    host, _, port = address.strip().partition(':')
+    alias = f'replica{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': int(port or DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['bookhub_backend.db_router.ReplicaRouter']
+
+# 客户端写入后读主库的时长（秒），需大于副本的复制延迟
+REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -128,7 +165,7 @@ CORS_ALLOW_CREDENTIALS = True
 # REST Framework配置
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
@@ -136,3 +173,64 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 }
+
+# 写后缓冲配置（秒）
+COMMENT_VOTE_FLUSH_INTERVAL = 2
+
+# 阅读进度上报先写入内存缓冲，同一用户同一本书只保留最新进度，定期批量落库
+READING_PROGRESS_WRITE_BEHIND = True
+READING_PROGRESS_FLUSH_INTERVAL = 5
+
+# 独立读者数：阅读进度、加入书架记下的读者先在内存中并入 HyperLogLog 草图，后台线程定期写回数据库（秒）
+READERS_FLUSH_INTERVAL = 5
+
+# 书籍热度：用户行为的权重、热度分值的半衰期（小时），以及后台写回间隔（秒）
+HEAT_WEIGHTS = {'view': 1, 'shelf': 5, 'progress': 0.2, 'comment': 10}
+HEAT_HALF_LIFE_HOURS = 168
+HEAT_FLUSH_INTERVAL = 10
+
+# 自动补全索引：各进程检查版本号的间隔与索引最长使用时间（秒）
+SUGGEST_CHECK_INTERVAL = 5
+SUGGEST_MAX_AGE = 600
+
+# 推荐/热门书单缓存（秒）：超过 FEED_CACHE_TTL 后在 FEED_STALE_TTL 内先返回旧数据再刷新
+FEED_CACHE_TTL = 300
+FEED_STALE_TTL = 3600
+
+# Token 认证缓存：进程内 LRU 的容量与过期时间（秒），以及是否启用共享缓存作为二级缓存
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 60
+TOKEN_CACHE_SHARED = False
+TOKEN_CACHE_SHARED_TTL = 300
+
+# 缓存：默认为进程内存缓存（单机部署）；多实例部署时设置 REDIS_URL 使用共享的 Redis 缓存（需安装 redis）
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'bookhub',
+        }
+    }
+
+# 书籍详情、分类接口的响应缓存时间（秒），数据变化时按版本号立即失效
+RESPONSE_CACHE_TTL = 600
+
+# 性能预算：按 '<方法> <URL 名称>' 或 URL 名称配置每个请求的 SQL 条数与延迟（毫秒）上限，
+# '*' 为默认值，超出时记录警告日志及 SQL
+PERFORMANCE_BUDGETS = {
+    '*': {'queries': 30, 'latency_ms': 1000},
+    'GET book-list': {'queries': 5, 'latency_ms': 300},
+    'GET book-detail': {'queries': 5, 'latency_ms': 200},
+    'GET book-recommended': {'queries': 10, 'latency_ms': 200},
+    'GET book-similar': {'queries': 5, 'latency_ms': 200},
+    'GET book-suggest': {'queries': 1, 'latency_ms': 50},
+    'GET comment-list': {'queries': 5, 'latency_ms': 300},
+}
@@ -5,11 +5,13 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('books.urls')),
     path('api/', include('users.urls')),
+    path('api/metrics', metrics_view, name='metrics'),
 ]
 
 # 开发环境下提供媒体文件访问
@@ -14,3 +14,15 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bookhub_backend.settings')
 
 application = get_wsgi_application()
+
+# 只在 Web 服务进程中由后台线程写回书籍热度、评论投票计数、阅读进度和独立读者，并在启动时构建自动补全索引
+from django.db import connection  # noqa: E402
+from books import counters, heat, progress, readers, suggest  # noqa: E402
+
+heat.enable_background_flush()
+counters.enable_background_flush()
+progress.enable_background_flush()
+readers.enable_background_flush()
+suggest.warm_up()
+# 预加载（如 gunicorn --preload）时 fork 出的工作进程不应继承主进程的数据库连接
+connection.close()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Book, Category, Comment, BookShelf, ReadingProgress
+from .models import Book, Category, Comment, CommentVote, BookShelf, ReadingProgress
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -8,7 +8,7 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Book)
 class BookAdmin(admin.ModelAdmin):
-    list_display = ['title', 'author', 'rating', 'genre', 'is_premium', 'heat']
+    list_display = ['title', 'author', 'rating', 'genre', 'is_premium', 'heat', 'readers']
     list_filter = ['is_premium', 'genre']
     search_fields = ['title', 'author']
     filter_horizontal = ['categories']
@@ -19,6 +19,12 @@ class CommentAdmin(admin.ModelAdmin):
     list_filter = ['created_at']
     search_fields = ['user__username', 'book__title', 'content']
 
+@admin.register(CommentVote)
+class CommentVoteAdmin(admin.ModelAdmin):
+    list_display = ['user', 'comment', 'value', 'created_at']
+    list_filter = ['value', 'created_at']
+    search_fields = ['user__username']
+
 @admin.register(BookShelf)
 class BookShelfAdmin(admin.ModelAdmin):
     list_display = ['user', 'book', 'added_at']
@@ -0,0 +1,92 @@
+"""
+书籍评分聚合维护
+
+Book.rating_sum / Book.reviews 是评分的累计和与条数，随评论的新增、修改、删除增量更新，
+Book.rating 由二者算出，列表页排序时无需实时 AVG/COUNT。
+累计值包含站外部分（rating_sum_base / reviews_base，来自初始数据和导入），
+reconcile_ratings 按块从评论表重新统计评论部分，加上站外部分后修复累计值的漂移。
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast, Now, Round
+
+from . import response_cache
+from .models import Book, Comment
+
+
+def average_rating():
+    """由累计和与条数计算平均分的表达式"""
+    return Case(
+        When(reviews__gt=0, then=Round(Cast('rating_sum', FloatField()) / F('reviews'), 1)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def apply_rating_change(book_id, rating_delta, count_delta):
+    """对一本书的评分累计和与评价数做增量更新，并刷新平均分"""
+    if not rating_delta and not count_delta:
+        return
+    books = Book.objects.filter(pk=book_id)
+    with transaction.atomic():
+        # 分两条语句执行：MySQL 单条 UPDATE 中后面的赋值会读到前面已更新的值，与其他数据库不一致
+        books.update(rating_sum=F('rating_sum') + rating_delta, reviews=F('reviews') + count_delta)
+        books.update(rating=average_rating(), updated_at=Now())
+
+
+def comment_saved(comment, previous=None):
+    """评论新增或修改后更新聚合，previous 为修改前的 (book_id, rating)"""
+    if previous is None:
+        apply_rating_change(comment.book_id, comment.rating, 1)
+        return
+    previous_book_id, previous_rating = previous
+    if previous_book_id != comment.book_id:
+        apply_rating_change(previous_book_id, -previous_rating, -1)
+        apply_rating_change(comment.book_id, comment.rating, 1)
+    else:
+        apply_rating_change(comment.book_id, comment.rating - previous_rating, 0)
+
+
+def comment_deleted(comment):
+    """评论删除后更新聚合"""
+    apply_rating_change(comment.book_id, -comment.rating, -1)
+
+
+def reconcile_ratings(chunk_size=1000):
+    """按主键分块从评论表重新统计全部书籍的评分聚合（加上站外部分），返回 (检查数, 修复数)"""
+    checked = fixed = 0
+    last_pk = 0
+    while True:
+        books = list(
+            Book.objects.filter(pk__gt=last_pk).order_by('pk')
+            .only('pk', 'rating_sum', 'reviews', 'rating_sum_base', 'reviews_base')[:chunk_size]
+        )
+        if not books:
+            break
+        last_pk = books[-1].pk
+        checked += len(books)
+
+        totals = {
+            row['book_id']: (row['total'], row['count'])
+            for row in Comment.objects.filter(book_id__in=[book.pk for book in books])
+            .order_by().values('book_id').annotate(total=Sum('rating'), count=Count('id'))
+        }
+        drifted = []
+        for book in books:
+            total, count = totals.get(book.pk, (0, 0))
+            total, count = total + book.rating_sum_base, count + book.reviews_base
+            if (book.rating_sum, book.reviews) != (total, count):
+                book.rating_sum, book.reviews = total, count
+                drifted.append(book)
+        with transaction.atomic():
+            if drifted:
+                Book.objects.bulk_update(drifted, ['rating_sum', 'reviews'])
+            # 只更新确实变化的书籍，避免无谓地推后 updated_at（条件请求的校验值）
+            changed = {book.pk for book in drifted} | set(
+                Book.objects.filter(pk__in=[book.pk for book in books])
+                .exclude(rating=average_rating()).values_list('pk', flat=True)
+            )
+            Book.objects.filter(pk__in=changed).update(rating=average_rating(), updated_at=Now())
+        response_cache.invalidate_books(changed)
+        fixed += len(drifted)
+    return checked, fixed
@@ -0,0 +1,159 @@
+"""
+异步（ASGI 原生）只读书籍接口
+
+与 BookViewSet / CommentViewSet 的列表、详情、推荐、热门接口返回相同的数据，
+但视图本身是协程，数据库访问走 Django 异步 ORM，在 ASGI 下不占用线程池，
+单个 worker 可以同时挂住大量慢客户端连接。挂载在 /api/async/ 下。
+推荐接口同样按 Token 认证，登录用户的个性化推荐在线程中执行。
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from users.authentication import CachedTokenAuthentication
+
+from . import feeds, heat, recommend
+from .fastpath import compile_serializer, serialize
+from .models import Book, Comment
+from .queries import filter_books, parse_is_premium, plan_queryset
+from .search import search_books
+from .serializers import BookSerializer, CommentSerializer
+
+_renderer = JSONRenderer()
+
+
+def _json(data, status=200):
+    return HttpResponse(_renderer.render(data), status=status, content_type='application/json')
+
+
+def _not_found():
+    return _json({'detail': '未找到。'}, status=404)
+
+
+def _read_only(view):
+    """只允许 GET / HEAD 请求"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return _json({'detail': f'方法 “{request.method}” 不被允许。'}, status=405)
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def _book_queryset(params):
+    queryset = filter_books(
+        Book.objects.all(),
+        category=params.get('category', None),
+        is_premium=parse_is_premium(params.get('is_premium', None)),
+    )
+    search = params.get('search', None)
+    if search:
+        queryset = search_books(queryset, search)
+    return plan_queryset(queryset, BookSerializer)
+
+
+async def _paginate(request, queryset, serializer_class):
+    """与 PageNumberPagination 输出格式一致的异步分页"""
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 0
+    count = await queryset.acount()
+    pages = max(1, -(-count // page_size))
+    if page < 1 or page > pages:
+        return _json({'detail': '无效页面。'}, status=404)
+
+    offset = (page - 1) * page_size
+    rows = [row async for row in queryset[offset:offset + page_size]]
+    url = request.build_absolute_uri()
+    previous = None
+    if page > 1:
+        previous = remove_query_param(url, 'page') if page == 2 else replace_query_param(url, 'page', page - 1)
+    return _json({
+        'count': count,
+        'next': replace_query_param(url, 'page', page + 1) if page < pages else None,
+        'previous': previous,
+        'results': serialize(rows, serializer_class),
+    })
+
+
+@_read_only
+async def book_list(request):
+    """书籍列表"""
+    return await _paginate(request, _book_queryset(request.GET), BookSerializer)
+
+
+@_read_only
+async def book_detail(request, pk):
+    """书籍详情"""
+    try:
+        book = await plan_queryset(Book.objects.all(), BookSerializer).aget(pk=pk)
+    except Book.DoesNotExist:
+        return _not_found()
+    heat.record(book.pk, 'view')
+    return _json(compile_serializer(BookSerializer)(book))
+
+
+async def _feed(request, name):
+    params = request.GET
+    if params.get('search', None):
+        queryset = _book_queryset(params).order_by(*feeds.FEEDS[name])[:feeds.FEED_SIZE]
+        return _json(serialize([book async for book in queryset], BookSerializer))
+    data = await sync_to_async(feeds.get_feed)(
+        name,
+        category=params.get('category', None),
+        is_premium=parse_is_premium(params.get('is_premium', None)),
+    )
+    return _json(data)
+
+
+async def _authenticate(request):
+    """与 DRF 视图相同的 Token 认证，返回 (user, error)：未带 Token 时 user 为 None，Token 无效时 error 为 401 响应"""
+    authenticator = CachedTokenAuthentication()
+    try:
+        result = await sync_to_async(authenticator.authenticate)(request)
+    except AuthenticationFailed as exc:
+        response = _json({'detail': exc.detail}, status=401)
+        response['WWW-Authenticate'] = authenticator.authenticate_header(request)
+        return None, response
+    return (result[0] if result else None), None
+
+
+@_read_only
+async def book_recommended(request):
+    """推荐书籍（登录用户按阅读记录个性化）"""
+    params = request.GET
+    if not params.get('search', None):
+        user, error = await _authenticate(request)
+        if error is not None:
+            return error
+        if user is not None:
+            data = await sync_to_async(recommend.recommend)(
+                user,
+                category=params.get('category', None),
+                is_premium=parse_is_premium(params.get('is_premium', None)),
+            )
+            return _json(data)
+    return await _feed(request, 'recommended')
+
+
+@_read_only
+async def book_popular(request):
+    """热门书籍"""
+    return await _feed(request, 'popular')
+
+
+@_read_only
+async def comment_list(request):
+    """评论列表"""
+    queryset = Comment.objects.all()
+    book_id = request.GET.get('book_id', None)
+    if book_id:
+        queryset = queryset.filter(book_id=book_id)
+    return await _paginate(request, plan_queryset(queryset, CommentSerializer), CommentSerializer)
@@ -0,0 +1,159 @@
+"""
+写后缓冲（write-behind buffer）
+
+高频写入先在进程内存中按键合并，距离上次落库超过 interval 秒时再一次性批量写入数据库，
+进程退出时会做最后一次落库。落库失败的数据会放回缓冲区等待下次重试。
+也可以交给 BackgroundFlusher 在后台线程中定时落库。
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """按键合并的写后缓冲"""
+
+    def __init__(self, name, flush_func, merge, interval=1.0, group=None):
+        """
+        flush_func(items) 接收 {key: value} 并批量写入数据库；
+        merge(old, new) 决定同一个键的多次写入如何合并；
+        group(key) 给出键所属的分组（如用户），用于按分组读取尚未落库的数据。
+        """
+        self.name = name
+        self.flush_func = flush_func
+        self.merge = merge
+        self.interval = interval
+        self.group = group
+        self._pending = {}
+        self._groups = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        atexit.register(self.flush)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, key, value):
+        """写入缓冲区，返回该键合并后尚未落库的值"""
+        with self._lock:
+            if key in self._pending:
+                value = self.merge(self._pending[key], value)
+            self._pending[key] = value
+            self._index(key)
+            due = time.monotonic() - self._last_flush >= self.interval
+        if due:
+            self.flush()
+        return value
+
+    def get(self, key, default=None):
+        """读取某个键尚未落库的值"""
+        return self._pending.get(key, default)
+
+    def pending(self, group):
+        """某个分组尚未落库的数据 {key: value}，只访问该分组自己的键"""
+        with self._lock:
+            return {key: self._pending[key] for key in self._groups.get(group, ())}
+
+    def keys(self):
+        """尚未落库的键快照"""
+        with self._lock:
+            return list(self._pending)
+
+    def flush(self, keys=None):
+        """落库，keys 为空时落库全部数据，返回落库的键数量"""
+        with self._lock:
+            if keys is None:
+                items, self._pending = self._pending, {}
+                self._groups = {}
+                self._last_flush = time.monotonic()
+            else:
+                items = {key: self._pending.pop(key) for key in keys if key in self._pending}
+                for key in items:
+                    self._unindex(key)
+        if not items:
+            return 0
+
+        try:
+            self.flush_func(items)
+        except Exception:
+            logger.exception('写后缓冲 %s 落库失败，%d 条数据将在下次重试', self.name, len(items))
+            with self._lock:
+                for key, value in items.items():
+                    if key in self._pending:
+                        value = self.merge(value, self._pending[key])
+                    self._pending[key] = value
+                    self._index(key)
+            return 0
+        return len(items)
+
+    def clear(self):
+        """丢弃缓冲区中的数据"""
+        with self._lock:
+            self._pending = {}
+            self._groups = {}
+
+    def _index(self, key):
+        if self.group is not None:
+            self._groups.setdefault(self.group(key), set()).add(key)
+
+    def _unindex(self, key):
+        if self.group is not None:
+            group = self.group(key)
+            keys = self._groups.get(group)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._groups[group]
+
+
+class BackgroundFlusher:
+    """在后台守护线程中每隔 interval 秒落库一次缓冲，请求线程不再承担落库"""
+
+    def __init__(self, buffer, interval):
+        self.buffer = buffer
+        self.interval = interval
+        self.enabled = False
+        self._thread = None
+        self._stopping = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _running(self):
+        # fork 出的子进程里没有父进程的线程
+        return self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def ensure_started(self):
+        """已开启时确保本进程的后台线程在运行"""
+        if not self.enabled or self._running():
+            return
+        with self._lock:
+            if self._running():
+                return
+            self._stopping = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run, args=(self._stopping,), name=f'{self.buffer.name}-flush', daemon=True
+            )
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def stop(self):
+        """关闭后台落库并等待本进程的线程退出"""
+        with self._lock:
+            self.enabled = False
+            thread, self._thread = self._thread, None
+            if thread is not None and self._pid == os.getpid():
+                self._stopping.set()
+                thread.join()
+
+    def _run(self, stopping):
+        while not stopping.wait(self.interval):
+            try:
+                self.buffer.flush()
+            finally:
+                connection.close()
@@ -0,0 +1,129 @@
+"""
+HTTP 条件请求（ETag / Last-Modified）
+
+校验值由本次要返回的行算出：各行的主键、updated_at 以及视图额外声明的字段（如评论的点赞数），
+列表再加上分页信息（总数、有无下一页），以及请求本身（完整 URL、响应格式）。
+列表只用 values() 取本页各行的这几个字段，不对整个筛选结果做 MAX/COUNT 聚合；
+客户端带 If-None-Match / If-Modified-Since 且未变化时直接返回 304，
+只有需要返回内容时才按主键取出整行（含预加载）并序列化。
+Last-Modified 取各行 updated_at 的最大值，删除行不会推后它，两者同时带上时以 ETag 为准。
+
+会影响输出但不更新 updated_at 的变化（如用户改名影响评论里的 username）通过 bump_version
+递增缓存里的版本号，版本号同样计入 ETag。
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+def _version_key(name):
+    return f'conditional:version:{name}'
+
+
+def get_version(name):
+    return cache.get(_version_key(name), 0)
+
+
+def bump_version(name):
+    """让依赖 name 的全部 ETag 失效"""
+    try:
+        cache.incr(_version_key(name))
+    except ValueError:
+        cache.set(_version_key(name), 1, None)
+
+
+def row_value(row, name):
+    """取模型实例或 values() 字典中的字段值"""
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+def rows_state(rows, fields=()):
+    """返回一组已取出的行（模型实例或 values() 字典）的状态：最后修改时间，以及各行的主键、修改时间和额外字段"""
+    rows = [
+        (row_value(row, 'pk'), row_value(row, 'updated_at'), *(row_value(row, field) for field in fields))
+        for row in rows
+    ]
+    return {
+        'last_modified': max((row[1] for row in rows), default=None),
+        'rows': rows,
+    }
+
+
+def paging_state(paginator):
+    """分页信息（总数、有无下一页）同样影响列表输出"""
+    if getattr(paginator, 'use_keyset', False):
+        return {'next': paginator.next_position, 'count': paginator.total}
+    return {'count': paginator.page.paginator.count}
+
+
+def validators(request, states, versions=()):
+    """由若干集合状态计算 (etag, last_modified)"""
+    parts = [request.build_absolute_uri(), getattr(request, 'accepted_media_type', '')]
+    last_modified = None
+    for state in states:
+        parts.extend(f'{key}={value}' for key, value in sorted(state.items()))
+        value = state.get('last_modified')
+        if value is not None and (last_modified is None or value > last_modified):
+            last_modified = value
+    parts.extend(f'{name}={get_version(name)}' for name in versions)
+    etag = quote_etag(hashlib.md5('|'.join(map(str, parts)).encode()).hexdigest())
+    # HTTP 日期精确到秒
+    return etag, last_modified and int(last_modified.timestamp())
+
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ConditionalMixin:
+    """列表与详情接口支持 ETag / Last-Modified（与 FastReadMixin 一起使用）"""
+    # 额外计入校验值的字段，如不更新 updated_at 的 ('likes', 'dislikes')
+    conditional_fields = ()
+    # 额外计入 ETag 的版本号名称
+    conditional_versions = ()
+
+    def get_conditional_states(self, rows):
+        return [rows_state(rows, self.conditional_fields)]
+
+    def _conditional(self, request, states, respond):
+        etag, last_modified = validators(request, states, self.conditional_versions)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = respond()
+        return _set_validators(response, etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        # 校验值只需要本页各行的少数字段；键集分页还要取排序字段来生成游标
+        keyset = [field.lstrip('-') for field in getattr(self.paginator, 'keyset_ordering', ())]
+        keys = queryset.prefetch_related(None).values('pk', 'updated_at', *self.conditional_fields, *keyset)
+        page = self.paginate_queryset(keys)
+        if page is None:
+            rows = list(keys)
+            return self._conditional(
+                request, self.get_conditional_states(rows),
+                lambda: Response(self.serialize_rows(self._fetch_rows(queryset, rows)))
+            )
+        states = self.get_conditional_states(page) + [paging_state(self.paginator)]
+        return self._conditional(
+            request, states,
+            lambda: self.get_paginated_response(self.serialize_rows(self._fetch_rows(queryset, page)))
+        )
+
+    def _fetch_rows(self, queryset, keys):
+        """按 values() 取出的主键顺序取整行"""
+        pks = [row['pk'] for row in keys]
+        instances = {instance.pk: instance for instance in queryset.filter(pk__in=pks)}
+        return [instances[pk] for pk in pks if pk in instances]
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        return self._conditional(
+            request, self.get_conditional_states([instance]), lambda: Response(self.serialize_instance(instance))
+        )
@@ -0,0 +1,77 @@
+"""
+评论点赞/点踩计数
+
+投票记录（CommentVote）同步写入，依靠唯一约束保证每个用户对每条评论只能投一次；
+计数增量进入写后缓冲，按评论合并后用 F() 表达式批量原子更新，
+热门评论上的并发投票不会争抢同一行锁，也不会改动 updated_at。
+
+缓冲区在每个进程各自的内存中：尚未落库的增量只有本进程可见，其他进程和列表接口
+最多滞后一个落库间隔。Web 服务进程中由后台线程每 COMMENT_VOTE_FLUSH_INTERVAL 秒落库一次，
+空闲的进程也不会一直持有增量；进程被强制结束（如 SIGKILL）时仍会丢失最后一个间隔内的计数。
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Value, When
+
+from .buffers import BackgroundFlusher, WriteBehindBuffer
+from .models import Comment, CommentVote
+
+# 每条 UPDATE 语句最多包含的评论数量
+FLUSH_BATCH_SIZE = 500
+
+VOTE_FIELDS = {
+    CommentVote.LIKE: 'likes',
+    CommentVote.DISLIKE: 'dislikes',
+}
+
+
+def flush_vote_counts(items):
+    """批量写入计数增量，items 为 {(comment_id, 字段名): 增量}"""
+    deltas = defaultdict(dict)
+    for (comment_id, field), delta in items.items():
+        deltas[field][comment_id] = delta
+
+    with transaction.atomic():
+        for field, by_comment in deltas.items():
+            comment_ids = list(by_comment)
+            for start in range(0, len(comment_ids), FLUSH_BATCH_SIZE):
+                batch = comment_ids[start:start + FLUSH_BATCH_SIZE]
+                increment = Case(
+                    *[When(pk=pk, then=Value(by_comment[pk])) for pk in batch],
+                    default=Value(0),
+                )
+                Comment.objects.filter(pk__in=batch).update(**{field: F(field) + increment})
+
+
+comment_votes = WriteBehindBuffer(
+    'comment_votes',
+    flush_vote_counts,
+    merge=lambda old, new: old + new,
+    interval=settings.COMMENT_VOTE_FLUSH_INTERVAL,
+)
+
+comment_votes_flusher = BackgroundFlusher(comment_votes, interval=settings.COMMENT_VOTE_FLUSH_INTERVAL)
+
+
+def enable_background_flush():
+    """在 Web 服务进程中开启后台落库（线程在本进程第一次投票时启动）"""
+    comment_votes_flusher.enabled = True
+
+
+def vote_comment(comment, user, value):
+    """
+    记录用户对评论的一次投票，返回投票后的计数；
+    用户已经投过票时返回 None。
+    """
+    try:
+        with transaction.atomic():
+            CommentVote.objects.create(comment=comment, user=user, value=value)
+    except IntegrityError:
+        return None
+
+    field = VOTE_FIELDS[value]
+    pending = comment_votes.add((comment.pk, field), 1)
+    comment_votes_flusher.ensure_started()
+    return getattr(comment, field) + pending
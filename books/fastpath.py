@@ -0,0 +1,126 @@
+"""
+只读序列化快速路径
+
+DRF 序列化器每个对象都要走一遍字段对象的 get_attribute / to_representation，
+列表接口 CPU 主要耗在这里。这里按序列化器类把字段预编译成 (字段名, 取值函数, 转换函数) 列表，
+输出的 dict 与序列化器的 .data 完全一致（渲染后的 JSON 字节相同），
+不认识的字段类型退回到字段自身的 to_representation。
+"""
+from functools import lru_cache
+from operator import attrgetter
+
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+
+
+def _string(value):
+    return str(value)
+
+
+def _date(value):
+    if not value:
+        return None
+    if isinstance(value, str):
+        return value
+    return value.isoformat()
+
+
+def _datetime(value):
+    if not value:
+        return None
+    if isinstance(value, str):
+        return value
+    # 与 DateTimeField.enforce_timezone 一致：转换到当前时区
+    if timezone.is_aware(value):
+        value = value.astimezone(timezone.get_current_timezone())
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _converter(field):
+    """返回字段的快速转换函数（None 表示原样输出），无法等价转换时返回 field.to_representation"""
+    if isinstance(field, serializers.ListSerializer):
+        child = compile_serializer(type(field.child))
+        return lambda manager: [child(item) for item in manager.all()]
+    if isinstance(field, serializers.BaseSerializer):
+        return compile_serializer(type(field))
+    if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+        return None
+    if type(field) is serializers.DateTimeField:
+        if getattr(field, 'format', api_settings.DATETIME_FORMAT) == ISO_8601 and not hasattr(field, 'timezone'):
+            return _datetime
+    elif type(field) is serializers.DateField:
+        if getattr(field, 'format', api_settings.DATE_FORMAT) == ISO_8601:
+            return _date
+    elif isinstance(field, serializers.CharField):
+        return _string
+    elif isinstance(field, serializers.BooleanField):
+        return bool
+    elif type(field) is serializers.IntegerField:
+        return int
+    elif type(field) is serializers.FloatField:
+        return float
+    return field.to_representation
+
+
+def _getter(field, model):
+    """返回字段的取值函数"""
+    if field.source == '*':
+        return lambda instance: instance
+    if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None and len(field.source_attrs) == 1:
+        # 外键直接取 <name>_id，不加载关联对象
+        return attrgetter(model._meta.get_field(field.source).attname)
+    return attrgetter(field.source)
+
+
+@lru_cache(maxsize=None)
+def compile_serializer(serializer_class):
+    """把序列化器类编译成 instance -> dict 的函数"""
+    model = serializer_class.Meta.model
+    steps = []
+    for name, field in serializer_class().fields.items():
+        if field.write_only:
+            continue
+        steps.append((name, _getter(field, model), _converter(field)))
+
+    def serialize(instance):
+        data = {}
+        for name, getter, converter in steps:
+            value = getter(instance)
+            if value is None or converter is None:
+                data[name] = value
+            else:
+                data[name] = converter(value)
+        return data
+
+    return serialize
+
+
+def serialize(instances, serializer_class):
+    """序列化对象列表"""
+    serialize_one = compile_serializer(serializer_class)
+    return [serialize_one(instance) for instance in instances]
+
+
+class FastReadMixin:
+    """列表与详情接口使用快速序列化（写操作仍走序列化器）"""
+
+    def serialize_rows(self, rows):
+        return serialize(rows, self.get_serializer_class())
+
+    def serialize_instance(self, instance):
+        return compile_serializer(self.get_serializer_class())(instance)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.serialize_rows(page))
+        return Response(self.serialize_rows(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(self.serialize_instance(self.get_object()))
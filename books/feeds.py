@@ -0,0 +1,115 @@
+"""
+推荐/热门书单缓存
+
+按 (书单, 分类, 是否会员专享) 预先计算前 N 本书的序列化结果并放入缓存，
+命中时直接返回，不访问数据库。
+
+缓存过期采用 stale-while-revalidate：条目过了 FEED_CACHE_TTL 后仍保留到 FEED_STALE_TTL，
+只有抢到刷新锁的请求去重新计算，其余请求继续返回旧数据，避免缓存同时失效时大量请求击穿到数据库。
+书籍、分类变化时递增缓存代数（generation），所有书单随之标记为过期，同样按上述方式刷新。
+
+分类参数来自请求，只有已存在的分类键（类型或分类标识）才会写入缓存，且在键中取哈希，
+任意参数不会填满缓存，也不会产生不合法的缓存键。分类键是否存在按键单独用索引查询，
+结果只缓存存在的键（记下当时的代数），不存在的键每次都查询，同样不占缓存。
+写入缓存的书单和分类键都从主库查询，不会缓存副本上尚未同步的旧数据。
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from bookhub_backend.db_router import use_primary
+from .models import Book, BookCategoryIndex
+from .fastpath import serialize
+from .queries import filter_books, plan_queryset
+from .serializers import BookSerializer
+
+FEEDS = {
+    'recommended': ('-rating', '-heat'),
+    'popular': ('-heat', '-reviews'),
+}
+FEED_SIZE = 20
+
+GENERATION_KEY = 'feeds:generation'
+LOCK_TIMEOUT = 30
+
+
+def _digest(category):
+    return hashlib.md5(category.encode()).hexdigest() if category else ''
+
+
+def _feed_key(name, category, is_premium):
+    premium = 'all' if is_premium is None else str(is_premium).lower()
+    return f'feeds:{name}:{_digest(category)}:{premium}'
+
+
+def _category_key(category):
+    return f'feeds:category:{_digest(category)}'
+
+
+def category_exists(category, generation, cached=None):
+    """分类键在当前代数下是否存在，cached 为缓存中已读到的代数"""
+    if cached == generation:
+        return True
+    with use_primary():
+        exists = BookCategoryIndex.objects.filter(key=category).exists()
+    if exists:
+        cache.set(_category_key(category), generation, settings.FEED_STALE_TTL)
+    return exists
+
+
+def build_feed(name, category=None, is_premium=None):
+    """从数据库计算书单的序列化结果"""
+    queryset = filter_books(Book.objects.all(), category=category, is_premium=is_premium)
+    queryset = plan_queryset(queryset.order_by(*FEEDS[name]), BookSerializer)[:FEED_SIZE]
+    with use_primary():
+        return serialize(queryset, BookSerializer)
+
+
+def refresh_feed(name, category=None, is_premium=None, generation=None):
+    """重新计算书单并写入缓存"""
+    if generation is None:
+        generation = cache.get(GENERATION_KEY, 0)
+    data = build_feed(name, category, is_premium)
+    entry = {
+        'data': data,
+        'generation': generation,
+        'expires': time.time() + settings.FEED_CACHE_TTL,
+    }
+    cache.set(_feed_key(name, category, is_premium), entry, settings.FEED_STALE_TTL)
+    return data
+
+
+def get_feed(name, category=None, is_premium=None):
+    """读取书单，缓存过期时只有一个请求负责刷新"""
+    key = _feed_key(name, category, is_premium)
+    category_key = _category_key(category)
+    cached = cache.get_many([key, GENERATION_KEY, category_key])
+    entry = cached.get(key)
+    generation = cached.get(GENERATION_KEY, 0)
+
+    if entry is not None and entry['generation'] == generation and entry['expires'] > time.time():
+        return entry['data']
+    # 不存在的分类下没有书籍，直接返回空书单，不查询也不写缓存
+    if category and not category_exists(category, generation, cached.get(category_key)):
+        return []
+
+    if entry is not None:
+        # 已过期：抢不到刷新锁的请求直接返回旧数据
+        if not cache.add(f'{key}:lock', True, LOCK_TIMEOUT):
+            return entry['data']
+        try:
+            return refresh_feed(name, category, is_premium, generation)
+        finally:
+            cache.delete(f'{key}:lock')
+
+    return refresh_feed(name, category, is_premium, generation)
+
+
+def invalidate():
+    """书籍或分类变化后让全部书单过期"""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
@@ -0,0 +1,109 @@
+"""
+书籍热度引擎
+
+详情浏览、加入书架、阅读进度上报、发表评论等行为在请求中只累加进程内计数（record），不写数据库。
+后台线程每 HEAT_FLUSH_INTERVAL 秒把累计的加权次数批量写回：
+
+    heat_score = heat_score × 0.5 ^ (距上次更新的小时数 / HEAT_HALF_LIFE_HOURS) + 本次新增权重
+    heat = round(heat_score)
+
+没有新行为的书籍由 decay_heat 命令定期衰减（如每小时一次），热门榜因此会随时间变化。
+heat_score 为空的书籍（初始数据、导入的书籍）以 heat 作为起始分值。
+
+后台线程只在 Web 服务进程中开启（wsgi.py / asgi.py 调用 enable_background_flush），
+管理命令和测试中计数留在内存里，需要时显式调用 heat_buffer.flush()，进程退出时也会写回。
+"""
+import operator
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import response_cache
+from .buffers import BackgroundFlusher, WriteBehindBuffer
+from .models import Book
+
+HEAT_FIELDS = ['heat', 'heat_score', 'heat_updated_at', 'updated_at']
+
+
+def decayed(score, since, now):
+    """把 since 时刻的分值衰减到 now"""
+    if since is None or now <= since:
+        return score
+    hours = (now - since).total_seconds() / 3600
+    return score * 0.5 ** (hours / settings.HEAT_HALF_LIFE_HOURS)
+
+
+def _apply(book, increment, now):
+    """更新一本书的热度，返回 heat 是否变化"""
+    score = book.heat if book.heat_score is None else book.heat_score
+    book.heat_score = decayed(score, book.heat_updated_at, now) + increment
+    book.heat_updated_at = now
+    heat = round(book.heat_score)
+    changed = heat != book.heat
+    book.heat = heat
+    book.updated_at = now
+    return changed
+
+
+def _save(moved, unchanged):
+    """写回热度；heat 没变的书籍只更新分值，不推后 updated_at（条件请求的校验值），调用方也不清除其缓存"""
+    Book.objects.bulk_update(unchanged, ['heat_score', 'heat_updated_at'])
+    Book.objects.bulk_update(moved, HEAT_FIELDS)
+
+
+def apply_events(items):
+    """批量写回热度，items 为 {book_id: 新增权重}"""
+    now = timezone.now()
+    moved, unchanged = [], []
+    with transaction.atomic():
+        # 锁住这些行，多个进程同时写回时不会丢失更新
+        books = (
+            Book.objects.select_for_update().filter(pk__in=items)
+            .only('pk', 'heat', 'heat_score', 'heat_updated_at')
+        )
+        for book in books:
+            (moved if _apply(book, items[book.pk], now) else unchanged).append(book)
+        _save(moved, unchanged)
+    response_cache.invalidate_books([book.pk for book in moved])
+
+
+heat_buffer = WriteBehindBuffer('heat', apply_events, merge=operator.add, interval=float('inf'))
+
+
+def record(book_id, event):
+    """记录一次用户行为，只修改内存计数"""
+    heat_buffer.add(int(book_id), settings.HEAT_WEIGHTS[event])
+    heat_flusher.ensure_started()
+
+
+def decay_all(chunk_size=1000):
+    """把全部书籍的热度衰减到当前时间，返回 (检查数, heat 变化数)"""
+    now = timezone.now()
+    checked = changed = 0
+    last_pk = 0
+    while True:
+        books = list(
+            Book.objects.filter(pk__gt=last_pk).order_by('pk')
+            .only('pk', 'heat', 'heat_score', 'heat_updated_at')[:chunk_size]
+        )
+        if not books:
+            break
+        last_pk = books[-1].pk
+        checked += len(books)
+        moved, unchanged = [], []
+        for book in books:
+            (moved if _apply(book, 0, now) else unchanged).append(book)
+        with transaction.atomic():
+            _save(moved, unchanged)
+        response_cache.invalidate_books([book.pk for book in moved])
+        changed += len(moved)
+    return checked, changed
+
+
+heat_flusher = BackgroundFlusher(heat_buffer, interval=settings.HEAT_FLUSH_INTERVAL)
+
+
+def enable_background_flush():
+    """在 Web 服务进程中开启后台写回（线程在本进程第一次记录行为时启动）"""
+    heat_flusher.enabled = True
@@ -0,0 +1,71 @@
+"""
+HyperLogLog 基数估计
+
+用 2^precision 个单字节寄存器估计集合中不重复元素的个数，占用内存与元素个数无关；
+precision=10 时为 1KB，标准误差约 1.04 / sqrt(1024) ≈ 3.3%。
+两个草图按寄存器取最大值即可合并，合并结果等于两个集合并集的草图。
+"""
+import hashlib
+import math
+
+DEFAULT_PRECISION = 10
+HASH_BITS = 64
+
+
+def _hash(value):
+    digest = hashlib.blake2b(str(value).encode(), digest_size=HASH_BITS // 8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class HyperLogLog:
+    """HyperLogLog 草图"""
+
+    def __init__(self, registers=None, precision=DEFAULT_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        if registers is None:
+            self.registers = bytearray(self.size)
+        else:
+            if len(registers) != self.size:
+                raise ValueError(f'寄存器长度 {len(registers)} 与精度 {precision} 不符')
+            self.registers = bytearray(registers)
+
+    def add(self, value):
+        """加入一个元素，返回寄存器是否变化"""
+        x = _hash(value)
+        rest_bits = HASH_BITS - self.precision
+        index = x >> rest_bits
+        rest = x & ((1 << rest_bits) - 1)
+        # 剩余位中第一个 1 出现的位置（从 1 开始计）
+        rank = rest_bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def update(self, values):
+        changed = False
+        for value in values:
+            changed = self.add(value) or changed
+        return changed
+
+    def merge(self, other):
+        """合并另一个相同精度的草图"""
+        if other.precision != self.precision:
+            raise ValueError('只能合并相同精度的草图')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        """估计不重复元素个数"""
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        # 小基数时改用线性计数，误差更小
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def __bytes__(self):
+        return bytes(self.registers)
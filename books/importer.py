@@ -0,0 +1,190 @@
+"""
+书籍批量导入
+
+CSV / JSONL 文件经生成器流水线逐行读取、清洗、分块，每块用一条
+bulk_create(update_conflicts=True) 按 ISBN 插入或更新，分类关联通过中间表批量写入，
+搜索索引和书单缓存按块批量刷新。整个过程内存占用只与块大小有关。
+"""
+import csv
+import json
+import time
+from datetime import date
+from itertools import islice
+
+from django.db import transaction
+
+from . import feeds, membership, response_cache, search, suggest
+from .models import Book, Category, parse_count
+
+# 导入时可以更新的字段；评分、评价数、热度、阅读人数等由站内数据维护，只在新建时取导入值
+UPDATE_FIELDS = [
+    'title', 'title_pinyin', 'title_initials', 'author', 'genre', 'cover', 'description', 'is_premium',
+    'publisher', 'publish_date', 'pages', 'updated_at',
+]
+
+FIELD_TYPES = {
+    'rating': float,
+    'reviews': int,
+    'heat': int,
+    'pages': int,
+}
+
+
+def read_rows(path):
+    """按扩展名读取 CSV 或 JSONL 文件，逐行产出 dict"""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if str(path).endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # 格式错误的行交给 clean_row 计为跳过
+                        yield None
+        else:
+            yield from csv.DictReader(f)
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+def _parse_categories(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split('|')
+    return [slug.strip() for slug in value if slug and slug.strip()]
+
+
+def _too_long(fields):
+    """是否有字符串字段超过数据库列的长度"""
+    for name, value in fields.items():
+        max_length = getattr(Book._meta.get_field(name), 'max_length', None)
+        if max_length and isinstance(value, str) and len(value) > max_length:
+            return True
+    return False
+
+
+def clean_row(row):
+    """清洗一行数据，缺少 ISBN 或书名、或字段格式错误、超出范围时返回 None"""
+    if not isinstance(row, dict):
+        return None
+    isbn = str(row.get('isbn') or '').strip()
+    title = str(row.get('title') or '').strip()
+    if not isbn or not title:
+        return None
+    try:
+        fields = {
+            'isbn': isbn,
+            'title': title,
+            'author': (row.get('author') or '').strip(),
+            'genre': (row.get('genre') or '').strip(),
+            'cover': (row.get('cover') or '').strip(),
+            'description': row.get('description') or '',
+            'publisher': (row.get('publisher') or '').strip(),
+            'is_premium': _parse_bool(row.get('is_premium', False)),
+        }
+        fields['title_pinyin'], fields['title_initials'] = suggest.pinyin_keys(title)
+        for name, cast in FIELD_TYPES.items():
+            if row.get(name) not in (None, ''):
+                fields[name] = cast(row[name])
+        # 阅读人数可以是数字，也可以是旧格式的 '12.3万'，作为历史阅读人数
+        if row.get('readers') not in (None, ''):
+            fields['readers'] = fields['readers_base'] = int(row['readers'])
+        elif row.get('reading'):
+            fields['readers'] = fields['readers_base'] = parse_count(row['reading'])
+        if row.get('publish_date'):
+            fields['publish_date'] = date.fromisoformat(str(row['publish_date']))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    # 超出范围的值在 MySQL 严格模式下会让整块写入失败
+    if any(fields.get(name, 0) < 0 for name in ('reviews', 'heat', 'pages', 'readers')):
+        return None
+    if not 0 <= fields.get('rating', 0) <= 5 or _too_long(fields):
+        return None
+    # 导入的评分、评价数是站外数据，评分总和按其折算，之后的评论在此基础上累加
+    if fields.get('reviews'):
+        fields['rating_sum'] = round(fields.get('rating', 0) * fields['reviews'])
+        fields['reviews_base'], fields['rating_sum_base'] = fields['reviews'], fields['rating_sum']
+    return fields, _parse_categories(row.get('categories'))
+
+
+def chunked(iterable, size):
+    """把可迭代对象切成长度为 size 的列表"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _resolve_categories(slugs):
+    """返回 {slug: id}，不存在的分类按 slug 新建"""
+    existing = dict(Category.objects.filter(slug__in=slugs).values_list('slug', 'id'))
+    missing = [slug for slug in slugs if slug not in existing]
+    if missing:
+        Category.objects.bulk_create(
+            [Category(name=slug, slug=slug) for slug in missing], ignore_conflicts=True
+        )
+        response_cache.invalidate('categories')
+        existing.update(Category.objects.filter(slug__in=missing).values_list('slug', 'id'))
+    return existing
+
+
+def upsert_chunk(rows):
+    """按 ISBN 插入或更新一块数据，返回写入的书籍数量"""
+    # 同一块内 ISBN 重复时以最后一行为准
+    by_isbn = {fields['isbn']: (fields, categories) for fields, categories in rows}
+
+    with transaction.atomic():
+        Book.objects.bulk_create(
+            [Book(**fields) for fields, _ in by_isbn.values()],
+            update_conflicts=True,
+            unique_fields=['isbn'],
+            update_fields=UPDATE_FIELDS,
+        )
+        book_ids = dict(Book.objects.filter(isbn__in=by_isbn).values_list('isbn', 'id'))
+
+        slugs = {slug for _, categories in by_isbn.values() for slug in categories}
+        if slugs:
+            category_ids = _resolve_categories(slugs)
+            Through = Book.categories.through
+            linked = [book_ids[isbn] for isbn, (_, categories) in by_isbn.items() if categories]
+            Through.objects.filter(book_id__in=linked).delete()
+            Through.objects.bulk_create([
+                Through(book_id=book_ids[isbn], category_id=category_ids[slug])
+                for isbn, (_, categories) in by_isbn.items()
+                for slug in categories if slug in category_ids
+            ], ignore_conflicts=True)
+
+        search_fields = ['pk'] + [field for field, _, _ in search.FIELD_WEIGHTS]
+        search.index_books(Book.objects.filter(pk__in=book_ids.values()).only(*search_fields))
+        membership.sync_books(book_ids.values())
+    response_cache.invalidate_books(book_ids.values())
+    return len(by_isbn)
+
+
+def import_file(path, batch_size=1000):
+    """导入一个文件，返回 (导入行数, 跳过行数, 耗时秒数)"""
+    start = time.perf_counter()
+    imported = skipped = 0
+
+    def cleaned():
+        nonlocal skipped
+        for row in read_rows(path):
+            result = clean_row(row)
+            if result is None:
+                skipped += 1
+            else:
+                yield result
+
+    for chunk in chunked(cleaned(), batch_size):
+        imported += upsert_chunk(chunk)
+    if imported:
+        feeds.invalidate()
+        suggest.invalidate()
+    return imported, skipped, time.perf_counter() - start
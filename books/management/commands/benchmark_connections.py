@@ -0,0 +1,55 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from bookhub_backend.db_pool.pool import ConnectionPool
+
+
+class Command(BaseCommand):
+    help = '对比每次新建数据库连接与从连接池借用连接执行一条简单查询的耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='数据库别名')
+        parser.add_argument('--repeat', type=int, default=200, help='每种方式执行的次数')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        params = connection.get_connection_params()
+
+        def connect():
+            return connection.Database.connect(**params)
+
+        def query(raw):
+            cursor = raw.cursor()
+            cursor.execute('SELECT 1')
+            cursor.fetchall()
+            cursor.close()
+
+        def direct():
+            raw = connect()
+            query(raw)
+            raw.close()
+
+        pool = ConnectionPool(connect, size=1, ping_after=None)
+
+        def pooled():
+            raw = pool.acquire()
+            query(raw)
+            pool.release(raw)
+
+        results = {}
+        for name, func in (('每次新建连接', direct), ('连接池', pooled)):
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                func()
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            results[name] = statistics.median(timings)
+            self.stdout.write(f'{name}: 中位数 {results[name]:.3f}ms, p95 {p95:.3f}ms')
+        pool.close_all()
+
+        saved = results['每次新建连接'] - results['连接池']
+        self.stdout.write(self.style.SUCCESS(f'每个请求节省约 {saved:.3f}ms 的建连开销'))
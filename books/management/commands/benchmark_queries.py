@@ -0,0 +1,101 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from books.models import Book, Comment, BookShelf, ReadingProgress
+from books.queries import filter_books
+
+
+class Command(BaseCommand):
+    help = '对热点查询输出执行计划与耗时（可先生成压测数据）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-books', type=int, default=0, help='生成的书籍数量')
+        parser.add_argument('--seed-comments', type=int, default=0, help='生成的评论数量')
+        parser.add_argument('--seed-users', type=int, default=1000, help='生成评论时使用的用户数量')
+        parser.add_argument('--batch-size', type=int, default=5000, help='批量写入的批大小')
+        parser.add_argument('--repeat', type=int, default=20, help='每条查询执行的次数')
+        parser.add_argument('--no-explain', action='store_true', help='不输出执行计划')
+
+    def handle(self, *args, **options):
+        if options['seed_books']:
+            self.seed_books(options['seed_books'], options['batch_size'])
+        if options['seed_comments']:
+            self.seed_comments(options['seed_comments'], options['seed_users'], options['batch_size'])
+
+        book = Book.objects.order_by('-heat', '-rating').first()
+        user = User.objects.order_by('pk').first()
+        if book is None or user is None:
+            self.stderr.write('数据库中没有书籍或用户，请先生成数据')
+            return
+
+        queries = [
+            ('书籍列表', Book.objects.order_by('-heat', '-rating')[:20]),
+            ('会员书籍列表', Book.objects.filter(is_premium=True).order_by('-heat', '-rating')[:20]),
+            ('分类书籍列表', filter_books(Book.objects.all(), category=book.genre).order_by('-heat', '-rating')[:20]),
+            ('推荐书籍', Book.objects.order_by('-rating', '-heat')[:20]),
+            ('热门书籍', Book.objects.order_by('-heat', '-reviews')[:20]),
+            ('书籍评论', Comment.objects.filter(book=book).order_by('-created_at')[:20]),
+            ('我的评论', Comment.objects.filter(user=user).order_by('-created_at')[:20]),
+            ('我的书架', BookShelf.objects.filter(user=user).order_by('-added_at')[:20]),
+            ('我的阅读', ReadingProgress.objects.filter(user=user).order_by('-updated_at')[:20]),
+        ]
+        for name, queryset in queries:
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(self.style.SUCCESS(
+                f'{name}: 中位数 {statistics.median(timings):.2f}ms, p95 {p95:.2f}ms'
+            ))
+            if not options['no_explain']:
+                self.stdout.write(queryset.explain())
+
+    def seed_books(self, count, batch_size):
+        self.stdout.write(f'开始生成 {count} 本书籍...')
+        for start in range(0, count, batch_size):
+            size = min(batch_size, count - start)
+            Book.objects.bulk_create([
+                Book(
+                    title=f'压测书籍{start + i}',
+                    author=f'作者{random.randint(1, 10000)}',
+                    rating=round(random.uniform(0, 5), 1),
+                    reviews=random.randint(0, 10000),
+                    genre='压测',
+                    heat=random.randint(0, 1000),
+                    cover='https://picsum.photos/300/450',
+                    description='压测数据',
+                    is_premium=random.random() < 0.2,
+                )
+                for i in range(size)
+            ])
+        self.stdout.write(self.style.SUCCESS(f'已生成 {count} 本书籍'))
+
+    def seed_comments(self, count, user_count, batch_size):
+        self.stdout.write(f'开始生成 {count} 条评论...')
+        existing = User.objects.filter(username__startswith='bench_').count()
+        User.objects.bulk_create([
+            User(username=f'bench_{i}') for i in range(existing, user_count)
+        ])
+        user_ids = list(User.objects.filter(username__startswith='bench_').values_list('pk', flat=True))
+        book_ids = list(Book.objects.values_list('pk', flat=True))
+        for start in range(0, count, batch_size):
+            size = min(batch_size, count - start)
+            with transaction.atomic():
+                Comment.objects.bulk_create([
+                    Comment(
+                        user_id=random.choice(user_ids),
+                        book_id=random.choice(book_ids),
+                        content='压测评论',
+                        rating=random.randint(1, 5),
+                    )
+                    for _ in range(size)
+                ])
+        # 批量写入不触发信号，评分聚合需要用 reconcile_book_ratings 重新统计
+        self.stdout.write(self.style.SUCCESS(f'已生成 {count} 条评论，请运行 reconcile_book_ratings 更新评分'))
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from books.fastpath import serialize
+from books.models import Book, Comment
+from books.queries import plan_queryset
+from books.serializers import BookSerializer, CommentSerializer
+
+
+class Command(BaseCommand):
+    help = '对比 DRF 序列化器与快速序列化路径的吞吐量（单进程，即单核）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=1000, help='参与测试的对象数量')
+        parser.add_argument('--repeat', type=int, default=5, help='重复次数，取最快的一次')
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        cases = [
+            ('书籍', Book.objects.all(), BookSerializer),
+            ('评论', Comment.objects.all(), CommentSerializer),
+        ]
+        for name, queryset, serializer_class in cases:
+            instances = list(plan_queryset(queryset, serializer_class)[:options['limit']])
+            if not instances:
+                self.stderr.write(f'数据库中没有{name}，跳过')
+                continue
+
+            drf = self.measure(
+                lambda: renderer.render(serializer_class(instances, many=True).data), options['repeat']
+            )
+            fast = self.measure(
+                lambda: renderer.render(serialize(instances, serializer_class)), options['repeat']
+            )
+            if renderer.render(serializer_class(instances, many=True).data) != renderer.render(serialize(instances, serializer_class)):
+                self.stderr.write(self.style.ERROR(f'{name}: 两种方式输出不一致'))
+
+            count = len(instances)
+            self.stdout.write(self.style.SUCCESS(
+                f'{name}（{count} 个）: DRF {count / drf:.0f} 个/秒，快速路径 {count / fast:.0f} 个/秒，'
+                f'提升 {drf / fast:.1f} 倍'
+            ))
+
+    def measure(self, func, repeat):
+        best = None
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from books.neighbors import build_content
+
+
+class Command(BaseCommand):
+    help = '按书名、简介、作者、类型与分类离线计算内容相似书单（书籍详情页的相似书籍使用）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=20, help='每本书保留的相似书籍数量')
+        parser.add_argument('--chunk-size', type=int, default=256, help='每个任务计算的书籍数量')
+        parser.add_argument('--workers', type=int, default=1, help='并行计算的进程数')
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='只重算内容有变化或新增的书籍，并更新受其影响的书单（适合定时执行）'
+        )
+
+    def handle(self, *args, **options):
+        if min(options['top_k'], options['chunk_size'], options['workers']) <= 0:
+            raise CommandError('参数必须大于 0')
+        self.stdout.write('开始计算内容相似书单...')
+        start = time.perf_counter()
+        total, computed = build_content(
+            top_k=options['top_k'],
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            incremental=options['incremental'],
+        )
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'共 {total} 本书籍，重新计算 {computed} 本，耗时 {elapsed:.1f} 秒'
+        ))
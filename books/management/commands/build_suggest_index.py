@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from books import suggest
+from books.models import Book
+
+
+class Command(BaseCommand):
+    help = '构建自动补全索引并输出索引大小与查询耗时（可先重新计算书名拼音）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--refresh-pinyin', action='store_true',
+            help='重新计算全部书籍的书名拼音（安装 pypinyin 之后执行一次）'
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='重新计算拼音时每批处理的书籍数量')
+        parser.add_argument('--query', action='append', default=[], help='测量耗时的查询，可多次指定')
+
+    def handle(self, *args, **options):
+        if options['refresh_pinyin']:
+            if suggest.lazy_pinyin is None:
+                self.stderr.write('未安装 pypinyin，跳过书名拼音')
+            else:
+                self.stdout.write(f'已更新 {self.refresh_pinyin(options["chunk_size"])} 本书籍的书名拼音')
+            suggest.invalidate()
+
+        start = time.perf_counter()
+        index = suggest.build()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'索引构建完成：{len(index)} 个键，{len(index.top)} 个预先计算的前缀，'
+            f'约 {index.memory_size() / 1024 / 1024:.1f}MB，耗时 {elapsed:.2f} 秒'
+        ))
+
+        for query in options['query']:
+            repeat = 1000
+            start = time.perf_counter()
+            for _ in range(repeat):
+                results = index.lookup(query)
+            per_lookup = (time.perf_counter() - start) / repeat * 1000
+            self.stdout.write(f'{query}: {len(results)} 条结果，{per_lookup:.3f}ms/次')
+
+    def refresh_pinyin(self, chunk_size):
+        count = 0
+        last_pk = 0
+        while True:
+            books = list(Book.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'title')[:chunk_size])
+            if not books:
+                return count
+            last_pk = books[-1].pk
+            for book in books:
+                book.title_pinyin, book.title_initials = suggest.pinyin_keys(book.title)
+            Book.objects.bulk_update(books, ['title_pinyin', 'title_initials'])
+            count += len(books)
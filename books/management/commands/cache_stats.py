@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from books import response_cache
+
+
+class Command(BaseCommand):
+    help = '查看响应缓存命中率（多进程部署时缓存后端需为共享缓存才能看到全部进程的统计）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='输出后清零统计')
+
+    def handle(self, *args, **options):
+        total_hits = total_misses = 0
+        for scope_type, values in response_cache.stats().items():
+            total_hits += values['hits']
+            total_misses += values['misses']
+            self.stdout.write(
+                f"{scope_type}: 命中 {values['hits']}，未命中 {values['misses']}，命中率 {values['hitRatio']:.2%}"
+            )
+        total = total_hits + total_misses
+        ratio = total_hits / total if total else 0
+        self.stdout.write(self.style.SUCCESS(f'合计: 命中 {total_hits}，未命中 {total_misses}，命中率 {ratio:.2%}'))
+        if options['reset']:
+            response_cache.reset_stats()
+            self.stdout.write('统计已清零')
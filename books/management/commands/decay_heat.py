@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from books import heat
+
+
+class Command(BaseCommand):
+    help = '把全部书籍的热度衰减到当前时间（建议每小时执行一次）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='每批处理的书籍数量')
+
+    def handle(self, *args, **options):
+        # 先写回本进程中尚未落库的行为计数
+        heat.heat_buffer.flush()
+        checked, changed = heat.decay_all(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'已检查 {checked} 本书籍，{changed} 本热度发生变化'))
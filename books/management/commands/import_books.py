@@ -0,0 +1,47 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from books.importer import import_file
+
+
+class Command(BaseCommand):
+    help = '从 CSV/JSONL 文件批量导入书籍（按 ISBN 插入或更新），多个文件分片可并行导入'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='CSV 或 JSONL（.jsonl）文件')
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批写入的行数')
+        parser.add_argument('--workers', type=int, default=1, help='并行导入的进程数，按文件分配')
+
+    def handle(self, *args, **options):
+        files = options['files']
+        batch_size = options['batch_size']
+        workers = min(options['workers'], len(files))
+        if batch_size <= 0 or workers <= 0:
+            raise CommandError('--batch-size 和 --workers 必须大于 0')
+
+        self.stdout.write(f'开始导入 {len(files)} 个文件，{workers} 个进程...')
+        start = time.perf_counter()
+        if workers == 1:
+            results = [import_file(path, batch_size) for path in files]
+        else:
+            # 子进程不能共用父进程的数据库连接
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                results = list(executor.map(import_file, files, [batch_size] * len(files)))
+        elapsed = time.perf_counter() - start
+
+        total_imported = total_skipped = 0
+        for path, (imported, skipped, seconds) in zip(files, results):
+            total_imported += imported
+            total_skipped += skipped
+            rate = imported / seconds if seconds else 0
+            self.stdout.write(f'{path}: 导入 {imported} 行，跳过 {skipped} 行，{rate:.0f} 行/秒')
+
+        rate = total_imported / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'导入完成：共 {total_imported} 行，跳过 {total_skipped} 行，耗时 {elapsed:.1f} 秒，{rate:.0f} 行/秒'
+        ))
@@ -37,7 +37,7 @@ class Command(BaseCommand):
                 'reviews': 1243,
                 'genre': '科技',
                 'heat': 98,
-                'reading': '12.3万',
+                'readers': 123000,
                 'cover': 'https://ts1.tc.mm.bing.net/th/id/R-C.65e79b2f99aa01c8d00f99dce25ab47f',
                 'description': '一本深入浅出介绍 JavaScript 的经典书籍。',
                 'is_premium': False,
@@ -53,7 +53,7 @@ class Command(BaseCommand):
                 'reviews': 2356,
                 'genre': '历史',
                 'heat': 95,
-                'reading': '9.8万',
+                'readers': 98000,
                 'cover': 'https://img.alicdn.com/i2/2543812659/O1CN01AgGsjU1VVrswdhd42_!!2543812659.jpg',
                 'description': '从认知革命到超月世界，重新解读人类发展史。',
                 'is_premium': True,
@@ -69,7 +69,7 @@ class Command(BaseCommand):
                 'reviews': 5678,
                 'genre': '科幻',
                 'heat': 99,
-                'reading': '15.2万',
+                'readers': 152000,
                 'cover': 'https://p1.ssl.qhimg.com/t0147ec1b07078c0cf8.jpg',
                 'description': '地球文明与三体文明的首次接触，开启宇宙社会学的宏大叙事。',
                 'is_premium': False,
@@ -85,7 +85,7 @@ class Command(BaseCommand):
                 'reviews': 3456,
                 'genre': '文学',
                 'heat': 92,
-                'reading': '8.9万',
+                'readers': 89000,
                 'cover': 'https://ts2.tc.mm.bing.net/th/id/OIP-C.8Mb1Jm08nNYWyVcoddsZqwHaJ3',
                 'description': '一个人在苦难中坚持活下去的故事，感人至深。',
                 'is_premium': False,
@@ -101,7 +101,7 @@ class Command(BaseCommand):
                 'reviews': 7654,
                 'genre': '推理',
                 'heat': 91,
-                'reading': '11.3万',
+                'readers': 113000,
                 'cover': 'https://ts1.tc.mm.bing.net/th/id/OIP-C.v-_BhEb7l5KWQyHuqOmmngHaHV',
                 'description': '通过一店杂货店解开人生中的绳结。',
                 'is_premium': False,
@@ -117,7 +117,7 @@ class Command(BaseCommand):
                 'reviews': 4567,
                 'genre': '文学',
                 'heat': 89,
-                'reading': '7.6万',
+                'readers': 76000,
                 'cover': 'https://so1.360tres.com/t017c401645dd63e333.png',
                 'description': '布恩迪亚家族七代人在马孔多小镇的兴衰与孤独。',
                 'is_premium': True,
@@ -133,7 +133,7 @@ class Command(BaseCommand):
                 'reviews': 12543,
                 'genre': '心理学',
                 'heat': 987,
-                'reading': '5.6万',
+                'readers': 56000,
                 'cover': 'https://picsum.photos/id/22/300/450',
                 'description': '《思考，快与慢》是诺贝尔经济学奖得主丹尼尔·卡尼曼的经典著作。',
                 'is_premium': True,
@@ -146,6 +146,8 @@ class Command(BaseCommand):
         
         created_count = 0
         for book_data in books_data:
+            # 评分总和与初始评分、评价数保持一致，后续评论在此基础上增量累计
+            book_data['rating_sum'] = round(book_data['rating'] * book_data['reviews'])
             book, created = Book.objects.get_or_create(
                 isbn=book_data['isbn'],
                 defaults=book_data
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from books import membership
+
+
+class Command(BaseCommand):
+    help = '重建书籍分类键（按分类筛选书籍用的冗余表）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='每批处理的书籍数量')
+
+    def handle(self, *args, **options):
+        self.stdout.write('开始重建书籍分类键...')
+        count = membership.rebuild_index(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'已处理 {count} 本书籍'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from books import readers
+
+
+class Command(BaseCommand):
+    help = '按阅读进度和书架记录重建独立读者草图，并重新计算阅读人数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='每批处理的书籍数量')
+
+    def handle(self, *args, **options):
+        self.stdout.write('开始重建独立读者草图...')
+        count = readers.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'已处理 {count} 本书籍'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from books import search
+
+
+class Command(BaseCommand):
+    help = '重建书籍搜索索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='每批处理的书籍数量')
+
+    def handle(self, *args, **options):
+        self.stdout.write('开始重建搜索索引...')
+        book_count, term_count = search.rebuild_index(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'已索引 {book_count} 本书籍，共 {term_count} 个词项'))
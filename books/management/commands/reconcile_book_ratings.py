@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from books import aggregates
+
+
+class Command(BaseCommand):
+    help = '从评论重新统计书籍评分与评价数，修复累计值漂移'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='每批处理的书籍数量')
+
+    def handle(self, *args, **options):
+        self.stdout.write('开始校对书籍评分...')
+        checked, fixed = aggregates.reconcile_ratings(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'已检查 {checked} 本书籍，修复 {fixed} 本'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from books import feeds
+from books.models import Category
+
+
+class Command(BaseCommand):
+    help = '预先计算推荐/热门书单并写入缓存（缓存后端需为多进程共享的缓存）'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write('开始预热书单缓存...')
+        categories = [None] + list(Category.objects.values_list('slug', flat=True))
+        count = 0
+        for name in feeds.FEEDS:
+            for category in categories:
+                for is_premium in (None, True, False):
+                    feeds.refresh_feed(name, category=category, is_premium=is_premium)
+                    count += 1
+        self.stdout.write(self.style.SUCCESS(f'已预热 {count} 个书单'))
@@ -0,0 +1,48 @@
+"""
+书籍分类成员关系
+
+按分类筛选书籍时既要匹配类型（genre）又要匹配多对多分类的 slug，直接联表需要 OR 条件和 DISTINCT。
+这里把每本书的类型与全部分类 slug 去重后存入 BookCategoryIndex，(key, book) 唯一，
+按分类筛选变成一次索引查找的半连接（book_id IN (...)），不需要 DISTINCT。
+书籍类型、分类关联或分类 slug 变化时由信号调用 sync_books 重新计算对应书籍。
+"""
+from django.db import transaction
+
+from .models import Book, BookCategoryIndex
+
+
+def sync_books(book_ids, chunk_size=1000):
+    """重新计算若干书籍的分类键"""
+    Through = Book.categories.through
+    book_ids = list(book_ids)
+    for start in range(0, len(book_ids), chunk_size):
+        chunk = book_ids[start:start + chunk_size]
+        keys = {pk: {genre} for pk, genre in Book.objects.filter(pk__in=chunk).values_list('pk', 'genre')}
+        for book_id, slug in Through.objects.filter(book_id__in=keys).values_list('book_id', 'category__slug'):
+            keys[book_id].add(slug)
+        with transaction.atomic():
+            BookCategoryIndex.objects.filter(book_id__in=chunk).delete()
+            BookCategoryIndex.objects.bulk_create([
+                BookCategoryIndex(book_id=book_id, key=key)
+                for book_id, book_keys in keys.items()
+                for key in book_keys if key
+            ])
+
+
+def rebuild_index(chunk_size=1000):
+    """按主键分块重建全部书籍的分类键，返回书籍数"""
+    count = 0
+    last_pk = 0
+    while True:
+        chunk = list(Book.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not chunk:
+            break
+        sync_books(chunk, chunk_size)
+        count += len(chunk)
+        last_pk = chunk[-1]
+    return count
+
+
+def books_in_category(key):
+    """属于分类 key 的书籍 id 子查询"""
+    return BookCategoryIndex.objects.filter(key=key).values('book_id')
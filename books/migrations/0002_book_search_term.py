@@ -0,0 +1,89 @@
+# Generated by Django 4.2.8 on 2026-10-18 14:34
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# 分词规则的快照，与 books.search 解耦，之后修改分词不影响这里
+MAX_TERM_LENGTH = 32
+MAX_PREFIX_LENGTH = 20
+
+BATCH_SIZE = 1000
+
+FIELD_WEIGHTS = [
+    ('title', 5, True),
+    ('author', 3, True),
+    ('isbn', 5, True),
+    ('description', 1, False),
+]
+
+_TOKEN_RE = re.compile(r'([\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+)|([0-9a-z]+)')
+
+
+def tokenize(text, prefixes=False):
+    terms = set()
+    for cjk, word in _TOKEN_RE.findall((text or '').lower()):
+        if cjk:
+            terms.update(cjk)
+            terms.update(cjk[i:i + 2] for i in range(len(cjk) - 1))
+        else:
+            word = word[:MAX_TERM_LENGTH]
+            terms.add(word)
+            if prefixes:
+                terms.update(word[:i] for i in range(1, min(len(word), MAX_PREFIX_LENGTH) + 1))
+            elif len(word) > MAX_PREFIX_LENGTH:
+                terms.add(word[:MAX_PREFIX_LENGTH])
+    return terms
+
+
+def build_terms(book):
+    weights = {}
+    for field, weight, prefixes in FIELD_WEIGHTS:
+        for term in tokenize(getattr(book, field), prefixes=prefixes):
+            weights[term] = weights.get(term, 0) + weight
+    return weights
+
+
+def build_search_index(apps, schema_editor):
+    # 按主键分块处理，内存占用与书籍总数无关
+    Book = apps.get_model('books', 'Book')
+    BookSearchTerm = apps.get_model('books', 'BookSearchTerm')
+    books = Book.objects.only('pk', *(field for field, _, _ in FIELD_WEIGHTS)).order_by('pk')
+    last_pk = 0
+    while True:
+        chunk = list(books.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not chunk:
+            return
+        last_pk = chunk[-1].pk
+        rows = [
+            BookSearchTerm(book_id=book.pk, term=term, weight=weight)
+            for book in chunk
+            for term, weight in build_terms(book).items()
+        ]
+        BookSearchTerm.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=32, verbose_name='词项')),
+                ('weight', models.IntegerField(default=1, verbose_name='权重')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='books.book', verbose_name='书籍')),
+            ],
+            options={
+                'verbose_name': '搜索词项',
+                'verbose_name_plural': '搜索词项',
+                'unique_together': {('term', 'book')},
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.8 on 2026-10-18 14:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('books', '0002_book_search_term'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentVote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.SmallIntegerField(choices=[(1, '点赞'), (-1, '点踩')], verbose_name='投票')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='投票时间')),
+                ('comment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='votes', to='books.comment', verbose_name='评论')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comment_votes', to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '评论投票',
+                'verbose_name_plural': '评论投票',
+                'unique_together': {('user', 'comment')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.8 on 2026-10-18 14:37
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Cast, Round
+
+
+def init_rating_sum(apps, schema_editor):
+    # 已有书籍按当前评分和评价数折算累计和，保证平均分不变
+    Book = apps.get_model('books', 'Book')
+    Book.objects.update(rating_sum=Cast(Round(F('rating') * F('reviews')), models.IntegerField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0003_comment_vote'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='rating_sum',
+            field=models.IntegerField(default=0, verbose_name='评分总和'),
+        ),
+        migrations.RunPython(init_rating_sum, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.8 on 2026-10-18 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_book_rating_sum'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['-heat', '-rating'], name='book_heat_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['-rating', '-heat'], name='book_rating_heat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['-heat', '-reviews'], name='book_heat_reviews_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['is_premium', '-heat', '-rating'], name='book_premium_heat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookshelf',
+            index=models.Index(fields=['user', '-added_at'], name='shelf_user_added_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['book', '-created_at'], name='comment_book_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['user', '-created_at'], name='comment_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='readingprogress',
+            index=models.Index(fields=['user', '-updated_at'], name='progress_user_updated_idx'),
+        ),
+    ]
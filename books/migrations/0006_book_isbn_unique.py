@@ -0,0 +1,34 @@
+# Generated by Django 4.2.8 on 2026-10-18 14:42
+
+from django.db import migrations, models
+
+
+def blank_isbn_to_null(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    Book.objects.filter(isbn='').update(isbn=None)
+
+
+def null_isbn_to_blank(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    Book.objects.filter(isbn__isnull=True).update(isbn='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='book',
+            name='isbn',
+            field=models.CharField(blank=True, max_length=20, null=True, verbose_name='ISBN'),
+        ),
+        migrations.RunPython(blank_isbn_to_null, null_isbn_to_blank),
+        migrations.AlterField(
+            model_name='book',
+            name='isbn',
+            field=models.CharField(blank=True, max_length=20, null=True, unique=True, verbose_name='ISBN'),
+        ),
+    ]
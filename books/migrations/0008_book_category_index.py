@@ -0,0 +1,54 @@
+# Generated by Django 4.2.8 on 2026-10-18 14:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+BATCH_SIZE = 1000
+
+
+def build_category_index(apps, schema_editor):
+    # 按主键分块处理，内存占用与书籍总数无关
+    Book = apps.get_model('books', 'Book')
+    BookCategoryIndex = apps.get_model('books', 'BookCategoryIndex')
+    Membership = Book.categories.through
+    books = Book.objects.order_by('pk').values_list('pk', 'genre')
+    last_pk = 0
+    while True:
+        keys = {pk: {genre} for pk, genre in books.filter(pk__gt=last_pk)[:BATCH_SIZE]}
+        if not keys:
+            return
+        last_pk = max(keys)
+        memberships = Membership.objects.filter(book_id__in=keys).values_list('book_id', 'category__slug')
+        for book_id, slug in memberships:
+            keys[book_id].add(slug)
+        rows = [
+            BookCategoryIndex(book_id=book_id, key=key)
+            for book_id, book_keys in keys.items()
+            for key in book_keys if key
+        ]
+        BookCategoryIndex.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookCategoryIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50, verbose_name='分类键')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_keys', to='books.book', verbose_name='书籍')),
+            ],
+            options={
+                'verbose_name': '书籍分类索引',
+                'verbose_name_plural': '书籍分类索引',
+                'unique_together': {('key', 'book')},
+            },
+        ),
+        migrations.RunPython(build_category_index, migrations.RunPython.noop),
+    ]
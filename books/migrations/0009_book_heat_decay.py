@@ -0,0 +1,23 @@
+# Generated by Django 4.2.8 on 2026-10-18 15:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_book_category_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='heat_score',
+            field=models.FloatField(blank=True, null=True, verbose_name='热度分值'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='heat_updated_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='热度更新时间'),
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 4.2.8 on 2026-10-18 15:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+UNITS = (('亿', 100000000), ('万', 10000))
+
+BATCH_SIZE = 1000
+
+
+def parse_count(text):
+    text = str(text or '').strip().rstrip('+')
+    multiplier = 1
+    for unit, value in UNITS:
+        if text.endswith(unit):
+            text, multiplier = text[:-len(unit)], value
+            break
+    try:
+        return max(round(float(text) * multiplier), 0)
+    except ValueError:
+        return 0
+
+
+def format_count(count):
+    for unit, value in UNITS:
+        if count >= value:
+            return f'{count / value:.1f}'.rstrip('0').rstrip('.') + unit
+    return str(count)
+
+
+def chunks(queryset):
+    """按主键分块遍历，内存占用与书籍总数无关"""
+    queryset = queryset.order_by('pk')
+    last_pk = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not chunk:
+            return
+        last_pk = chunk[-1].pk
+        yield chunk
+
+
+def seed_readers(apps, schema_editor):
+    # 旧的展示字符串作为历史阅读人数
+    Book = apps.get_model('books', 'Book')
+    for books in chunks(Book.objects.only('pk', 'reading')):
+        for book in books:
+            book.readers = book.readers_base = parse_count(book.reading)
+        Book.objects.bulk_update(books, ['readers', 'readers_base'], batch_size=BATCH_SIZE)
+
+
+def restore_reading(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    for books in chunks(Book.objects.only('pk', 'readers')):
+        for book in books:
+            book.reading = format_count(book.readers)
+        Book.objects.bulk_update(books, ['reading'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_book_heat_decay'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='readers',
+            field=models.PositiveIntegerField(default=0, verbose_name='阅读人数'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='readers_base',
+            field=models.PositiveIntegerField(default=0, verbose_name='历史阅读人数'),
+        ),
+        migrations.RunPython(seed_readers, restore_reading),
+        migrations.RemoveField(
+            model_name='book',
+            name='reading',
+        ),
+        migrations.CreateModel(
+            name='ReaderSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(max_length=10, verbose_name='统计周期')),
+                ('registers', models.BinaryField(verbose_name='寄存器')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reader_sketches', to='books.book', verbose_name='书籍')),
+            ],
+            options={
+                'verbose_name': '读者草图',
+                'verbose_name_plural': '读者草图',
+                'unique_together': {('book', 'period')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.8 on 2026-10-18 15:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0010_book_readers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookNeighbors',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('cooccurrence', '共同读者')], max_length=20, verbose_name='类型')),
+                ('neighbors', models.JSONField(default=list, verbose_name='相似书籍')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbor_lists', to='books.book', verbose_name='书籍')),
+            ],
+            options={
+                'verbose_name': '相似书籍',
+                'verbose_name_plural': '相似书籍',
+                'unique_together': {('book', 'kind')},
+            },
+        ),
+    ]
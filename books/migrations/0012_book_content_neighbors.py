@@ -0,0 +1,23 @@
+# Generated by Django 4.2.8 on 2026-10-18 15:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0011_book_neighbors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookneighbors',
+            name='signature',
+            field=models.CharField(blank=True, max_length=32, verbose_name='特征摘要'),
+        ),
+        migrations.AlterField(
+            model_name='bookneighbors',
+            name='kind',
+            field=models.CharField(choices=[('cooccurrence', '共同读者'), ('content', '内容相似')], max_length=20, verbose_name='类型'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.8 on 2026-10-18 15:18
+
+import re
+
+from django.db import migrations, models
+
+NON_WORD_RE = re.compile(r'[\W_]+')
+
+BATCH_SIZE = 1000
+
+
+def fill_title_pinyin(apps, schema_editor):
+    # 未安装 pypinyin 时留空，之后可以用 build_suggest_index --refresh-pinyin 补上
+    try:
+        from pypinyin import lazy_pinyin
+    except ImportError:
+        return
+    Book = apps.get_model('books', 'Book')
+    queryset = Book.objects.only('pk', 'title').order_by('pk')
+    # 按主键分块处理，内存占用与书籍总数无关
+    last_pk = 0
+    while True:
+        books = list(queryset.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not books:
+            return
+        last_pk = books[-1].pk
+        for book in books:
+            syllables = [word for item in lazy_pinyin(book.title) for word in NON_WORD_RE.split(item.lower()) if word]
+            book.title_pinyin = ''.join(syllables)[:64]
+            book.title_initials = ''.join(word[0] for word in syllables)[:64]
+        Book.objects.bulk_update(books, ['title_pinyin', 'title_initials'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0012_book_content_neighbors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='title_initials',
+            field=models.CharField(blank=True, max_length=64, verbose_name='书名拼音首字母'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='title_pinyin',
+            field=models.CharField(blank=True, max_length=64, verbose_name='书名拼音'),
+        ),
+        migrations.RunPython(fill_title_pinyin, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.8 on 2026-10-18 15:43
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+BATCH_SIZE = 1000
+
+
+def seed_rating_base(apps, schema_editor):
+    # 现有累计值扣除评论部分即为站外部分（0004 与初始数据按评分折算的值）
+    # 按主键分块处理，每块只聚合本块书籍的评论，内存占用与书籍总数无关
+    Book = apps.get_model('books', 'Book')
+    Comment = apps.get_model('books', 'Comment')
+    queryset = Book.objects.only('pk', 'rating_sum', 'reviews').order_by('pk')
+    last_pk = 0
+    while True:
+        books = list(queryset.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not books:
+            return
+        last_pk = books[-1].pk
+        comments = (
+            Comment.objects.filter(book_id__in=[book.pk for book in books]).order_by()
+            .values('book_id').annotate(total=Sum('rating'), count=Count('id'))
+        )
+        totals = {row['book_id']: (row['total'], row['count']) for row in comments}
+        for book in books:
+            total, count = totals.get(book.pk, (0, 0))
+            book.rating_sum_base = max(book.rating_sum - total, 0)
+            book.reviews_base = max(book.reviews - count, 0)
+        Book.objects.bulk_update(books, ['rating_sum_base', 'reviews_base'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0013_book_title_pinyin'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='rating_sum_base',
+            field=models.IntegerField(default=0, verbose_name='站外评分总和'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='reviews_base',
+            field=models.IntegerField(default=0, verbose_name='站外评价数'),
+        ),
+        migrations.RunPython(seed_rating_base, migrations.RunPython.noop),
+    ]
@@ -8,6 +8,7 @@ class Category(models.Model):
     name = models.CharField('分类名称', max_length=50, unique=True)
     slug = models.SlugField('URL标识', max_length=50, unique=True)
     description = models.TextField('描述', blank=True)
+    updated_at = models.DateTimeField('更新时间', auto_now=True)
     
     class Meta:
         verbose_name = '分类'
@@ -17,22 +18,57 @@ class Category(models.Model):
         return self.name
 
 
+COUNT_UNITS = (('亿', 100000000), ('万', 10000))
+
+
+def parse_count(text):
+    """把 '12.3万'、'1.2亿'、'1000' 这样的展示字符串解析为整数，无法解析时返回 0"""
+    text = str(text or '').strip().rstrip('+')
+    multiplier = 1
+    for unit, value in COUNT_UNITS:
+        if text.endswith(unit):
+            text, multiplier = text[:-len(unit)], value
+            break
+    try:
+        return max(round(float(text) * multiplier), 0)
+    except ValueError:
+        return 0
+
+
+def format_count(count):
+    """把整数格式化为 '12.3万' 这样的展示字符串"""
+    for unit, value in COUNT_UNITS:
+        if count >= value:
+            return f'{count / value:.1f}'.rstrip('0').rstrip('.') + unit
+    return str(count)
+
+
 class Book(models.Model):
     """书籍模型"""
     title = models.CharField('书名', max_length=200)
+    # 自动补全用，保存时由信号根据书名计算
+    title_pinyin = models.CharField('书名拼音', max_length=64, blank=True)
+    title_initials = models.CharField('书名拼音首字母', max_length=64, blank=True)
     author = models.CharField('作者', max_length=100)
     rating = models.FloatField('评分', default=0.0, validators=[MinValueValidator(0.0), MaxValueValidator(5.0)])
     reviews = models.IntegerField('评价数', default=0)
+    rating_sum = models.IntegerField('评分总和', default=0)
+    # 站外（初始数据、导入）的评价数与评分总和，评论带来的部分在此基础上累加
+    reviews_base = models.IntegerField('站外评价数', default=0)
+    rating_sum_base = models.IntegerField('站外评分总和', default=0)
     genre = models.CharField('类型', max_length=50)
     heat = models.IntegerField('热度', default=0)
-    reading = models.CharField('阅读人数', max_length=20, default='0')
+    heat_score = models.FloatField('热度分值', null=True, blank=True)
+    heat_updated_at = models.DateTimeField('热度更新时间', null=True, blank=True)
+    readers = models.PositiveIntegerField('阅读人数', default=0)
+    readers_base = models.PositiveIntegerField('历史阅读人数', default=0)
     cover = models.URLField('封面图片', max_length=500)
     description = models.TextField('简介')
     is_premium = models.BooleanField('会员专享', default=False)
     publisher = models.CharField('出版社', max_length=100, blank=True)
     publish_date = models.DateField('出版日期', null=True, blank=True)
     pages = models.IntegerField('页数', default=0)
-    isbn = models.CharField('ISBN', max_length=20, blank=True)
+    isbn = models.CharField('ISBN', max_length=20, unique=True, null=True, blank=True)
     categories = models.ManyToManyField(Category, related_name='books', blank=True, verbose_name='分类')
     created_at = models.DateTimeField('创建时间', auto_now_add=True)
     updated_at = models.DateTimeField('更新时间', auto_now=True)
@@ -41,9 +77,42 @@ class Book(models.Model):
         verbose_name = '书籍'
         verbose_name_plural = '书籍'
         ordering = ['-heat', '-rating']
+        indexes = [
+            models.Index(fields=['-heat', '-rating'], name='book_heat_rating_idx'),
+            models.Index(fields=['-rating', '-heat'], name='book_rating_heat_idx'),
+            models.Index(fields=['-heat', '-reviews'], name='book_heat_reviews_idx'),
+            models.Index(fields=['is_premium', '-heat', '-rating'], name='book_premium_heat_idx'),
+        ]
     
     def __str__(self):
         return self.title
+    
+    @property
+    def reading(self):
+        """阅读人数的展示字符串，兼容旧的 reading 字段"""
+        return format_count(self.readers)
+    
+    @reading.setter
+    def reading(self, value):
+        self.readers = self.readers_base = parse_count(value)
+    
+    def save(self, *args, **kwargs):
+        # ISBN 唯一，没有 ISBN 的书籍存为 NULL 以免互相冲突
+        if not self.isbn:
+            self.isbn = None
+        # 新建时给定的阅读人数是站外的历史数据，之后在此基础上累加独立读者数
+        if self._state.adding and not self.readers_base:
+            self.readers_base = self.readers
+        # 评价数与评分同理，没有给出评分总和时按评分折算
+        if self._state.adding and not self.reviews_base and self.reviews:
+            if not self.rating_sum:
+                self.rating_sum = round(self.rating * self.reviews)
+            self.reviews_base, self.rating_sum_base = self.reviews, self.rating_sum
+        # 书名拼音由 pre_save 信号随书名重新计算，只保存书名时一并保存
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'title' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'title_pinyin', 'title_initials'}
+        super().save(*args, **kwargs)
 
 
 class Comment(models.Model):
@@ -61,11 +130,38 @@ class Comment(models.Model):
         verbose_name = '评论'
         verbose_name_plural = '评论'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['book', '-created_at'], name='comment_book_created_idx'),
+            models.Index(fields=['user', '-created_at'], name='comment_user_created_idx'),
+        ]
     
     def __str__(self):
         return f'{self.user.username} 对 {self.book.title} 的评论'
 
 
+class CommentVote(models.Model):
+    """评论投票记录，每个用户对每条评论只能投一次"""
+    LIKE = 1
+    DISLIKE = -1
+    VALUE_CHOICES = [
+        (LIKE, '点赞'),
+        (DISLIKE, '点踩'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comment_votes', verbose_name='用户')
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='votes', verbose_name='评论')
+    value = models.SmallIntegerField('投票', choices=VALUE_CHOICES)
+    created_at = models.DateTimeField('投票时间', auto_now_add=True)
+    
+    class Meta:
+        verbose_name = '评论投票'
+        verbose_name_plural = '评论投票'
+        unique_together = ['user', 'comment']
+    
+    def __str__(self):
+        return f'{self.user.username} {self.get_value_display()} 评论{self.comment_id}'
+
+
 class BookShelf(models.Model):
     """用户书架"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookshelf', verbose_name='用户')
@@ -77,6 +173,9 @@ class BookShelf(models.Model):
         verbose_name_plural = '书架'
         unique_together = ['user', 'book']
         ordering = ['-added_at']
+        indexes = [
+            models.Index(fields=['user', '-added_at'], name='shelf_user_added_idx'),
+        ]
     
     def __str__(self):
         return f'{self.user.username} 的书架 - {self.book.title}'
@@ -94,6 +193,82 @@ class ReadingProgress(models.Model):
         verbose_name_plural = '阅读进度'
         unique_together = ['user', 'book']
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['user', '-updated_at'], name='progress_user_updated_idx'),
+        ]
     
     def __str__(self):
         return f'{self.user.username} 阅读 {self.book.title} - {self.progress}%'
+
+
+class ReaderSketch(models.Model):
+    """书籍独立读者的 HyperLogLog 草图，每本书每天一条，另有一条全部时间的"""
+    ALL = 'all'
+    
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='reader_sketches', verbose_name='书籍')
+    period = models.CharField('统计周期', max_length=10)  # 'YYYY-MM-DD' 或 'all'
+    registers = models.BinaryField('寄存器')
+    updated_at = models.DateTimeField('更新时间', auto_now=True)
+    
+    class Meta:
+        verbose_name = '读者草图'
+        verbose_name_plural = '读者草图'
+        unique_together = ['book', 'period']
+    
+    def __str__(self):
+        return f'{self.book_id} {self.period}'
+
+
+class BookNeighbors(models.Model):
+    """离线计算的相似书籍列表"""
+    COOCCURRENCE = 'cooccurrence'
+    CONTENT = 'content'
+    KIND_CHOICES = [
+        (COOCCURRENCE, '共同读者'),
+        (CONTENT, '内容相似'),
+    ]
+    
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='neighbor_lists', verbose_name='书籍')
+    kind = models.CharField('类型', max_length=20, choices=KIND_CHOICES)
+    # [[书籍 ID, 相似度], ...]，按相似度从高到低
+    neighbors = models.JSONField('相似书籍', default=list)
+    # 计算时书籍内容特征的摘要，内容相似书单增量刷新时据此找出内容变化的书籍
+    signature = models.CharField('特征摘要', max_length=32, blank=True)
+    updated_at = models.DateTimeField('更新时间', auto_now=True)
+    
+    class Meta:
+        verbose_name = '相似书籍'
+        verbose_name_plural = '相似书籍'
+        unique_together = ['book', 'kind']
+    
+    def __str__(self):
+        return f'{self.book_id} {self.get_kind_display()}'
+
+
+class BookSearchTerm(models.Model):
+    """书籍搜索倒排索引"""
+    term = models.CharField('词项', max_length=32)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='search_terms', verbose_name='书籍')
+    weight = models.IntegerField('权重', default=1)
+    
+    class Meta:
+        verbose_name = '搜索词项'
+        verbose_name_plural = '搜索词项'
+        unique_together = ['term', 'book']
+    
+    def __str__(self):
+        return f'{self.term} -> {self.book_id}'
+
+
+class BookCategoryIndex(models.Model):
+    """书籍所属分类键（类型与分类标识）的冗余表，按分类筛选时免去多对多联表与去重"""
+    key = models.CharField('分类键', max_length=50)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='category_keys', verbose_name='书籍')
+    
+    class Meta:
+        verbose_name = '书籍分类索引'
+        verbose_name_plural = '书籍分类索引'
+        unique_together = ['key', 'book']
+    
+    def __str__(self):
+        return f'{self.key} -> {self.book_id}'
@@ -0,0 +1,277 @@
+"""
+相似书籍离线计算
+
+依赖 numpy / scipy，只在管理命令中导入，Web 进程只读取计算结果（BookNeighbors）。
+
+共同读者（BookNeighbors.COOCCURRENCE）：把书架和阅读进度记录组成 书籍×用户 的 0/1 稀疏矩阵 X，
+两本书的共同读者数即 X·Xᵀ 的元素，相似度取余弦 共同读者数 / sqrt(读者数ᵢ × 读者数ⱼ)。
+
+内容相似（BookNeighbors.CONTENT）：书名、简介按搜索同样的规则切成中文二元组 / 英文单词，
+再加上作者、类型、分类特征，经特征哈希映射到固定维数后计算 TF-IDF 向量（行归一化），
+相似度即向量点积。书籍内容变化后可以增量刷新：只重算内容变化的书籍的书单，
+并把它们与其余书籍的新相似度合并进其余书籍已有的书单（IDF 沿用本次全量的统计，下次全量时校正）。
+
+两种相似度都按书籍分块计算 左矩阵[块]·右矩阵，每本书只保留相似度最高的 top_k 本；
+分块可以在进程池中并行，子进程通过 fork 继承矩阵，不需要序列化传递。
+"""
+import hashlib
+import math
+import multiprocessing
+import zlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.db import connections, transaction
+from django.utils import timezone
+from scipy import sparse
+
+from .models import Book, BookNeighbors, BookShelf, ReadingProgress
+from .search import iter_terms
+
+# 内容特征哈希后的维数
+CONTENT_DIMENSIONS = 1 << 20
+
+# 内容特征权重：书名、简介按词项出现次数计，作者、类型、分类各算一个特征
+CONTENT_WEIGHTS = {
+    'title': 2.0,
+    'description': 1.0,
+    'author': 3.0,
+    'genre': 2.0,
+    'category': 2.0,
+}
+
+# 进程池任务共用的矩阵，在创建进程池之前设置
+_state = {}
+
+
+def interaction_matrix():
+    """返回 (书籍 ID 数组, 书籍×用户 的 0/1 CSR 矩阵)"""
+    pairs = np.array(
+        [
+            *BookShelf.objects.values_list('book_id', 'user_id'),
+            *ReadingProgress.objects.values_list('book_id', 'user_id'),
+        ],
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    book_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+    _, columns = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (rows, columns)),
+        shape=(len(book_ids), columns.max() + 1 if len(pairs) else 0),
+    )
+    # 同一用户既在书架又有阅读进度时会累加成 2
+    matrix.data[:] = 1
+    return book_ids, matrix
+
+
+def _top_neighbors(bounds):
+    """
+    计算左矩阵 [start, end) 行的相似书单，返回 [(书籍 ID, [[书籍 ID, 相似度], ...]), ...]。
+    相似度 = 左矩阵行·右矩阵列 / (norms[行] × norms[列])，点积小于 min_value 的不算相似。
+    """
+    start, end = bounds
+    book_ids, rows, norms = _state['book_ids'], _state['rows'], _state['norms']
+    top_k, min_value = _state['top_k'], _state['min_value']
+    products = (_state['left'][start:end] @ _state['right']).tocsr()
+    results = []
+    for offset in range(end - start):
+        row = rows[start + offset]
+        lo, hi = products.indptr[offset], products.indptr[offset + 1]
+        columns, values = products.indices[lo:hi], products.data[lo:hi]
+        keep = (columns != row) & (values >= min_value)
+        columns, values = columns[keep], values[keep]
+        if not len(columns):
+            continue
+        scores = values / (norms[row] * norms[columns])
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            columns, scores = columns[best], scores[best]
+        # 相似度相同的按书籍 ID 排序，结果稳定
+        order = np.lexsort((book_ids[columns], -scores))
+        results.append((
+            int(book_ids[row]),
+            [[int(book_ids[column]), round(float(score), 4)] for column, score in zip(columns[order], scores[order])],
+        ))
+    return results
+
+
+def _compute(book_ids, left, rows, right, norms, top_k, min_value, chunk_size, workers):
+    """分块（可并行）计算 left 各行的相似书单，rows 为 left 各行在 book_ids 中的位置"""
+    _state.update(
+        book_ids=book_ids, left=left, rows=rows, right=right, norms=norms,
+        top_k=top_k, min_value=min_value,
+    )
+    chunks = [(start, min(start + chunk_size, left.shape[0])) for start in range(0, left.shape[0], chunk_size)]
+    try:
+        if workers <= 1 or len(chunks) <= 1:
+            results = [_top_neighbors(chunk) for chunk in chunks]
+        else:
+            # 子进程不能共用父进程的数据库连接
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                results = list(executor.map(_top_neighbors, chunks))
+    finally:
+        _state.clear()
+    return [row for chunk in results for row in chunk]
+
+
+def replace_neighbors(kind, rows, signatures=None, batch_size=1000):
+    """用 rows（[(书籍 ID, 相似书单), ...]）整体替换某一类型的相似书单"""
+    signatures = signatures or {}
+    existing = set(Book.objects.filter(pk__in=[book_id for book_id, _ in rows]).values_list('pk', flat=True))
+    with transaction.atomic():
+        BookNeighbors.objects.filter(kind=kind).delete()
+        BookNeighbors.objects.bulk_create(
+            [
+                BookNeighbors(book_id=book_id, kind=kind, neighbors=neighbors, signature=signatures.get(book_id, ''))
+                for book_id, neighbors in rows if book_id in existing
+            ],
+            batch_size=batch_size,
+        )
+
+
+def build_cooccurrence(top_k=50, min_common=1, chunk_size=1000, workers=1):
+    """计算共同读者相似书单并写入 BookNeighbors，返回 (书籍数, 有相似书单的书籍数)"""
+    book_ids, matrix = interaction_matrix()
+    norms = np.sqrt(np.asarray(matrix.sum(axis=1)).ravel())
+    rows = _compute(
+        book_ids, matrix, np.arange(len(book_ids)), matrix.T.tocsr(), norms,
+        top_k, min_common, chunk_size, workers,
+    )
+    replace_neighbors(BookNeighbors.COOCCURRENCE, rows)
+    return len(book_ids), len(rows)
+
+
+def content_features(title, author, genre, description, categories):
+    """一本书的内容特征 {特征: 词频权重}"""
+    features = Counter()
+    for field, text in (('title', title), ('description', description)):
+        for term, count in Counter(iter_terms(text)).items():
+            features[term] += CONTENT_WEIGHTS[field] * (1 + math.log(count))
+    for field, values in (('author', [author]), ('genre', [genre]), ('category', categories)):
+        for value in values:
+            if value:
+                features[f'{field}:{value.strip().lower()}'] += CONTENT_WEIGHTS[field]
+    return features
+
+
+def _signature(features):
+    return hashlib.md5(repr(sorted(features.items())).encode()).hexdigest()
+
+
+def content_matrix():
+    """返回 (书籍 ID 数组, 行归一化的 TF-IDF CSR 矩阵, {书籍 ID: 特征摘要})"""
+    categories = {}
+    for book_id, slug in Book.categories.through.objects.values_list('book_id', 'category__slug'):
+        categories.setdefault(book_id, []).append(slug)
+    books = Book.objects.order_by('pk').values_list('pk', 'title', 'author', 'genre', 'description')
+
+    book_ids, signatures = [], {}
+    rows, columns, values = [], [], []
+    for row, (book_id, title, author, genre, description) in enumerate(books.iterator(chunk_size=2000)):
+        features = content_features(title, author, genre, description, sorted(categories.get(book_id, [])))
+        book_ids.append(book_id)
+        signatures[book_id] = _signature(features)
+        for feature, weight in features.items():
+            rows.append(row)
+            columns.append(zlib.crc32(feature.encode()) % CONTENT_DIMENSIONS)
+            values.append(weight)
+
+    matrix = sparse.csr_matrix(
+        (np.array(values, dtype=np.float32), (np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64))),
+        shape=(len(book_ids), CONTENT_DIMENSIONS),
+    )
+    matrix.sum_duplicates()
+    # IDF：出现在越多书籍中的特征权重越低
+    document_frequency = np.bincount(matrix.indices, minlength=CONTENT_DIMENSIONS)
+    idf = np.log((1 + len(book_ids)) / (1 + document_frequency)) + 1
+    matrix.data *= idf[matrix.indices].astype(np.float32)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix = sparse.diags(1 / norms).astype(np.float32) @ matrix
+    return np.array(book_ids, dtype=np.int64), matrix.tocsr(), signatures
+
+
+def _merge_lists(lists, changed, removed, book_ids, similarities, top_k):
+    """
+    把内容变化的书籍与其余书籍的新相似度合并进其余书籍已有的书单，返回有变化的 {书籍 ID: 书单}。
+    similarities 为 全部书籍×变化书籍 的相似度矩阵，列顺序与 changed 一致。
+    """
+    changed_ids = set(changed)
+    stale = changed_ids | removed
+    merged = {}
+    for row, book_id in enumerate(book_ids.tolist()):
+        if book_id in changed_ids or book_id not in lists:
+            continue
+        lo, hi = similarities.indptr[row], similarities.indptr[row + 1]
+        fresh = [
+            [changed[column], round(float(score), 4)]
+            for column, score in zip(similarities.indices[lo:hi], similarities.data[lo:hi])
+        ]
+        old = lists[book_id]
+        kept = [item for item in old if item[0] not in stale]
+        if not fresh and len(kept) == len(old):
+            continue
+        neighbors = sorted(kept + fresh, key=lambda item: (-item[1], item[0]))[:top_k]
+        if neighbors != old:
+            merged[book_id] = neighbors
+    return merged
+
+
+def build_content(top_k=20, chunk_size=256, workers=1, incremental=False):
+    """
+    计算内容相似书单并写入 BookNeighbors，返回 (书籍数, 重新计算的书籍数)。
+    incremental 时只重算内容变化（或新增）的书籍，并更新受其影响的其余书籍的书单。
+    """
+    kind = BookNeighbors.CONTENT
+    book_ids, matrix, signatures = content_matrix()
+    norms = np.ones(len(book_ids), dtype=np.float32)
+    transposed = matrix.T.tocsr()
+    stored = {}
+    if incremental:
+        stored = {
+            book_id: (signature, neighbors)
+            for book_id, signature, neighbors in BookNeighbors.objects.filter(kind=kind)
+            .values_list('book_id', 'signature', 'neighbors')
+        }
+    positions = [
+        i for i, book_id in enumerate(book_ids.tolist())
+        if book_id not in stored or stored[book_id][0] != signatures[book_id]
+    ]
+    removed = {item[0] for _, neighbors in stored.values() for item in neighbors} - set(book_ids.tolist())
+
+    # 没有相似书籍的也保存一行（空书单），记下特征摘要
+    changed = [int(book_ids[i]) for i in positions]
+    rows = dict.fromkeys(changed, [])
+    if positions:
+        rows.update(_compute(
+            book_ids, matrix[positions], np.array(positions, dtype=np.int64), transposed, norms,
+            top_k, 1e-6, chunk_size, workers,
+        ))
+    if not incremental:
+        replace_neighbors(kind, list(rows.items()), signatures)
+        return len(book_ids), len(changed)
+    if not changed and not removed:
+        return len(book_ids), 0
+
+    similarities = (matrix @ matrix[positions].T).tocsr() if positions else sparse.csr_matrix((len(book_ids), 0))
+    similarities.data[similarities.data < 1e-6] = 0
+    similarities.eliminate_zeros()
+    merged = _merge_lists(
+        {book_id: neighbors for book_id, (_, neighbors) in stored.items()},
+        changed, removed, book_ids, similarities, top_k,
+    )
+    now = timezone.now()
+    with transaction.atomic():
+        BookNeighbors.objects.filter(kind=kind, book_id__in=changed).delete()
+        BookNeighbors.objects.bulk_create([
+            BookNeighbors(book_id=book_id, kind=kind, neighbors=neighbors, signature=signatures[book_id])
+            for book_id, neighbors in rows.items()
+        ], batch_size=1000)
+        updates = list(BookNeighbors.objects.filter(kind=kind, book_id__in=merged).only('pk', 'book_id'))
+        for item in updates:
+            item.neighbors, item.updated_at = merged[item.book_id], now
+        BookNeighbors.objects.bulk_update(updates, ['neighbors', 'updated_at'], batch_size=1000)
+    return len(book_ids), len(changed)
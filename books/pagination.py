@@ -0,0 +1,129 @@
+"""
+分页
+
+默认仍按页码分页；请求带上 cursor 参数（第一页传空值 ?cursor=）时改用键集（游标）分页：
+按 keyset_ordering 中的字段组合定位下一页，不再执行 OFFSET 和 COUNT(*)，翻到多深都一样快。
+游标分页时可以加 with_count=1 获取总数，该总数来自缓存，是近似值。
+"""
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def keyset_after(ordering, position):
+    """严格排在 position 之后的行：按 ordering 中的字段做字典序比较"""
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, position):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    return condition
+
+
+class KeysetPagination(PageNumberPagination):
+    """页码分页 + 可选的键集分页"""
+    # 键集排序字段，最后一个字段必须唯一（通常是 id）
+    keyset_ordering = ('-id',)
+    cursor_query_param = 'cursor'
+    count_query_param = 'with_count'
+    count_cache_timeout = 60
+    invalid_cursor_message = '无效的游标'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_keyset = self.cursor_query_param in request.query_params
+        if not self.use_keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        self.total = None
+        if request.query_params.get(self.count_query_param):
+            self.total = self.get_approximate_count(queryset, request)
+
+        queryset = queryset.order_by(*self.keyset_ordering)
+        position = self.decode_cursor(queryset.model, request.query_params[self.cursor_query_param])
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+
+        rows = list(queryset[:page_size + 1])
+        self.next_position = self.encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+        return rows[:page_size]
+
+    def get_paginated_response(self, data):
+        if not self.use_keyset:
+            return super().get_paginated_response(data)
+        payload = {'next': self.get_next_link(), 'results': data}
+        if self.total is not None:
+            payload = {'count': self.total, **payload}
+        return Response(payload)
+
+    def get_next_link(self):
+        if not self.use_keyset:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_position)
+
+    def after(self, position):
+        return keyset_after(self.keyset_ordering, position)
+
+    def encode_cursor(self, row):
+        """row 为模型实例或 values() 取出的字典"""
+        values = []
+        for ordering in self.keyset_ordering:
+            name = ordering.lstrip('-')
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, model, cursor):
+        if not cursor:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(values) != len(self.keyset_ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(ordering.lstrip('-')).to_python(value)
+                for ordering, value in zip(self.keyset_ordering, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_approximate_count(self, queryset, request):
+        """按筛选条件缓存的总数，过期前不会重新 COUNT"""
+        params = sorted(
+            (key, value) for key, value in request.query_params.lists()
+            if key not in (self.cursor_query_param, self.count_query_param, self.page_query_param)
+        )
+        digest = hashlib.md5(json.dumps([request.path, params]).encode()).hexdigest()
+        key = f'pagination:count:{digest}'
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, self.count_cache_timeout)
+        return count
+
+
+class BookPagination(KeysetPagination):
+    """书籍分页，游标按 (heat, rating, id) 降序"""
+    keyset_ordering = ('-heat', '-rating', '-id')
+
+
+class CommentPagination(KeysetPagination):
+    """评论分页，游标按 (created_at, id) 降序"""
+    keyset_ordering = ('-created_at', '-id')
@@ -0,0 +1,106 @@
+"""
+阅读进度写后缓冲
+
+阅读器每隔几秒上报一次进度。开启 READING_PROGRESS_WRITE_BEHIND 后，上报只写入内存缓冲，
+同一 (用户, 书籍) 只保留最新进度，定期合并成一条批量 upsert 落库。
+缓冲区按用户建有索引，读取某个用户的进度时把该用户尚未落库的数据叠加到查询结果上，
+保证用户能读到自己刚写入的进度，读请求本身不落库；修改、删除某条进度前才写入该用户的缓冲。
+
+缓冲区在每个进程各自的内存中，上述读己之写只对同一进程缓冲的上报有效：多进程部署时，
+读请求落到另一个进程，最多会读到 READING_PROGRESS_FLUSH_INTERVAL 秒之前的进度。
+Web 服务进程中由后台线程按该间隔定时落库，空闲进程中的最后一次上报不会一直留在内存里；
+进程被强制结束（如 SIGKILL）时仍会丢失最后一个间隔内的上报。
+"""
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+
+from .buffers import BackgroundFlusher, WriteBehindBuffer
+from .models import Book, ReadingProgress
+
+
+def flush_progress(items):
+    """批量写入进度，items 为 {(user_id, book_id): (progress, 上报时间)}"""
+    # 缓冲期间被删除的书籍不再写入，避免整批因外键失败而反复重试
+    book_ids = {book_id for _, book_id in items}
+    existing = set(Book.objects.filter(pk__in=book_ids).values_list('pk', flat=True))
+    ReadingProgress.objects.bulk_create(
+        [
+            ReadingProgress(user_id=user_id, book_id=book_id, progress=progress)
+            for (user_id, book_id), (progress, _) in items.items()
+            if book_id in existing
+        ],
+        update_conflicts=True,
+        unique_fields=['user', 'book'],
+        update_fields=['progress', 'updated_at'],
+    )
+
+
+progress_buffer = WriteBehindBuffer(
+    'reading_progress',
+    flush_progress,
+    merge=lambda old, new: new,
+    interval=settings.READING_PROGRESS_FLUSH_INTERVAL,
+    group=lambda key: key[0],
+)
+
+progress_flusher = BackgroundFlusher(progress_buffer, interval=settings.READING_PROGRESS_FLUSH_INTERVAL)
+
+
+def enable_background_flush():
+    """在 Web 服务进程中开启后台落库（线程在本进程第一次上报进度时启动）"""
+    progress_flusher.enabled = True
+
+
+def record_progress(user_id, book_id, progress):
+    """记录一次进度上报"""
+    if settings.READING_PROGRESS_WRITE_BEHIND:
+        progress_buffer.add((user_id, book_id), (progress, timezone.now()))
+        progress_flusher.ensure_started()
+    else:
+        ReadingProgress.objects.update_or_create(
+            user_id=user_id, book_id=book_id, defaults={'progress': progress}
+        )
+
+
+def pending_for_user(user_id):
+    """某个用户尚未落库的进度 {book_id: (progress, 上报时间)}，按上报时间从近到远"""
+    items = sorted(progress_buffer.pending(user_id).items(), key=lambda item: item[1][1], reverse=True)
+    return {book_id: value for (_, book_id), value in items}
+
+
+def overlay_pending(queryset, user_id):
+    """
+    把用户尚未落库的进度叠加到该用户的进度 queryset 上，返回 (pending_rows, rest)。
+    pending_rows 是带最新进度的 ReadingProgress（还没有落库的 id 为 None），
+    rest 是排除了这些书籍的 queryset。尚未落库的进度比库中的都新，按 -updated_at 排序时排在最前面。
+    """
+    pending = pending_for_user(user_id)
+    if not pending:
+        return [], queryset
+    rows = {row.book_id: row for row in queryset.filter(book_id__in=pending)}
+    missing = [book_id for book_id in pending if book_id not in rows]
+    created = []
+    if missing:
+        # 缓冲期间被删除的书籍不会落库，这里也不返回
+        books = Book.objects.in_bulk(missing)
+        created = [
+            ReadingProgress(user_id=user_id, book=books[book_id])
+            for book_id in missing if book_id in books
+        ]
+        prefetch_related_objects(created, *queryset._prefetch_related_lookups)
+        rows.update((row.book_id, row) for row in created)
+    pending_rows = []
+    for book_id, (progress, reported_at) in pending.items():
+        row = rows.get(book_id)
+        if row is not None:
+            row.progress, row.updated_at = progress, reported_at
+            pending_rows.append(row)
+    return pending_rows, queryset.exclude(book_id__in=list(pending))
+
+
+def flush_user(user_id):
+    """写入某个用户尚未落库的进度"""
+    keys = list(progress_buffer.pending(user_id))
+    if keys:
+        progress_buffer.flush(keys)
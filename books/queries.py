@@ -0,0 +1,84 @@
+"""
+查询规划
+
+根据序列化器声明的嵌套结构自动为 queryset 加上 select_related / prefetch_related，
+避免列表接口逐行查询关联对象（N+1）；以及书籍列表通用的筛选条件。
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+from .membership import books_in_category
+
+
+def _relation(model, name):
+    """返回 model 上名为 name 的关联字段，不是关联字段时返回 None"""
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    return field if field.is_relation else None
+
+
+def _walk(serializer, model, prefix, in_prefetch, select, prefetch):
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        attrs = field.source_attrs
+        # 形如 source='user.username' 的字段，最后一段是普通属性
+        if not isinstance(nested, serializers.BaseSerializer):
+            attrs = attrs[:-1]
+
+        current_model, path, many = model, prefix, in_prefetch
+        for attr in attrs:
+            relation = _relation(current_model, attr)
+            if relation is None:
+                break
+            path = f'{path}__{attr}' if path else attr
+            many = many or relation.many_to_many or relation.one_to_many
+            (prefetch if many else select).add(path)
+            current_model = relation.related_model
+        else:
+            if isinstance(nested, serializers.BaseSerializer) and attrs:
+                _walk(nested, current_model, path, many, select, prefetch)
+
+
+@lru_cache(maxsize=None)
+def get_plan(serializer_class):
+    """计算序列化器需要的 (select_related, prefetch_related) 路径"""
+    serializer = serializer_class()
+    select, prefetch = set(), set()
+    _walk(serializer, serializer.Meta.model, '', False, select, prefetch)
+    # 只保留最长的路径，select_related('book__x') 已经包含 'book'
+    select = {p for p in select if not any(o.startswith(p + '__') for o in select)}
+    return tuple(sorted(select)), tuple(sorted(prefetch))
+
+
+def plan_queryset(queryset, serializer_class):
+    """按序列化器的嵌套结构为 queryset 预加载关联对象"""
+    select, prefetch = get_plan(serializer_class)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+def parse_is_premium(value):
+    """解析 is_premium 查询参数，未传时返回 None"""
+    if value is None:
+        return None
+    return value.lower() == 'true'
+
+
+def filter_books(queryset, category=None, is_premium=None):
+    """按分类（类型或分类标识）和是否会员专享筛选书籍"""
+    if category:
+        # 走冗余的分类键表做半连接，不联多对多表，也就不需要 DISTINCT
+        queryset = queryset.filter(pk__in=books_in_category(category))
+    if is_premium is not None:
+        queryset = queryset.filter(is_premium=is_premium)
+    return queryset
@@ -0,0 +1,162 @@
+"""
+书籍独立读者数
+
+用户上报阅读进度或把书加入书架时记一次该用户读过这本书。记录先按 (书籍, 日期) 并入内存中的
+HyperLogLog 草图放进写后缓冲，落库时再并入 ReaderSketch 中当天和全部时间两份草图（每份 1KB，
+内存和数据库占用都不随读者人数增长），然后把 Book.readers 更新为 历史阅读人数 + 全部时间草图的估计值。
+每天一份的草图用于统计最近若干天的独立读者数（unique_readers）。
+
+落库由后台线程每 READERS_FLUSH_INTERVAL 秒执行一次，请求线程只修改内存。后台线程只在 Web 服务进程中开启
+（wsgi.py / asgi.py 调用 enable_background_flush），其余场景需要时显式调用 readers_buffer.flush()，
+进程退出时也会写回。缓冲区在每个进程各自的内存中。
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import response_cache
+from .buffers import BackgroundFlusher, WriteBehindBuffer
+from .hll import HyperLogLog
+from .models import Book, BookShelf, ReaderSketch, ReadingProgress
+from .progress import progress_buffer
+
+
+def _load(sketch):
+    return HyperLogLog(bytes(sketch.registers))
+
+
+def _empty_registers():
+    return bytes(HyperLogLog())
+
+
+def apply_readers(items):
+    """把读者并入草图，items 为 {(book_id, 日期): HyperLogLog}"""
+    book_ids = {book_id for book_id, _ in items}
+    users = dict(items)
+    for (book_id, _), hll in items.items():
+        users.setdefault((book_id, ReaderSketch.ALL), HyperLogLog()).merge(hll)
+
+    with transaction.atomic():
+        # 缓冲期间被删除的书籍不再写入
+        existing = set(Book.objects.filter(pk__in=book_ids).values_list('pk', flat=True))
+        # 先补齐缺少的草图行，再统一加锁合并，多个进程同时写回时不会互相覆盖
+        ReaderSketch.objects.bulk_create(
+            [
+                ReaderSketch(book_id=book_id, period=period, registers=_empty_registers())
+                for book_id, period in users if book_id in existing
+            ],
+            ignore_conflicts=True,
+        )
+        sketches = ReaderSketch.objects.select_for_update().filter(
+            book_id__in=existing, period__in={period for _, period in users}
+        )
+        changed, totals = [], {}
+        # bulk_update 不会自动填写 auto_now 字段
+        now = timezone.now()
+        for sketch in sketches:
+            key = (sketch.book_id, sketch.period)
+            if key not in users:
+                continue
+            hll = _load(sketch)
+            before = bytes(hll)
+            if bytes(hll.merge(users[key])) != before:
+                sketch.registers = bytes(hll)
+                sketch.updated_at = now
+                changed.append(sketch)
+            if sketch.period == ReaderSketch.ALL:
+                totals[sketch.book_id] = hll.count()
+        ReaderSketch.objects.bulk_update(changed, ['registers', 'updated_at'])
+        updated = _set_readers(totals)
+    response_cache.invalidate_books(updated)
+
+
+def _set_readers(totals):
+    """按全部时间草图的估计值更新 Book.readers，返回有变化的书籍 ID"""
+    now = timezone.now()
+    books = []
+    for book in Book.objects.filter(pk__in=totals).only('pk', 'readers', 'readers_base'):
+        readers = book.readers_base + totals[book.pk]
+        if readers != book.readers:
+            book.readers, book.updated_at = readers, now
+            books.append(book)
+    Book.objects.bulk_update(books, ['readers', 'updated_at'])
+    return [book.pk for book in books]
+
+
+readers_buffer = WriteBehindBuffer(
+    'readers',
+    apply_readers,
+    merge=lambda old, new: old.merge(new),
+    interval=float('inf'),
+)
+
+
+def record(book_id, user_id):
+    """记录一位读者，只修改内存缓冲"""
+    hll = HyperLogLog()
+    hll.add(user_id)
+    readers_buffer.add((int(book_id), timezone.localdate().isoformat()), hll)
+    readers_flusher.ensure_started()
+
+
+readers_flusher = BackgroundFlusher(readers_buffer, interval=settings.READERS_FLUSH_INTERVAL)
+
+
+def enable_background_flush():
+    """在 Web 服务进程中开启后台落库（线程在本进程第一次记录读者时启动）"""
+    readers_flusher.enabled = True
+
+
+def unique_readers(book_id, days=None):
+    """估计一本书的独立读者数，days 为空时统计全部时间，否则统计最近 days 天（含今天）"""
+    if days is None:
+        periods = [ReaderSketch.ALL]
+    else:
+        today = timezone.localdate()
+        periods = [(today - timedelta(days=offset)).isoformat() for offset in range(days)]
+    hll = HyperLogLog()
+    for registers in ReaderSketch.objects.filter(book_id=book_id, period__in=periods).values_list('registers', flat=True):
+        hll.merge(HyperLogLog(bytes(registers)))
+    return hll.count()
+
+
+def rebuild(chunk_size=1000):
+    """按现有的阅读进度和书架记录重建全部草图与阅读人数，返回处理的书籍数量"""
+    progress_buffer.flush()
+    readers_buffer.flush()
+    count = 0
+    last_pk = 0
+    while True:
+        book_ids = list(
+            Book.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not book_ids:
+            break
+        last_pk = book_ids[-1]
+        count += len(book_ids)
+        # 阅读进度只保留了最后一次上报的时间，按该日期计入
+        activity = [
+            *ReadingProgress.objects.filter(book_id__in=book_ids).values_list('book_id', 'user_id', 'updated_at'),
+            *BookShelf.objects.filter(book_id__in=book_ids).values_list('book_id', 'user_id', 'added_at'),
+        ]
+        sketches = {}
+        for book_id, user_id, at in activity:
+            day = timezone.localdate(at).isoformat()
+            for period in (day, ReaderSketch.ALL):
+                sketches.setdefault((book_id, period), HyperLogLog()).add(user_id)
+        with transaction.atomic():
+            ReaderSketch.objects.filter(book_id__in=book_ids).delete()
+            ReaderSketch.objects.bulk_create([
+                ReaderSketch(book_id=book_id, period=period, registers=bytes(hll))
+                for (book_id, period), hll in sketches.items()
+            ], batch_size=1000)
+            totals = {book_id: 0 for book_id in book_ids}
+            totals.update({
+                book_id: hll.count()
+                for (book_id, period), hll in sketches.items() if period == ReaderSketch.ALL
+            })
+            updated = _set_readers(totals)
+        response_cache.invalidate_books(updated)
+    return count
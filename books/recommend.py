@@ -0,0 +1,97 @@
+"""
+个性化推荐
+
+登录用户的推荐书单：取其最近加入书架 / 上报进度的书籍，合并这些书在 BookNeighbors 中预先算好的
+共同读者相似书单（相似度按书籍累加，排除已读过的书），取前 FEED_SIZE 本；
+不足时依次用兴趣分类（UserProfile.interests）和全站的推荐书单补齐。
+请求中只有几次按主键 / 索引的查询，没有矩阵运算；相似书单由 build_recommendations 命令离线计算。
+
+书籍详情页的相似书籍直接读取该书的内容相似书单（build_similar_books 命令离线计算），
+还没有计算过的书籍退回到同类型的热门书籍。
+"""
+from collections import defaultdict
+
+from . import feeds
+from .fastpath import serialize
+from .models import Book, BookNeighbors, BookShelf, ReadingProgress
+from .progress import pending_for_user as pending_progress
+from .queries import filter_books, plan_queryset
+from .serializers import BookSerializer
+
+# 参与推荐的最近阅读记录数量
+HISTORY_SIZE = 50
+
+# 相似书籍的默认与最大返回数量
+SIMILAR_SIZE = 10
+MAX_SIMILAR_SIZE = 20
+
+
+def reading_history(user_id):
+    """用户最近读过的书籍 ID（书架与阅读进度，含尚未落库的进度），按时间从近到远"""
+    history = list(pending_progress(user_id))
+    history += ReadingProgress.objects.filter(user_id=user_id).order_by('-updated_at') \
+        .values_list('book_id', flat=True)[:HISTORY_SIZE]
+    history += BookShelf.objects.filter(user_id=user_id).order_by('-added_at') \
+        .values_list('book_id', flat=True)[:HISTORY_SIZE]
+    return list(dict.fromkeys(history))[:HISTORY_SIZE]
+
+
+def rank_candidates(book_ids, kind=BookNeighbors.COOCCURRENCE):
+    """合并 book_ids 的相似书单，返回按累加相似度从高到低排列的候选书籍 ID（不含 book_ids 本身）"""
+    seen = set(book_ids)
+    scores = defaultdict(float)
+    lists = BookNeighbors.objects.filter(book_id__in=book_ids, kind=kind).values_list('neighbors', flat=True)
+    for neighbors in lists:
+        for book_id, score in neighbors:
+            if book_id not in seen:
+                scores[book_id] += score
+    return sorted(scores, key=lambda book_id: (-scores[book_id], book_id))
+
+
+def _interests(user):
+    profile = getattr(user, 'profile', None)
+    interests = getattr(profile, 'interests', None) or []
+    return [interest for interest in interests if isinstance(interest, str) and interest]
+
+
+def recommend(user, category=None, is_premium=None):
+    """返回用户的推荐书单（序列化结果）"""
+    history = reading_history(user.pk)
+    data = []
+    if history:
+        ranked = rank_candidates(history)[:feeds.FEED_SIZE * 5]
+        if ranked:
+            queryset = filter_books(Book.objects.filter(pk__in=ranked), category=category, is_premium=is_premium)
+            books = {book.pk: book for book in plan_queryset(queryset, BookSerializer)}
+            data = serialize([books[pk] for pk in ranked if pk in books][:feeds.FEED_SIZE], BookSerializer)
+    if len(data) >= feeds.FEED_SIZE:
+        return data
+
+    # 用缓存的推荐书单补齐：指定了分类时只用该分类，否则先兴趣分类再全站
+    exclude = set(history) | {item['id'] for item in data}
+    fallbacks = [category] if category else [*_interests(user), None]
+    for fallback in fallbacks:
+        for item in feeds.get_feed('recommended', category=fallback, is_premium=is_premium):
+            if item['id'] not in exclude:
+                exclude.add(item['id'])
+                data.append(item)
+                if len(data) >= feeds.FEED_SIZE:
+                    return data
+    return data
+
+
+def _books_in_order(book_ids):
+    books = plan_queryset(Book.objects.filter(pk__in=book_ids), BookSerializer).in_bulk()
+    return [books[pk] for pk in book_ids if pk in books]
+
+
+def similar(book, limit=SIMILAR_SIZE):
+    """返回与 book 内容相似的书籍（序列化结果）"""
+    neighbors = BookNeighbors.objects.filter(book=book, kind=BookNeighbors.CONTENT) \
+        .values_list('neighbors', flat=True).first()
+    if neighbors is None:
+        queryset = filter_books(Book.objects.exclude(pk=book.pk), category=book.genre)
+        books = plan_queryset(queryset.order_by('-heat', '-rating'), BookSerializer)[:limit]
+    else:
+        books = _books_in_order([book_id for book_id, _ in neighbors[:limit]])
+    return serialize(books, BookSerializer)
@@ -0,0 +1,138 @@
+"""
+书籍详情 / 分类接口的响应缓存
+
+缓存键 = 作用域 + 作用域版本号 + 规范化后的 URL（路径与排序后的查询参数）。
+书籍、分类或书籍分类关联变化时由信号只递增受影响作用域（book:<id>、category:<slug>、categories）
+的版本号，旧条目不再被读到，随 RESPONSE_CACHE_TTL 自然过期。
+版本号用随机值而不是自增计数：版本号被缓存淘汰后重新生成的值不会与旧条目撞上。
+
+缓存后端即 Django 的 default 缓存：单机用进程内存缓存，多实例部署时配置为共享缓存（如 Redis）。
+命中/未命中次数同样记在缓存里，cache_stats 命令读取。
+未命中时的重建查询走主库，不会把副本上尚未同步的旧数据按新版本号缓存下来。
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+from bookhub_backend.db_router import use_primary
+
+SCOPE_TYPES = ('book', 'category', 'categories')
+STATS_KEYS = ('hits', 'misses')
+
+
+def _version_key(scope):
+    return f'rc:version:{scope}'
+
+
+def _stats_key(scope_type, name):
+    return f'rc:stats:{scope_type}:{name}'
+
+
+def get_version(scope):
+    version = cache.get(_version_key(scope))
+    if version is None:
+        cache.add(_version_key(scope), uuid.uuid4().hex, None)
+        version = cache.get(_version_key(scope))
+    return version
+
+
+def invalidate(*scopes):
+    """更换若干作用域的版本号，使其下的缓存条目全部失效"""
+    if scopes:
+        cache.set_many({_version_key(scope): uuid.uuid4().hex for scope in scopes}, None)
+
+
+def invalidate_books(book_ids):
+    invalidate(*(f'book:{book_id}' for book_id in book_ids))
+
+
+def cache_key(scope, request):
+    """规范化 URL（查询参数排序）后生成缓存键"""
+    # 分页链接是绝对地址，所以带上协议和主机名
+    query = sorted(request.GET.lists())
+    url = f'{request.build_absolute_uri(request.path)}?{query}'
+    digest = hashlib.md5(url.encode()).hexdigest()
+    return f'rc:{scope}:{get_version(scope)}:{digest}'
+
+
+def _record(scope, name):
+    key = _stats_key(scope.split(':', 1)[0], name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def stats():
+    """按作用域类型返回 {类型: {'hits': n, 'misses': n, 'hitRatio': r}}"""
+    result = {}
+    for scope_type in SCOPE_TYPES:
+        values = cache.get_many([_stats_key(scope_type, name) for name in STATS_KEYS])
+        hits = values.get(_stats_key(scope_type, 'hits'), 0)
+        misses = values.get(_stats_key(scope_type, 'misses'), 0)
+        total = hits + misses
+        result[scope_type] = {
+            'hits': hits,
+            'misses': misses,
+            'hitRatio': round(hits / total, 4) if total else 0,
+        }
+    return result
+
+
+def reset_stats():
+    cache.delete_many([
+        _stats_key(scope_type, name)
+        for scope_type in SCOPE_TYPES for name in STATS_KEYS
+    ])
+
+
+class CachedResponseMixin:
+    """按作用域缓存 list / retrieve 的响应数据（只缓存 200 响应）"""
+
+    def get_cache_scope(self, action, kwargs):
+        """返回作用域，返回 None 表示不缓存"""
+        return None
+
+    def _cached(self, request, handler, action, *args, **kwargs):
+        scope = self.get_cache_scope(action, kwargs)
+        if scope is None:
+            return handler(request, *args, **kwargs)
+
+        key = cache_key(scope, request)
+        entry = cache.get(key)
+        if entry is not None:
+            _record(scope, 'hits')
+            etag, last_modified = entry['etag'], entry['last_modified']
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified and parse_http_date_safe(last_modified)
+            )
+            if response is None:
+                response = Response(entry['data'])
+            if etag:
+                response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = last_modified
+            return response
+
+        _record(scope, 'misses')
+        with use_primary():
+            response = handler(request, *args, **kwargs)
+        if response.status_code == 200 and isinstance(response, Response):
+            cache.set(key, {
+                'data': response.data,
+                'etag': response.get('ETag'),
+                'last_modified': response.get('Last-Modified'),
+            }, settings.RESPONSE_CACHE_TTL)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(request, super().list, 'list', *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(request, super().retrieve, 'retrieve', *args, **kwargs)
@@ -0,0 +1,149 @@
+"""
+书籍全文搜索
+
+基于 BookSearchTerm 倒排索引实现，替代对 description 等字段的 icontains 全表扫描。
+中文按单字 + 二元组（bigram）切分，英文/数字按单词切分，书名、作者和 ISBN 额外索引单词前缀，
+以支持搜索框边输入边搜索。
+"""
+import re
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Book, BookSearchTerm
+
+# 词项最大长度，与 BookSearchTerm.term 保持一致
+MAX_TERM_LENGTH = 32
+
+# 前缀索引的最大长度，更长的查询词按截断后的前缀匹配
+MAX_PREFIX_LENGTH = 20
+
+# 各字段权重：(字段名, 权重, 是否索引前缀)
+FIELD_WEIGHTS = [
+    ('title', 5, True),
+    ('author', 3, True),
+    ('isbn', 5, True),
+    ('description', 1, False),
+]
+
+# 排序时相关度与热度、评分的混合系数
+RELEVANCE_WEIGHT = 1.0
+RATING_WEIGHT = 2.0
+HEAT_WEIGHT = 0.01
+
+_TOKEN_RE = re.compile(r'([\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+)|([0-9a-z]+)')
+
+
+def _cjk_terms(run):
+    """中文片段切分为单字和二元组"""
+    terms = set(run)
+    terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def tokenize(text, prefixes=False):
+    """索引时的分词，返回词项集合"""
+    terms = set()
+    for cjk, word in _TOKEN_RE.findall((text or '').lower()):
+        if cjk:
+            terms.update(_cjk_terms(cjk))
+        else:
+            word = word[:MAX_TERM_LENGTH]
+            terms.add(word)
+            if prefixes:
+                terms.update(word[:i] for i in range(1, min(len(word), MAX_PREFIX_LENGTH) + 1))
+            elif len(word) > MAX_PREFIX_LENGTH:
+                # 超长单词查询时会被截断，这里补上截断后的形式
+                terms.add(word[:MAX_PREFIX_LENGTH])
+    return terms
+
+
+def iter_terms(text):
+    """依次产出文本中的词项（可重复）：中文取二元组（单字片段取单字），英文/数字取整词"""
+    for cjk, word in _TOKEN_RE.findall((text or '').lower()):
+        if cjk:
+            if len(cjk) == 1:
+                yield cjk
+            else:
+                yield from (cjk[i:i + 2] for i in range(len(cjk) - 1))
+        else:
+            yield word[:MAX_PREFIX_LENGTH]
+
+
+def tokenize_query(text):
+    """查询时的分词"""
+    return set(iter_terms(text))
+
+
+def build_terms(book):
+    """计算一本书的 {词项: 权重}"""
+    weights = {}
+    for field, weight, prefixes in FIELD_WEIGHTS:
+        for term in tokenize(getattr(book, field), prefixes=prefixes):
+            weights[term] = weights.get(term, 0) + weight
+    return weights
+
+
+def index_books(books):
+    """重建给定书籍的索引词项"""
+    books = list(books)
+    if not books:
+        return 0
+    rows = [
+        BookSearchTerm(book_id=book.pk, term=term, weight=weight)
+        for book in books
+        for term, weight in build_terms(book).items()
+    ]
+    with transaction.atomic():
+        BookSearchTerm.objects.filter(book_id__in=[book.pk for book in books]).delete()
+        BookSearchTerm.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def index_book(book):
+    """增量更新单本书的索引"""
+    return index_books([book])
+
+
+def rebuild_index(chunk_size=1000):
+    """按主键分块重建全部索引，返回 (书籍数, 词项数)"""
+    book_count = term_count = 0
+    last_pk = 0
+    fields = ['pk'] + [field for field, _, _ in FIELD_WEIGHTS]
+    while True:
+        chunk = list(Book.objects.filter(pk__gt=last_pk).order_by('pk').only(*fields)[:chunk_size])
+        if not chunk:
+            break
+        term_count += index_books(chunk)
+        book_count += len(chunk)
+        last_pk = chunk[-1].pk
+    return book_count, term_count
+
+
+def search_books(queryset, query):
+    """
+    在 queryset 上执行搜索，所有查询词项都命中的书籍才会返回，
+    结果按相关度与热度、评分的加权分数排序。
+    """
+    terms = tokenize_query(query)
+    if not terms:
+        return queryset.none()
+
+    matches = (
+        BookSearchTerm.objects.filter(term__in=terms)
+        .values('book_id')
+        .annotate(hits=Count('id'), score=Sum('weight'))
+        .filter(hits=len(terms))
+    )
+    relevance = Subquery(matches.filter(book_id=OuterRef('pk')).values('score')[:1])
+    return (
+        queryset.filter(pk__in=matches.values('book_id'))
+        .annotate(relevance=Coalesce(relevance, 0))
+        .annotate(search_rank=(
+            F('relevance') * RELEVANCE_WEIGHT
+            + F('rating') * RATING_WEIGHT
+            + F('heat') * HEAT_WEIGHT
+        ))
+        .order_by('-search_rank', '-heat', '-rating')
+    )
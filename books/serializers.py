@@ -11,16 +11,26 @@ class CategorySerializer(serializers.ModelSerializer):
 
 class BookSerializer(serializers.ModelSerializer):
     categories = CategorySerializer(many=True, read_only=True)
+    # 兼容旧接口的展示字符串（如 '12.3万'），由 readers 生成
+    reading = serializers.CharField(read_only=True)
     
     class Meta:
         model = Book
         fields = [
             'id', 'title', 'author', 'rating', 'reviews', 'genre', 
-            'heat', 'reading', 'cover', 'description', 'is_premium',
+            'heat', 'readers', 'reading', 'cover', 'description', 'is_premium',
             'publisher', 'publish_date', 'pages', 'isbn', 'categories'
         ]
 
 
+class BookSuggestionSerializer(serializers.ModelSerializer):
+    """搜索框自动补全的精简输出"""
+    
+    class Meta:
+        model = Book
+        fields = ['id', 'title', 'author', 'cover', 'heat']
+
+
 class CommentSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     
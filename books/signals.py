@@ -0,0 +1,183 @@
+from django.contrib.auth.models import User
+from django.db.models.functions import Now
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import aggregates, conditional, feeds, membership, response_cache, search, suggest
+from .models import Book, Category, Comment
+
+
+@receiver(post_save, sender=Book)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    """书籍保存后增量更新搜索索引"""
+    if raw:
+        return
+    search.index_book(instance)
+
+
+@receiver(pre_save, sender=Comment)
+def remember_comment_rating(sender, instance, raw=False, **kwargs):
+    """修改评论前记录原来的书籍和评分"""
+    instance._previous_rating = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_rating = (
+        Comment.objects.filter(pk=instance.pk).values_list('book_id', 'rating').first()
+    )
+
+
+@receiver(post_save, sender=Comment)
+def update_rating_on_save(sender, instance, created, raw=False, **kwargs):
+    """评论新增或修改后更新书籍评分聚合"""
+    if raw:
+        return
+    previous = None if created else instance._previous_rating
+    aggregates.comment_saved(instance, previous)
+    response_cache.invalidate_books({instance.book_id} | ({previous[0]} if previous else set()))
+
+
+@receiver(post_delete, sender=Comment)
+def update_rating_on_delete(sender, instance, **kwargs):
+    """评论删除后更新书籍评分聚合"""
+    aggregates.comment_deleted(instance)
+    response_cache.invalidate_books([instance.book_id])
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(m2m_changed, sender=Book.categories.through)
+def invalidate_feeds(sender, **kwargs):
+    """书籍或分类变化后让推荐/热门书单过期"""
+    feeds.invalidate()
+
+
+@receiver(m2m_changed, sender=Book.categories.through)
+def touch_books_on_categories_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """书籍分类变化后更新书籍的 updated_at 并清除其响应缓存"""
+    if not reverse:
+        book_ids = [instance.pk] if action in ('post_add', 'post_remove', 'post_clear') else []
+    elif action in ('post_add', 'post_remove'):
+        book_ids = list(pk_set or [])
+    elif action == 'pre_clear':
+        # clear 之后就查不到原来关联的书籍了
+        book_ids = list(instance.books.values_list('pk', flat=True))
+    else:
+        book_ids = []
+    if book_ids:
+        Book.objects.filter(pk__in=book_ids).update(updated_at=Now())
+        response_cache.invalidate_books(book_ids)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_book_response(sender, instance, raw=False, **kwargs):
+    """书籍变化后清除其详情缓存"""
+    if not raw:
+        response_cache.invalidate_books([instance.pk])
+
+
+@receiver(pre_save, sender=Category)
+def remember_category_slug(sender, instance, raw=False, **kwargs):
+    """保存分类前记录原 slug"""
+    instance._previous_slug = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_slug = (
+        Category.objects.filter(pk=instance.pk).values_list('slug', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def invalidate_category_responses(sender, instance, raw=False, **kwargs):
+    """分类变化后清除分类接口和该分类下书籍的详情缓存（删除时在关联被清掉之前处理）"""
+    if raw:
+        return
+    slugs = {instance.slug, getattr(instance, '_previous_slug', None)} - {None}
+    response_cache.invalidate('categories', *(f'category:{slug}' for slug in slugs))
+    response_cache.invalidate_books(instance.books.values_list('pk', flat=True))
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, raw=False, **kwargs):
+    """保存用户前记录原用户名"""
+    instance._previous_username = None
+    update_fields = kwargs.get('update_fields')
+    if raw or instance.pk is None or (update_fields is not None and 'username' not in update_fields):
+        return
+    instance._previous_username = (
+        User.objects.filter(pk=instance.pk).values_list('username', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=User)
+def bump_usernames_version(sender, instance, created, raw=False, **kwargs):
+    """用户改名后让评论列表的 ETag 失效"""
+    if raw or created:
+        return
+    if instance._previous_username is not None and instance._previous_username != instance.username:
+        conditional.bump_version('usernames')
+
+
+@receiver(post_save, sender=Book)
+def sync_category_index(sender, instance, raw=False, **kwargs):
+    """书籍保存后（类型可能变化）重新计算分类键"""
+    if not raw:
+        membership.sync_books([instance.pk])
+
+
+@receiver(m2m_changed, sender=Book.categories.through)
+def sync_category_index_on_categories_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """书籍分类关联变化后重新计算分类键"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            membership.sync_books([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        membership.sync_books(pk_set or [])
+    elif action == 'pre_clear':
+        instance._cleared_book_ids = list(instance.books.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        membership.sync_books(instance._cleared_book_ids)
+
+
+@receiver(post_save, sender=Category)
+def sync_category_index_on_slug_change(sender, instance, created, raw=False, **kwargs):
+    """分类 slug 变化后重新计算该分类下书籍的分类键"""
+    if raw or created or instance._previous_slug in (None, instance.slug):
+        return
+    membership.sync_books(instance.books.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_books(sender, instance, **kwargs):
+    """删除分类前记录其下的书籍（删除后关联已被级联清除）"""
+    instance._deleted_book_ids = list(instance.books.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def sync_category_index_on_delete(sender, instance, **kwargs):
+    """分类删除后重新计算原属书籍的分类键"""
+    membership.sync_books(instance._deleted_book_ids)
+
+
+# 自动补全索引用到的书籍字段
+SUGGEST_FIELDS = {'title', 'author', 'heat', 'title_pinyin', 'title_initials'}
+
+
+@receiver(pre_save, sender=Book)
+def fill_title_pinyin(sender, instance, raw=False, update_fields=None, **kwargs):
+    """保存书籍前根据书名计算拼音（只保存部分字段且不含书名时跳过）"""
+    if raw or (update_fields is not None and 'title' not in update_fields):
+        return
+    instance.title_pinyin, instance.title_initials = suggest.pinyin_keys(instance.title)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_suggest_index(sender, instance, raw=False, update_fields=None, **kwargs):
+    """书籍增删或书名、作者、热度变化后让各进程更新自动补全索引中的这本书"""
+    if raw or (update_fields is not None and not SUGGEST_FIELDS & set(update_fields)):
+        return
+    suggest.invalidate([instance.pk])
@@ -0,0 +1,80 @@
+"""
+流式 JSON 响应
+
+按键集分块读取 queryset，逐行序列化后以 JSON 数组增量写出，内存占用只与块大小有关。
+这里不用 QuerySet.iterator()：MySQL 驱动会把整个结果集读入客户端内存，
+按 (排序字段, id) 分块查询才能让峰值内存保持恒定，同时每块都能正常 prefetch_related。
+
+ASGI 下 StreamingHttpResponse 遇到同步迭代器会先把它整个读成列表再发送，
+因此 ASGI 请求改用异步生成器，每一块的查询和序列化通过 sync_to_async 在线程中执行。
+"""
+from itertools import chain
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from .fastpath import compile_serializer
+from .pagination import keyset_after
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def iterate_in_chunks(queryset, ordering, chunk_size=DEFAULT_CHUNK_SIZE):
+    """按 ordering（最后一个字段必须唯一）分块遍历 queryset"""
+    queryset = queryset.order_by(*ordering)
+    names = [field.lstrip('-') for field in ordering]
+    position = None
+    while True:
+        chunk = queryset if position is None else queryset.filter(keyset_after(ordering, position))
+        chunk = list(chunk[:chunk_size])
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        position = [getattr(chunk[-1], name) for name in names]
+
+
+def is_asgi(request):
+    """请求是否由 ASGI 服务（兼容 DRF 的 Request 包装）"""
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+async def _iterate_async(parts):
+    """逐块在线程中推进同步生成器，作为异步生成器输出"""
+    step = sync_to_async(next, thread_sensitive=True)
+    while True:
+        part = await step(parts, None)
+        if part is None:
+            return
+        yield part
+
+
+def stream_json_list(queryset, serializer_class, ordering, chunk_size=DEFAULT_CHUNK_SIZE, leading=(),
+                     request=None):
+    """
+    以 JSON 数组流式输出 queryset，输出与 JSONRenderer 渲染整个列表的结果一致。
+    leading 中的对象（如尚未落库的数据）排在 queryset 之前输出；
+    传入 ASGI 请求时响应内容为异步生成器。
+    """
+    renderer = JSONRenderer()
+    serialize_one = compile_serializer(serializer_class)
+
+    def generate():
+        yield b'['
+        separator = b''
+        batch = []
+        for instance in chain(leading, iterate_in_chunks(queryset, ordering, chunk_size)):
+            batch.append(renderer.render(serialize_one(instance)))
+            if len(batch) >= chunk_size:
+                yield separator + b','.join(batch)
+                separator = b','
+                batch = []
+        if batch:
+            yield separator + b','.join(batch)
+        yield b']'
+
+    content = generate()
+    if request is not None and is_asgi(request):
+        content = _iterate_async(content)
+    return StreamingHttpResponse(content, content_type='application/json')
@@ -0,0 +1,323 @@
+"""
+搜索框自动补全
+
+每个进程在内存中维护一份前缀索引。每本书的书名、作者、书名全拼和书名拼音首字母
+（后两者保存在 Book 上，需要安装 pypinyin）规范化后各作为一个键（小写，只保留文字和数字）。
+所有键按 UTF-8 编码的字典序排好，拼接成一个 bytes；另用三个定长数组保存各键的偏移、书籍 ID 和热度。
+每个键约占 12 字节加键本身的长度，没有逐条的 Python 对象，百万本书约 100MB。
+
+查询时对规范化后的输入做两次二分，找到以它为前缀的连续区间：
+- 区间不超过 SCAN_LIMIT 个键时，直接在区间内取热度最高的书籍；
+- 更长的区间（很短或很常见的前缀）在构建时预先记下热度最高的 MAX_LIMIT 本。
+因此单次查询的开销与书籍总数无关。
+
+书籍保存 / 删除时由信号调用 invalidate([pk])：递增缓存中的版本号（多进程共享），
+并以新版本号为键在缓存中记下变化的书籍。各进程最多每 SUGGEST_CHECK_INTERVAL 秒检查一次版本号，
+版本号变化时只从数据库读出这些书籍，放进索引上的叠加层，查询时与排好序的数组合并：
+叠加层中的书籍以叠加层为准（已删除的书籍不再返回）。
+只有索引超过 SUGGEST_MAX_AGE 秒（热度由后台批量写回，不触发信号）、叠加层超过 MAX_OVERLAY 本、
+变更记录缺失（缓存淘汰或批量导入时不带书籍的 invalidate()）时才在后台线程中全量重建，
+重建完成前继续使用旧索引。
+"""
+import bisect
+import heapq
+import logging
+import re
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .models import Book
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:  # 未安装 pypinyin 时不索引拼音
+    lazy_pinyin = None
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'suggest:version'
+CHANGE_KEY = 'suggest:change:{}'
+
+# 键的最大长度（字符），更长的部分不参与前缀匹配
+MAX_KEY_LENGTH = 64
+
+# 区间超过这么多个键时使用预先算好的结果
+SCAN_LIMIT = 1000
+
+# 单次最多返回的书籍数量
+MAX_LIMIT = 20
+
+# 叠加层最多容纳的书籍数量，超过时全量重建
+MAX_OVERLAY = 1000
+
+_NON_WORD_RE = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    """规范化：小写，去掉空白和标点"""
+    return _NON_WORD_RE.sub('', (text or '').lower())[:MAX_KEY_LENGTH]
+
+
+def pinyin_keys(title):
+    """返回书名的 (全拼, 拼音首字母)，未安装 pypinyin 时返回空字符串"""
+    if lazy_pinyin is None:
+        return '', ''
+    # 非中文部分原样返回，按单词拆开，首字母取每个单词的首字母
+    syllables = [
+        word for item in lazy_pinyin(title or '')
+        for word in _NON_WORD_RE.split(item.lower()) if word
+    ]
+    return ''.join(syllables)[:MAX_KEY_LENGTH], ''.join(word[0] for word in syllables)[:MAX_KEY_LENGTH]
+
+
+def index_keys(texts):
+    """一本书的书名、作者、拼音规范化后的键（去重，去掉空键）"""
+    return {key.encode() for key in map(normalize, texts) if key}
+
+
+class PrefixIndex:
+    """排好序的键数组与预先算好的热门前缀结果"""
+
+    def __init__(self, rows, version=0):
+        """rows 为 (书籍 ID, 热度, 书名, 作者, 书名全拼, 书名拼音首字母) 的可迭代对象"""
+        entries = []
+        for book_id, heat, *texts in rows:
+            for key in index_keys(texts):
+                entries.append((key, -heat, book_id))
+        entries.sort()
+
+        self.blob = b''.join(key for key, _, _ in entries)
+        self.offsets = array('I', [0])
+        position = 0
+        for key, _, _ in entries:
+            position += len(key)
+            self.offsets.append(position)
+        self.book_ids = array('i', (book_id for _, _, book_id in entries))
+        self.heats = array('i', (-heat for _, heat, _ in entries))
+        self.top = self._top_prefixes(entries)
+        # 构建之后变化的书籍 {书籍 ID: 热度}（已删除的书籍为 None），以及这些书籍现在的
+        # (键, 书籍 ID) 排好序的列表；两者一起替换，查询时同样二分
+        self.delta = ({}, [])
+        self.version = version
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.book_ids)
+
+    @property
+    def overlay(self):
+        return self.delta[0]
+
+    def memory_size(self):
+        """键与数组占用的字节数（不含预先算好的前缀结果）"""
+        arrays = (self.offsets, self.book_ids, self.heats)
+        return len(self.blob) + sum(len(a) * a.itemsize for a in arrays)
+
+    @staticmethod
+    def _top_prefixes(entries):
+        """为覆盖超过 SCAN_LIMIT 个键的前缀预先记下热度最高的 MAX_LIMIT 本书"""
+        # 键已排好序，同一前缀的键是连续的一段：从空前缀开始，用二分跳过每个子前缀的区间，
+        # 只继续展开覆盖超过 SCAN_LIMIT 个键的子前缀
+        keys = [key for key, _, _ in entries]
+        heavy = set()
+        stack = [(b'', 0, len(keys))]
+        while stack:
+            prefix, lo, hi = stack.pop()
+            length = len(prefix) + 1
+            # 与前缀完全相同的键排在区间最前面
+            i = bisect.bisect_right(keys, prefix, lo, hi)
+            while i < hi:
+                child = keys[i][:length]
+                j = bisect.bisect_right(keys, child, i, hi, key=lambda key: key[:length])
+                if j - i > SCAN_LIMIT:
+                    heavy.add(child)
+                    stack.append((child, i, j))
+                i = j
+        if not heavy:
+            return {}
+
+        top = {}
+        unfilled = len(heavy)
+        # 按热度从高到低放入各前缀，前缀集合是前缀封闭的：短前缀不在其中，更长的也不会在
+        for key, heat, book_id in sorted(entries, key=lambda entry: entry[1] * 2 ** 32 + entry[2]):
+            for length in range(1, len(key) + 1):
+                prefix = key[:length]
+                if prefix not in heavy:
+                    break
+                books = top.setdefault(prefix, [])
+                if len(books) < MAX_LIMIT and book_id not in books:
+                    books.append(book_id)
+                    if len(books) == MAX_LIMIT:
+                        unfilled -= 1
+            if not unfilled:
+                break
+        heats = {book_id: -heat for _, heat, book_id in entries}
+        return {
+            prefix: (array('i', books), array('i', (heats[book_id] for book_id in books)))
+            for prefix, books in top.items()
+        }
+
+    def _key(self, i, length):
+        start = self.offsets[i]
+        return self.blob[start:min(start + length, self.offsets[i + 1])]
+
+    def _matches(self, prefix, limit, exclude):
+        """排好序的数组中以 prefix 为前缀、不在 exclude 中的 (热度, 书籍 ID)，按热度从高到低"""
+        top = self.top.get(prefix)
+        if top is not None:
+            book_ids, heats = top
+            return [(heat, book_id) for book_id, heat in zip(book_ids, heats) if book_id not in exclude][:limit]
+
+        size = len(prefix)
+        key = lambda i: self._key(i, size)  # noqa: E731
+        lo = bisect.bisect_left(range(len(self)), prefix, key=key)
+        hi = bisect.bisect_right(range(len(self)), prefix, lo=lo, key=key)
+        best = {}
+        for i in range(lo, hi):
+            book_id = self.book_ids[i]
+            if book_id not in exclude:
+                best[book_id] = max(best.get(book_id, self.heats[i]), self.heats[i])
+        matches = [(heat, book_id) for book_id, heat in best.items()]
+        return heapq.nsmallest(limit, matches, key=lambda match: (-match[0], match[1]))
+
+    def lookup(self, query, limit=10):
+        """返回以 query 为前缀的书籍 ID，按热度从高到低"""
+        prefix = normalize(query).encode()
+        if not prefix:
+            return []
+        limit = min(limit, MAX_LIMIT)
+        overlay, overlay_keys = self.delta
+        matches = self._matches(prefix, limit, overlay) if len(self) else []
+        if overlay:
+            i = bisect.bisect_left(overlay_keys, (prefix,))
+            found = set()
+            while i < len(overlay_keys) and overlay_keys[i][0].startswith(prefix):
+                found.add(overlay_keys[i][1])
+                i += 1
+            matches += [(overlay[book_id], book_id) for book_id in found]
+            matches.sort(key=lambda match: (-match[0], match[1]))
+        return [book_id for _, book_id in matches[:limit]]
+
+    def apply_changes(self, version, book_ids, rows):
+        """把截至 version 的变化叠加到索引上，rows 为 book_ids 中仍存在的书籍的行"""
+        book_ids = set(book_ids)
+        overlay, keys = self.delta
+        overlay = {**overlay, **dict.fromkeys(book_ids)}
+        keys = [entry for entry in keys if entry[1] not in book_ids]
+        for book_id, heat, *texts in rows:
+            overlay[book_id] = heat
+            keys.extend((key, book_id) for key in index_keys(texts))
+        keys.sort()
+        self.delta = (overlay, keys)
+        self.version = version
+
+
+ROW_FIELDS = ('pk', 'heat', 'title', 'author', 'title_pinyin', 'title_initials')
+
+
+def load_rows():
+    return Book.objects.values_list(*ROW_FIELDS).iterator(chunk_size=5000)
+
+
+def current_version():
+    return cache.get(VERSION_KEY, 0)
+
+
+def _change_key(version):
+    return CHANGE_KEY.format(version)
+
+
+def invalidate(book_ids=None):
+    """书籍变化后通知各进程：给出 book_ids 时各进程只更新这些书籍，否则全量重建"""
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        version = 1
+        cache.set(VERSION_KEY, version, None)
+    if book_ids is not None:
+        # 变更记录至少要保留到各进程的索引按 SUGGEST_MAX_AGE 全量重建
+        cache.set(_change_key(version), list(book_ids), settings.SUGGEST_MAX_AGE * 2)
+
+
+def _apply_changes(index, version):
+    """把 index.version 之后变化的书籍读入叠加层，需要全量重建时返回 False"""
+    # 版本号回退说明缓存被清空过
+    if not index.version < version <= index.version + MAX_OVERLAY:
+        return False
+    changes = cache.get_many([_change_key(v) for v in range(index.version + 1, version + 1)])
+    if len(changes) != version - index.version:
+        return False
+    book_ids = {book_id for ids in changes.values() for book_id in ids}
+    if len(book_ids | index.overlay.keys()) > MAX_OVERLAY:
+        return False
+    index.apply_changes(version, book_ids, Book.objects.filter(pk__in=book_ids).values_list(*ROW_FIELDS))
+    return True
+
+
+_index = None
+_build_lock = threading.Lock()
+_last_check = 0.0
+
+
+def build():
+    """在当前线程中重建索引"""
+    global _index
+    version = current_version()
+    start = time.perf_counter()
+    index = PrefixIndex(load_rows(), version)
+    _index = index
+    logger.info('自动补全索引重建完成：%d 个键，耗时 %.2f 秒', len(index), time.perf_counter() - start)
+    return index
+
+
+def _build_in_background():
+    def run():
+        try:
+            build()
+        except Exception:
+            logger.exception('自动补全索引重建失败')
+        finally:
+            _build_lock.release()
+            connection.close()
+
+    # 同一时间只有一个重建
+    if _build_lock.acquire(blocking=False):
+        threading.Thread(target=run, name='suggest-build', daemon=True).start()
+
+
+def warm_up():
+    """进程启动时构建索引，失败（如数据库尚未迁移）时留到第一次查询再构建"""
+    try:
+        build()
+    except Exception:
+        logger.exception('自动补全索引构建失败')
+
+
+def get_index():
+    """返回当前索引；还没有索引时在当前线程中构建，有书籍变化时更新叠加层，需要全量重建时在后台重建"""
+    global _last_check
+    index = _index
+    if index is None:
+        with _build_lock:
+            return build() if _index is None else _index
+
+    now = time.monotonic()
+    if now - _last_check >= settings.SUGGEST_CHECK_INTERVAL:
+        _last_check = now
+        if now - index.built_at > settings.SUGGEST_MAX_AGE:
+            _build_in_background()
+        else:
+            version = current_version()
+            if version != index.version and not _apply_changes(index, version):
+                _build_in_background()
+    return index
+
+
+def suggest(query, limit=10):
+    """返回以 query 为前缀的书籍 ID，按热度从高到低"""
+    return get_index().lookup(query, limit)
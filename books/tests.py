@@ -1,8 +1,45 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import Book, Category, Comment, BookShelf, ReadingProgress
+from bookhub_backend import db_router, metrics
+from bookhub_backend.db_pool.pool import ConnectionPool
+from .models import (
+    Book, BookCategoryIndex, BookNeighbors, Category, Comment, BookShelf, ReaderSketch, ReadingProgress
+)
+from . import counters, feeds, heat, progress, readers, recommend, response_cache, suggest
+from .counters import comment_votes
+from .fastpath import serialize
+from .hll import HyperLogLog
+from .progress import progress_buffer
+from .serializers import (
+    BookSerializer, CategorySerializer, CommentSerializer,
+    BookShelfSerializer, ReadingProgressSerializer
+)
+from rest_framework.renderers import JSONRenderer
+from .streaming import stream_json_list
+
+
+def tearDownModule():
+    # 其他测试中浏览、评论、阅读等行为记下的热度和读者不在进程退出时写回
+    heat.heat_buffer.clear()
+    readers.readers_buffer.clear()
 
 
 class BookAPITestCase(TestCase):
@@ -115,3 +152,1480 @@ class BookShelfTestCase(TestCase):
         response = self.client.get('/api/bookshelf/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertGreater(len(response.data), 0)
+
+
+class BookSearchTestCase(TestCase):
+    """书籍搜索测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.client = APIClient()
+        defaults = {
+            'rating': 4.5, 'reviews': 100, 'genre': '历史', 'reading': '1000',
+            'cover': 'http://example.com/cover.jpg', 'pages': 200,
+        }
+        self.sapiens = Book.objects.create(
+            title='人类简史', author='尤瓦尔·赫拉利', heat=95,
+            description='从认知革命到科学革命', isbn='9787508647357', **defaults
+        )
+        self.js = Book.objects.create(
+            title='JavaScript高级程序设计', author='尼古拉斯·泽卡斯', heat=98,
+            description='一本介绍 JavaScript 的经典书籍', isbn='9787115308672', **defaults
+        )
+    
+    def search(self, query):
+        response = self.client.get('/api/books/', {'search': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book['id'] for book in response.data['results']]
+    
+    def test_search_chinese_title(self):
+        """测试中文书名搜索"""
+        self.assertEqual(self.search('人类简史'), [self.sapiens.id])
+        self.assertEqual(self.search('简史'), [self.sapiens.id])
+        self.assertEqual(self.search('史'), [self.sapiens.id])
+    
+    def test_search_prefix_and_isbn(self):
+        """测试英文前缀与ISBN搜索"""
+        self.assertEqual(self.search('javas'), [self.js.id])
+        self.assertEqual(self.search('9787508647357'), [self.sapiens.id])
+    
+    def test_search_ranking(self):
+        """测试书名命中优先于简介命中"""
+        Book.objects.filter(pk=self.js.pk).update(heat=0)
+        self.sapiens.description = '一本关于程序设计的书'
+        self.sapiens.save()
+        self.assertEqual(self.search('程序设计'), [self.js.id, self.sapiens.id])
+    
+    def test_index_updated_on_save(self):
+        """测试保存书籍后索引增量更新"""
+        self.sapiens.title = '未来简史'
+        self.sapiens.save()
+        self.assertEqual(self.search('人类简史'), [])
+        self.assertEqual(self.search('未来'), [self.sapiens.id])
+
+
+class QueryCountTestCase(TestCase):
+    """列表接口查询次数测试：查询次数不应随返回条数增长"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.category = Category.objects.create(name='测试', slug='test')
+        self.book_count = 0
+    
+    def add_rows(self, count):
+        """为每本新书创建分类、评论、书架和阅读进度"""
+        for _ in range(count):
+            self.book_count += 1
+            book = Book.objects.create(
+                title=f'测试书籍{self.book_count}', author='测试作者', genre='测试',
+                cover='http://example.com/cover.jpg', description='简介',
+                isbn=f'isbn{self.book_count}'
+            )
+            book.categories.add(self.category)
+            author = User.objects.create_user(username=f'reader{self.book_count}')
+            Comment.objects.create(user=author, book=book, content='好书')
+            Comment.objects.create(user=self.user, book=book, content='好书')
+            BookShelf.objects.create(user=self.user, book=book)
+            ReadingProgress.objects.create(user=self.user, book=book, progress=10)
+    
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context)
+    
+    def test_list_query_count_constant(self):
+        """测试列表接口查询次数与页面大小无关"""
+        urls = [
+            '/api/books/', '/api/comments/', '/api/bookshelf/', '/api/reading-progress/',
+            '/api/user/shelf', '/api/user/reading', '/api/user/comments',
+        ]
+        self.add_rows(2)
+        small = {url: self.count_queries(url) for url in urls}
+        self.add_rows(8)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), small[url])
+
+
+class CommentVoteTestCase(TestCase):
+    """评论点赞/点踩测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        book = Book.objects.create(
+            title='测试书籍', author='测试作者', genre='测试',
+            cover='http://example.com/cover.jpg', description='简介'
+        )
+        self.comment = Comment.objects.create(user=self.user, book=book, content='好书')
+    
+    def tearDown(self):
+        comment_votes.clear()
+    
+    def test_like_counted_once_per_user(self):
+        """测试同一用户只能点赞一次"""
+        url = f'/api/comments/{self.comment.id}/like/'
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['likes'], 1)
+        
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(f'/api/comments/{self.comment.id}/dislike/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_votes_flushed_in_batch(self):
+        """测试缓冲的投票批量落库且不修改 updated_at"""
+        for i in range(3):
+            voter = User.objects.create_user(username=f'voter{i}')
+            self.client.force_authenticate(user=voter)
+            self.client.post(f'/api/comments/{self.comment.id}/like/')
+        self.client.post(f'/api/comments/{self.comment.id}/dislike/')
+        comment_votes.flush()
+        
+        comment = Comment.objects.get(pk=self.comment.pk)
+        self.assertEqual(comment.likes, 3)
+        self.assertEqual(comment.dislikes, 0)
+        self.assertEqual(comment.updated_at, self.comment.updated_at)
+
+
+class BackgroundFlushTestCase(TransactionTestCase):
+    """后台定时落库测试：后台线程使用自己的数据库连接，需要真正提交的数据"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.book = Book.objects.create(
+            title='测试书籍', author='测试作者', genre='测试',
+            cover='http://example.com/cover.jpg', description='简介'
+        )
+        self.comment = Comment.objects.create(user=self.user, book=self.book, content='好书')
+    
+    def start(self, flusher):
+        """以很短的间隔开启后台落库，并关掉缓冲自身按间隔在请求中落库"""
+        for target, name, value in [(flusher, 'interval', 0.05), (flusher.buffer, 'interval', float('inf'))]:
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        flusher.enabled = True
+        self.addCleanup(flusher.buffer.clear)
+        self.addCleanup(flusher.stop)
+    
+    def wait_until(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail('后台线程没有按时落库')
+            time.sleep(0.02)
+    
+    def test_votes_flushed_without_later_request(self):
+        """测试最后一次投票之后没有新请求，计数也会由后台线程落库"""
+        self.start(counters.comment_votes_flusher)
+        self.client.post(f'/api/comments/{self.comment.id}/like/')
+        self.wait_until(lambda: Comment.objects.get(pk=self.comment.pk).likes == 1)
+        self.assertEqual(len(comment_votes), 0)
+    
+    def test_progress_flushed_without_later_request(self):
+        """测试最后一次进度上报之后没有新请求，进度也会由后台线程落库"""
+        self.start(progress.progress_flusher)
+        response = self.client.post(
+            '/api/reading-progress/', {'book_id': self.book.id, 'progress': 42}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.wait_until(lambda: ReadingProgress.objects.filter(user=self.user, progress=42).exists())
+        self.assertEqual(len(progress_buffer), 0)
+
+
+class BookRatingAggregateTestCase(TestCase):
+    """书籍评分聚合测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.book = Book.objects.create(
+            title='测试书籍', author='测试作者', genre='测试',
+            cover='http://example.com/cover.jpg', description='简介'
+        )
+    
+    def assertAggregate(self, rating, reviews):
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.rating, self.book.reviews), (rating, reviews))
+    
+    def test_rating_follows_comment_writes(self):
+        """测试评论增删改后评分与评价数同步更新"""
+        response = self.client.post('/api/comments/', {'book': self.book.id, 'content': '好书', 'rating': 5})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        comment_id = response.data['id']
+        self.client.post('/api/comments/', {'book': self.book.id, 'content': '一般', 'rating': 2})
+        self.assertAggregate(3.5, 2)
+        
+        self.client.patch(f'/api/comments/{comment_id}/', {'rating': 4})
+        self.assertAggregate(3.0, 2)
+        
+        self.client.delete(f'/api/comments/{comment_id}/')
+        self.assertAggregate(2.0, 1)
+    
+    def test_reconcile_repairs_drift(self):
+        """测试校对命令修复漂移的聚合值"""
+        Comment.objects.create(user=self.user, book=self.book, content='好书', rating=4)
+        Book.objects.filter(pk=self.book.pk).update(rating_sum=100, reviews=30, rating=3.3)
+        call_command('reconcile_book_ratings', stdout=StringIO())
+        self.assertAggregate(4.0, 1)
+    
+    def test_reconcile_keeps_seeded_reviews(self):
+        """测试校对保留初始数据的站外评价，只重新统计评论部分"""
+        seeded = Book.objects.create(
+            title='初始书籍', author='测试作者', genre='测试', rating=4.5, reviews=100,
+            cover='http://example.com/cover.jpg', description='简介'
+        )
+        self.assertEqual((seeded.rating_sum, seeded.reviews_base, seeded.rating_sum_base), (450, 100, 450))
+        call_command('reconcile_book_ratings', stdout=StringIO())
+        seeded.refresh_from_db()
+        self.assertEqual((seeded.rating, seeded.reviews, seeded.rating_sum), (4.5, 100, 450))
+        
+        Comment.objects.create(user=self.user, book=seeded, content='好书', rating=5)
+        Book.objects.filter(pk=seeded.pk).update(rating_sum=0, reviews=0, rating=0)
+        call_command('reconcile_book_ratings', stdout=StringIO())
+        seeded.refresh_from_db()
+        self.assertEqual((seeded.rating, seeded.reviews, seeded.rating_sum), (4.5, 101, 455))
+
+
+class CursorPaginationTestCase(TestCase):
+    """游标分页测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        # 热度和评分大量重复，检验游标不会重复或漏掉数据
+        self.books = [
+            Book.objects.create(
+                title=f'测试书籍{i}', author='测试作者', genre='测试', heat=i % 3, rating=4.5,
+                cover='http://example.com/cover.jpg', description='简介'
+            )
+            for i in range(45)
+        ]
+        for _ in range(25):
+            Comment.objects.create(user=self.user, book=self.books[0], content='好书')
+    
+    def collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('previous', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return ids
+    
+    def test_book_cursor_walks_all_books_in_order(self):
+        """测试书籍游标分页按 (heat, rating, id) 降序遍历全部书籍"""
+        expected = list(Book.objects.order_by('-heat', '-rating', '-id').values_list('id', flat=True))
+        self.assertEqual(self.collect('/api/books/?cursor='), expected)
+    
+    def test_comment_cursor(self):
+        """测试评论游标分页"""
+        expected = list(
+            Comment.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(self.collect(f'/api/comments/?book_id={self.books[0].id}&cursor='), expected)
+    
+    def test_page_number_still_default(self):
+        """测试默认仍为页码分页"""
+        response = self.client.get('/api/books/', {'page': 2})
+        self.assertEqual(response.data['count'], 45)
+        self.assertEqual(len(response.data['results']), 20)
+    
+    def test_approximate_count_and_invalid_cursor(self):
+        """测试近似总数与无效游标"""
+        response = self.client.get('/api/books/', {'cursor': '', 'with_count': 1})
+        self.assertEqual(response.data['count'], 45)
+        response = self.client.get('/api/books/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class FeedCacheTestCase(TestCase):
+    """推荐/热门书单缓存测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        cache.clear()
+        self.client = APIClient()
+        self.books = [
+            Book.objects.create(
+                title=f'测试书籍{i}', author='测试作者', genre='测试', heat=i, rating=5 - i,
+                cover='http://example.com/cover.jpg', description='简介', is_premium=i % 2 == 0
+            )
+            for i in range(4)
+        ]
+    
+    def ids(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book['id'] for book in response.data]
+    
+    def test_feed_served_from_cache(self):
+        """测试书单命中缓存时不访问数据库"""
+        expected = [book.id for book in reversed(self.books)]
+        self.assertEqual(self.ids('/api/books/popular/'), expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.ids('/api/books/popular/'), expected)
+        self.assertEqual(self.ids('/api/books/recommended/', is_premium='true'), [self.books[0].id, self.books[2].id])
+    
+    def test_feed_invalidated_on_book_save(self):
+        """测试书籍保存后书单刷新"""
+        self.ids('/api/books/popular/')
+        self.books[0].heat = 100
+        self.books[0].save()
+        self.assertEqual(self.ids('/api/books/popular/')[0], self.books[0].id)
+    
+    def test_stale_feed_served_while_refreshing(self):
+        """测试过期书单在其他请求刷新期间返回旧数据"""
+        stale = self.ids('/api/books/popular/')
+        feeds.invalidate()
+        cache.add('feeds:popular::all:lock', True)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.ids('/api/books/popular/'), stale)
+    
+    def test_unknown_category_not_cached(self):
+        """测试不存在的分类返回空书单且不写入缓存，已有分类的缓存键不含原始参数"""
+        junk = 'no such category ' * 20
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.ids('/api/books/popular/', category=junk), [])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('DISTINCT', queries[0]['sql'])
+        self.assertIsNone(cache.get(feeds._feed_key('popular', junk, None)))
+        self.assertIsNone(cache.get(feeds._category_key(junk)))
+        
+        self.assertEqual(len(self.ids('/api/books/popular/', category='测试')), 4)
+        key = feeds._feed_key('popular', '测试', None)
+        self.assertNotIn('测试', key)
+        self.assertIsNotNone(cache.get(key))
+        # 已存在的分类键按代数缓存，下一代书单刷新时才重新查询
+        feeds.invalidate()
+        self.ids('/api/books/popular/', category='测试')
+        self.assertEqual(cache.get(feeds._category_key('测试')), cache.get(feeds.GENERATION_KEY))
+        with self.assertNumQueries(0):
+            self.ids('/api/books/popular/', category='测试')
+
+
+class StreamingResponseTestCase(TestCase):
+    """流式 JSON 响应测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        for i in range(5):
+            book = Book.objects.create(
+                title=f'测试书籍{i}', author='测试作者', genre='测试',
+                cover='http://example.com/cover.jpg', description='简介'
+            )
+            BookShelf.objects.create(user=self.user, book=book)
+    
+    def test_stream_matches_serializer(self):
+        """测试分块流式输出与一次性序列化结果一致"""
+        queryset = BookShelf.objects.filter(user=self.user)
+        expected = BookShelfSerializer(queryset.order_by('-added_at', '-id'), many=True).data
+        response = stream_json_list(queryset, BookShelfSerializer, ('-added_at', '-id'), chunk_size=2)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), expected)
+    
+    def test_my_shelf_streamed(self):
+        """测试我的书架接口流式返回"""
+        response = self.client.get('/api/user/shelf')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content))), 5)
+        
+        self.client.force_authenticate(user=User.objects.create_user(username='newuser'))
+        response = self.client.get('/api/user/shelf')
+        self.assertEqual(b''.join(response.streaming_content), b'[]')
+    
+    async def test_streamed_asynchronously_under_asgi(self):
+        """测试 ASGI 下以异步生成器逐块输出，不先整个读成列表"""
+        token = await sync_to_async(Token.objects.create)(user=self.user)
+        response = await AsyncClient().get('/api/user/shelf', headers={'Authorization': f'Token {token.key}'})
+        self.assertTrue(response.is_async)
+        parts = [part async for part in response.streaming_content]
+        self.assertEqual(parts[0], b'[')
+        self.assertEqual(len(json.loads(b''.join(parts))), 5)
+
+
+class ImportBooksTestCase(TestCase):
+    """书籍批量导入测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+    
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+    
+    def test_import_csv_and_jsonl(self):
+        """测试导入 CSV 与 JSONL，按 ISBN 更新且关联分类"""
+        Category.objects.create(name='历史', slug='history')
+        csv_path = self.write('books.csv', (
+            'isbn,title,author,genre,rating,reviews,is_premium,publish_date,categories,cover,description\n'
+            '9787508647357,人类简史,尤瓦尔·赫拉利,历史,4.6,2356,true,2014-11-01,history|science,http://example.com/a.jpg,简介\n'
+            ',没有ISBN,作者,历史,4.0,1,false,,,http://example.com/b.jpg,简介\n'
+            '9787536692930,三体,刘慈欣,科幻,bad,1,false,,,http://example.com/c.jpg,简介\n'
+        ))
+        jsonl_path = self.write('books.jsonl', (
+            json.dumps({'isbn': '9787508647357', 'title': '人类简史（新版）', 'author': '尤瓦尔·赫拉利',
+                        'genre': '历史', 'rating': 1.0, 'categories': ['history']}, ensure_ascii=False) + '\n'
+        ))
+        out = StringIO()
+        call_command('import_books', csv_path, stdout=out)
+        self.assertIn('导入 1 行，跳过 2 行', out.getvalue())
+        
+        book = Book.objects.get(isbn='9787508647357')
+        self.assertEqual(book.rating, 4.6)
+        self.assertTrue(book.is_premium)
+        self.assertEqual(sorted(book.categories.values_list('slug', flat=True)), ['history', 'science'])
+        
+        call_command('import_books', jsonl_path, stdout=StringIO())
+        self.assertEqual(Book.objects.count(), 1)
+        book.refresh_from_db()
+        self.assertEqual(book.title, '人类简史（新版）')
+        # 评分由站内维护，更新时不被覆盖
+        self.assertEqual(book.rating, 4.6)
+        self.assertEqual(list(book.categories.values_list('slug', flat=True)), ['history'])
+        
+        response = APIClient().get('/api/books/', {'search': '新版'})
+        self.assertEqual([item['id'] for item in response.data['results']], [book.id])
+    
+    def test_bad_rows_skipped(self):
+        """测试格式错误、超出范围或超长的行计为跳过，不影响同一块中的其他行"""
+        rows = [
+            json.dumps({'isbn': '9787536692930', 'title': '三体', 'genre': '科幻', 'readers': 10}),
+            '{"isbn": "broken',
+            json.dumps(['9787536692931', '不是对象']),
+            json.dumps({'isbn': '9787536692932', 'title': '负数', 'readers': -1}),
+            json.dumps({'isbn': '9787536692933', 'title': '书' * 201}),
+            json.dumps({'isbn': '9' * 21, 'title': '超长ISBN'}),
+            json.dumps({'isbn': '9787536692934', 'title': '评分', 'rating': 6}),
+        ]
+        path = self.write('books.jsonl', '\n'.join(rows) + '\n')
+        out = StringIO()
+        call_command('import_books', path, stdout=out)
+        self.assertIn('导入 1 行，跳过 6 行', out.getvalue())
+        self.assertEqual(list(Book.objects.values_list('isbn', flat=True)), ['9787536692930'])
+    
+    def test_imported_rating_kept_after_comment(self):
+        """测试导入书籍的评分总和按评分折算，新评论在此基础上累计"""
+        path = self.write('books.jsonl', json.dumps(
+            {'isbn': '9787536692930', 'title': '三体', 'genre': '科幻', 'rating': 4.5, 'reviews': 100}
+        ) + '\n')
+        call_command('import_books', path, stdout=StringIO())
+        book = Book.objects.get(isbn='9787536692930')
+        self.assertEqual((book.rating_sum, book.reviews_base, book.rating_sum_base), (450, 100, 450))
+        
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user(username='testuser'))
+        response = client.post('/api/comments/', {'book': book.id, 'content': '好书', 'rating': 5})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        book.refresh_from_db()
+        self.assertEqual((book.rating, book.reviews), (4.5, 101))
+
+
+class ReadingProgressBufferTestCase(TestCase):
+    """阅读进度写后缓冲测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.book = Book.objects.create(
+            title='测试书籍', author='测试作者', genre='测试',
+            cover='http://example.com/cover.jpg', description='简介'
+        )
+        # 测试期间不按时间间隔自动落库
+        patcher = mock.patch.object(progress_buffer, 'interval', 3600)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def tearDown(self):
+        progress_buffer.clear()
+    
+    def report(self, progress, book_id=None):
+        return self.client.post(
+            '/api/reading-progress/',
+            {'book_id': book_id or self.book.id, 'progress': progress},
+            format='json'
+        )
+    
+    def test_progress_buffered_and_read_back(self):
+        """测试进度上报合并缓冲，读取时能读到自己的最新进度"""
+        for progress in (10, 20, 30):
+            response = self.report(progress)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.data['progress'], progress)
+        self.assertFalse(ReadingProgress.objects.exists())
+        self.assertEqual(len(progress_buffer), 1)
+        
+        response = self.client.get('/api/reading-progress/')
+        self.assertEqual([item['progress'] for item in response.data['results']], [30])
+        self.assertEqual(response.data['count'], 1)
+        self.assertFalse(ReadingProgress.objects.exists())
+        
+        self.report(60)
+        progress_buffer.flush()
+        self.assertEqual(ReadingProgress.objects.get().progress, 60)
+    
+    def test_pending_overlaid_on_reads(self):
+        """测试读取时把尚未落库的进度叠加在库中数据之前，不触发落库"""
+        books = [
+            Book.objects.create(
+                title=f'旧书{i}', author='测试作者', genre='测试',
+                cover='http://example.com/cover.jpg', description='简介'
+            )
+            for i in range(2)
+        ]
+        for book in books:
+            ReadingProgress.objects.create(user=self.user, book=book, progress=10)
+        other = User.objects.create_user(username='other')
+        ReadingProgress.objects.create(user=other, book=self.book, progress=99)
+        self.report(80, book_id=books[0].id)
+        self.report(40)
+        
+        response = self.client.get('/api/reading-progress/')
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(
+            [(item['book']['id'], item['progress']) for item in response.data['results']],
+            [(self.book.id, 40), (books[0].id, 80), (books[1].id, 10)]
+        )
+        self.assertIsNone(response.data['results'][0]['id'])
+        
+        response = self.client.get('/api/user/reading')
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([item['progress'] for item in data], [40, 80, 10])
+        
+        pk = ReadingProgress.objects.get(user=self.user, book=books[0]).pk
+        self.assertEqual(self.client.get(f'/api/reading-progress/{pk}/').data['progress'], 80)
+        
+        response = self.client.get('/api/user/stats')
+        self.assertEqual((response.data['total'], response.data['thisMonth']), (3, 1))
+        self.assertEqual(
+            recommend.reading_history(self.user.pk)[:3], [self.book.id, books[0].id, books[1].id]
+        )
+        self.assertEqual(ReadingProgress.objects.filter(user=self.user, progress=10).count(), 2)
+        self.assertEqual(len(progress_buffer), 2)
+        
+        # 删除前先写入该用户的缓冲
+        self.client.delete(f'/api/reading-progress/{pk}/')
+        self.assertEqual(len(progress_buffer), 0)
+        self.assertEqual(ReadingProgress.objects.get(user=self.user, book=self.book).progress, 40)
+    
+    def test_unknown_book_rejected(self):
+        """测试上报不存在的书籍"""
+        response = self.report(10, book_id=self.book.id + 100)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(progress_buffer), 0)
+    
+    @override_settings(READING_PROGRESS_WRITE_BEHIND=False)
+    def test_synchronous_mode(self):
+        """测试关闭写后缓冲时同步写入"""
+        self.report(10)
+        self.assertEqual(ReadingProgress.objects.get().progress, 10)
+
+
+class AsyncViewsTestCase(TestCase):
+    """异步只读接口测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        cache.clear()
+        self.client = APIClient()
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        category = Category.objects.create(name='历史', slug='history')
+        for i in range(25):
+            book = Book.objects.create(
+                title=f'测试书籍{i}', author='测试作者', genre='测试', heat=i,
+                cover='http://example.com/cover.jpg', description='简介', isbn=f'isbn{i}'
+            )
+            book.categories.add(category)
+            Comment.objects.create(user=user, book=book, content='好书')
+        self.book = book
+    
+    def assertSameAsSync(self, async_url, sync_url, **params):
+        async_response = self.client.get(async_url, params)
+        sync_response = self.client.get(sync_url, params)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        # 分页链接只有路径前缀不同
+        async_content = async_response.content.replace(b'/api/async/', b'/api/')
+        self.assertEqual(json.loads(async_content), json.loads(sync_response.content))
+    
+    def test_async_matches_sync(self):
+        """测试异步接口与同步接口返回一致"""
+        self.assertSameAsSync('/api/async/books/', '/api/books/')
+        self.assertSameAsSync('/api/async/books/', '/api/books/', page=2, category='history')
+        self.assertSameAsSync('/api/async/books/', '/api/books/', search='测试')
+        self.assertSameAsSync(f'/api/async/books/{self.book.id}/', f'/api/books/{self.book.id}/')
+        self.assertSameAsSync('/api/async/books/popular/', '/api/books/popular/')
+        self.assertSameAsSync('/api/async/books/recommended/', '/api/books/recommended/', is_premium='false')
+        self.assertSameAsSync('/api/async/comments/', '/api/comments/', book_id=self.book.id)
+    
+    def test_async_recommended_personalized(self):
+        """测试异步推荐接口按 Token 认证，登录用户返回与同步接口相同的个性化推荐"""
+        user = User.objects.get(username='testuser')
+        first = Book.objects.order_by('id').first()
+        BookShelf.objects.create(user=user, book=self.book)
+        BookNeighbors.objects.create(book=self.book, kind=BookNeighbors.COOCCURRENCE, neighbors=[[first.id, 0.9]])
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertSameAsSync('/api/async/books/recommended/', '/api/books/recommended/')
+        response = self.client.get('/api/async/books/recommended/')
+        self.assertEqual(response.json()[0]['id'], first.id)
+        
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+        self.assertSameAsSync('/api/async/books/recommended/', '/api/books/recommended/')
+        self.assertEqual(self.client.get('/api/async/books/recommended/').status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_async_errors(self):
+        """测试异步接口的错误响应"""
+        self.assertEqual(self.client.get('/api/async/books/0/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/async/books/', {'page': 9}).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class FastPathSerializerTestCase(TestCase):
+    """快速序列化路径测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        category = Category.objects.create(name='历史', slug='history', description='历史类')
+        self.book = Book.objects.create(
+            title='测试书籍', author='测试作者', rating=4.5, reviews=3, genre='测试', heat=10,
+            reading='1.2万', cover='http://example.com/cover.jpg', description='简介\u2028换行',
+            is_premium=True, publisher='测试出版社', pages=300, isbn='123'
+        )
+        self.book.categories.add(category)
+        # 没有出版日期和 ISBN 的书籍
+        Book.objects.create(title='无日期', author='作者', genre='测试', cover='http://example.com/c.jpg', description='')
+        Comment.objects.create(user=self.user, book=self.book, content='好书', rating=4)
+        BookShelf.objects.create(user=self.user, book=self.book)
+        ReadingProgress.objects.create(user=self.user, book=self.book, progress=42)
+    
+    def test_output_matches_serializers(self):
+        """测试快速路径与 DRF 序列化器渲染结果逐字节一致"""
+        renderer = JSONRenderer()
+        cases = [
+            (Book.objects.prefetch_related('categories'), BookSerializer),
+            (Category.objects.all(), CategorySerializer),
+            (Comment.objects.select_related('user'), CommentSerializer),
+            (BookShelf.objects.all(), BookShelfSerializer),
+            (ReadingProgress.objects.all(), ReadingProgressSerializer),
+        ]
+        for queryset, serializer_class in cases:
+            instances = list(queryset)
+            self.assertEqual(
+                renderer.render(serialize(instances, serializer_class)),
+                renderer.render(serializer_class(instances, many=True).data),
+            )
+    
+    def test_api_uses_serializer_format(self):
+        """测试接口输出格式不变"""
+        client = APIClient()
+        response = client.get(f'/api/books/{self.book.id}/')
+        self.book.refresh_from_db()
+        self.assertEqual(response.data, BookSerializer(self.book).data)
+        response = client.get('/api/comments/')
+        comment = Comment.objects.get()
+        self.assertEqual(response.data['results'], [CommentSerializer(comment).data])
+
+
+class ConditionalRequestTestCase(TestCase):
+    """条件请求测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.category = Category.objects.create(name='历史', slug='history')
+        self.book = Book.objects.create(
+            title='测试书籍', author='测试作者', genre='测试', cover='http://example.com/cover.jpg',
+            description='简介', isbn='123'
+        )
+        self.comment = Comment.objects.create(user=self.user, book=self.book, content='好书')
+    
+    def assertNotModified(self, url, response, expected=True):
+        revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        expected_status = status.HTTP_304_NOT_MODIFIED if expected else status.HTTP_200_OK
+        self.assertEqual(revalidated.status_code, expected_status)
+    
+    def test_validators_and_not_modified(self):
+        """测试返回校验值，未变化时返回 304，只取本页各行的主键等字段（及分页总数），不取整行、不做全集聚合"""
+        self.book.categories.add(self.category)
+        expected_queries = {
+            '/api/books/': 3,  # COUNT、本页书籍的校验字段、本页书籍所属分类的聚合
+            f'/api/books/{self.book.id}/': 2,
+            '/api/categories/': 2,
+            '/api/comments/': 2,
+            '/api/books/?cursor=': 2,
+            '/api/comments/?cursor=': 1,
+        }
+        for url, expected in expected_queries.items():
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn('ETag', response)
+            self.assertIn('Last-Modified', response)
+            # 不经过响应缓存，只看条件请求本身的查询
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.assertNotModified(url, response)
+            self.assertEqual(len(queries), expected, url)
+            self.assertFalse([query for query in queries if 'SUM(' in query['sql'] or '"content"' in query['sql']])
+            if url in ('/api/books/', '/api/books/?cursor='):
+                self.assertFalse([query for query in queries if '"description"' in query['sql']])
+            modified_since = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(modified_since.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_validators_change_with_data(self):
+        """测试数据变化后校验值随之变化"""
+        books = self.client.get('/api/books/')
+        self.book.categories.add(self.category)
+        self.assertNotModified('/api/books/', books, expected=False)
+        
+        books = self.client.get('/api/books/')
+        self.category.name = '世界历史'
+        self.category.save()
+        self.assertNotModified('/api/books/', books, expected=False)
+        
+        comments = self.client.get('/api/comments/')
+        other = User.objects.create_user(username='other', password='testpass123')
+        self.client.force_authenticate(user=other)
+        self.client.post(f'/api/comments/{self.comment.id}/like/')
+        comment_votes.flush()
+        self.assertNotModified('/api/comments/', comments, expected=False)
+        
+        comments = self.client.get('/api/comments/')
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertNotModified('/api/comments/', comments, expected=False)
+        
+        comments = self.client.get('/api/comments/')
+        detail = self.client.get(f'/api/books/{self.book.id}/')
+        Comment.objects.create(user=other, book=self.book, content='一般', rating=3)
+        self.assertNotModified('/api/comments/', comments, expected=False)
+        # 评分聚合变化同样反映在书籍详情上
+        self.assertNotModified(f'/api/books/{self.book.id}/', detail, expected=False)
+        
+        # 删除行会改变本页内容
+        comments = self.client.get('/api/comments/?cursor=')
+        Comment.objects.filter(pk=self.comment.pk).delete()
+        self.assertNotModified('/api/comments/?cursor=', comments, expected=False)
+
+
+class ResponseCacheTestCase(TestCase):
+    """响应缓存测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name='历史', slug='history')
+        self.book = Book.objects.create(
+            title='测试书籍', author='测试作者', genre='测试', cover='http://example.com/cover.jpg',
+            description='简介', isbn='123'
+        )
+        self.book.categories.add(self.category)
+        self.url = f'/api/books/{self.book.id}/'
+    
+    def assertCached(self, url):
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(len(queries), 0)
+        return response
+    
+    def test_cache_hit_and_stats(self):
+        """测试第二次请求不访问数据库，并记录命中率"""
+        response = self.assertCached(self.url)
+        self.assertEqual(response.data['title'], '测试书籍')
+        self.assertCached('/api/categories/')
+        self.assertCached('/api/categories/history/')
+        # 命中时同样支持条件请求
+        revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        stats = response_cache.stats()
+        self.assertEqual(stats['book'], {'hits': 2, 'misses': 1, 'hitRatio': 0.6667})
+        out = StringIO()
+        call_command('cache_stats', '--reset', stdout=out)
+        self.assertIn('命中率', out.getvalue())
+        self.assertEqual(response_cache.stats()['book']['hits'], 0)
+    
+    def test_invalidation(self):
+        """测试书籍、分类、关联和评分变化后缓存失效"""
+        self.assertCached(self.url)
+        self.book.title = '新书名'
+        self.book.save()
+        self.assertEqual(self.client.get(self.url).data['title'], '新书名')
+        
+        self.assertCached(self.url)
+        self.assertCached('/api/categories/history/')
+        self.category.name = '世界历史'
+        self.category.save()
+        self.assertEqual(self.client.get(self.url).data['categories'][0]['name'], '世界历史')
+        self.assertEqual(self.client.get('/api/categories/history/').data['name'], '世界历史')
+        
+        self.assertCached(self.url)
+        self.book.categories.clear()
+        self.assertEqual(self.client.get(self.url).data['categories'], [])
+        
+        self.assertCached(self.url)
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        Comment.objects.create(user=user, book=self.book, content='好书', rating=4)
+        self.assertEqual(self.client.get(self.url).data['reviews'], 1)
+
+
+class CategoryIndexTestCase(TestCase):
+    """书籍分类键测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        cache.clear()
+        self.client = APIClient()
+        self.history = Category.objects.create(name='历史', slug='history')
+        self.science = Category.objects.create(name='科学', slug='science')
+        self.book = Book.objects.create(
+            title='测试书籍', author='测试作者', genre='history', cover='http://example.com/cover.jpg',
+            description='简介', isbn='123'
+        )
+        # 类型和分类都匹配 history，也只应出现一次
+        self.book.categories.add(self.history, self.science)
+    
+    def keys(self):
+        return set(BookCategoryIndex.objects.filter(book=self.book).values_list('key', flat=True))
+    
+    def titles(self, category):
+        response = self.client.get('/api/books/', {'category': category})
+        return [book['title'] for book in response.data['results']]
+    
+    def test_filter_without_distinct(self):
+        """测试按分类筛选不联多对多表也不去重"""
+        self.assertEqual(self.titles('history'), ['测试书籍'])
+        self.assertEqual(self.titles('science'), ['测试书籍'])
+        self.assertEqual(self.titles('fiction'), [])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/books/', {'category': 'history'})
+        sql = ' '.join(query['sql'] for query in queries).upper()
+        self.assertNotIn('DISTINCT', sql)
+    
+    def test_keys_follow_changes(self):
+        """测试类型、分类关联和分类 slug 变化后分类键同步更新"""
+        self.assertEqual(self.keys(), {'history', 'science'})
+        self.book.genre = '小说'
+        self.book.save()
+        self.assertEqual(self.keys(), {'小说', 'history', 'science'})
+        
+        self.book.categories.remove(self.history)
+        self.assertEqual(self.keys(), {'小说', 'science'})
+        self.science.books.clear()
+        self.assertEqual(self.keys(), {'小说'})
+        
+        self.history.books.add(self.book)
+        self.history.slug = 'world-history'
+        self.history.save()
+        self.assertEqual(self.keys(), {'小说', 'world-history'})
+        self.history.delete()
+        self.assertEqual(self.keys(), {'小说'})
+        
+        BookCategoryIndex.objects.all().delete()
+        call_command('rebuild_category_index', stdout=StringIO())
+        self.assertEqual(self.keys(), {'小说'})
+
+
+class MetricsMiddlewareTestCase(TestCase):
+    """请求性能指标测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        cache.clear()
+        metrics.clear_metrics()
+        self.client = APIClient()
+        Book.objects.create(
+            title='测试书籍', author='测试作者', genre='测试', cover='http://example.com/cover.jpg',
+            description='简介', isbn='123'
+        )
+    
+    def test_metrics_endpoint(self):
+        """测试按路由记录指标并以 Prometheus 格式输出（仅管理员）"""
+        self.client.get('/api/books/')
+        self.client.get('/api/books/')
+        self.assertEqual(self.client.get('/api/metrics').status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        admin = User.objects.create_superuser(username='admin', password='testpass123')
+        self.client.force_authenticate(user=admin)
+        response = self.client.get('/api/metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('# TYPE bookhub_request_db_queries histogram', body)
+        self.assertIn('bookhub_request_duration_seconds_count{method="GET",route="book-list"} 2', body)
+        self.assertIn('bookhub_request_render_duration_seconds_count{method="GET",route="book-list"} 2', body)
+        self.assertIn('bookhub_request_view_python_seconds_count{method="GET",route="book-list"} 2', body)
+    
+    @override_settings(PERFORMANCE_BUDGETS={'book-list': {'queries': 1}})
+    def test_budget_logs_offending_sql(self):
+        """测试超出预算时记录 SQL"""
+        with self.assertLogs('bookhub.performance', level='WARNING') as logs:
+            self.client.get('/api/books/')
+        self.assertIn('book-list', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+        
+        with self.assertNoLogs('bookhub.performance', level='WARNING'):
+            self.client.get('/api/categories/')
+
+
+@override_settings(REPLICA_DATABASES=['replica1', 'replica2'], REPLICA_PIN_SECONDS=5)
+class ReplicaRouterTestCase(TestCase):
+    """读写分离路由测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        cache.clear()
+        self.factory = RequestFactory()
+        self.router = db_router.ReplicaRouter()
+    
+    def route(self, method, write=False, **headers):
+        """经过中间件处理一个请求，返回请求内读查询的目标库"""
+        targets = []
+        
+        def view(request):
+            if write:
+                self.router.db_for_write(ReadingProgress)
+            targets.append(self.router.db_for_read(Book))
+            return HttpResponse()
+        
+        request = getattr(self.factory, method)('/api/books/', **headers)
+        db_router.ReplicaMiddleware(view)(request)
+        return targets[0]
+    
+    def test_reads_outside_requests_use_primary(self):
+        """测试请求之外的读查询走主库"""
+        self.assertEqual(self.router.db_for_read(Book), 'default')
+        self.assertEqual(self.router.db_for_write(Book), 'default')
+        self.assertFalse(self.router.allow_migrate('replica1', 'books'))
+        self.assertIsNone(self.router.allow_migrate('default', 'books'))
+    
+    def test_safe_requests_use_replicas(self):
+        """测试安全方法读副本，非安全方法读主库"""
+        targets = {self.route('get') for _ in range(50)}
+        self.assertEqual(targets, {'replica1', 'replica2'})
+        self.assertEqual(self.route('post'), 'default')
+        # 请求内写入之后改读主库
+        self.assertEqual(self.route('get', write=True), 'default')
+    
+    def test_pin_after_write(self):
+        """测试写入后同一客户端在一段时间内读主库"""
+        self.route('post', HTTP_AUTHORIZATION='Token abc')
+        self.assertEqual(self.route('get', HTTP_AUTHORIZATION='Token abc'), 'default')
+        self.assertIn(self.route('get', HTTP_AUTHORIZATION='Token other'), ['replica1', 'replica2'])
+        
+        cache.clear()
+        self.assertIn(self.route('get', HTTP_AUTHORIZATION='Token abc'), ['replica1', 'replica2'])
+        # GET 请求内写库同样会固定到主库
+        self.route('get', write=True, HTTP_AUTHORIZATION='Token abc')
+        self.assertEqual(self.route('get', HTTP_AUTHORIZATION='Token abc'), 'default')
+    
+    def test_use_primary(self):
+        """测试 use_primary 块内的读查询走主库，块结束后恢复读副本"""
+        targets = []
+        
+        def view(request):
+            with db_router.use_primary():
+                targets.append(self.router.db_for_read(Book))
+            targets.append(self.router.db_for_read(Book))
+            return HttpResponse()
+        
+        db_router.ReplicaMiddleware(view)(self.factory.get('/api/books/'))
+        self.assertEqual(targets[0], 'default')
+        self.assertIn(targets[1], ['replica1', 'replica2'])
+    
+    def test_cache_rebuilt_from_primary(self):
+        """测试响应缓存和书单缓存未命中时从主库重建（副本别名不存在，读到副本会报错）"""
+        book = Book.objects.create(
+            title='测试书籍', author='测试作者', genre='测试', cover='http://example.com/cover.jpg',
+            description='简介'
+        )
+        client = APIClient()
+        for url in [f'/api/books/{book.id}/', '/api/books/popular/', '/api/books/recommended/?category=测试']:
+            response = client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+        self.assertIsNotNone(cache.get(feeds._feed_key('popular', None, None)))
+    
+    @override_settings(REPLICA_DATABASES=[])
+    def test_no_replicas(self):
+        """测试未配置副本时全部走主库"""
+        self.assertEqual(self.route('get'), 'default')
+
+
+class FakeConnection:
+    """测试用的原始连接"""
+    
+    def __init__(self):
+        self.closed = False
+        self.broken = False
+        self.pings = 0
+        self.rollbacks = 0
+    
+    def ping(self):
+        self.pings += 1
+        if self.broken:
+            raise OSError('连接已断开')
+    
+    def rollback(self):
+        self.rollbacks += 1
+        if self.broken:
+            raise OSError('连接已断开')
+    
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTestCase(TestCase):
+    """数据库连接池测试"""
+    
+    def make_pool(self, **options):
+        return ConnectionPool(FakeConnection, **options)
+    
+    def test_reuse(self):
+        """测试归还的连接被复用"""
+        pool = self.make_pool(size=2)
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual(pool.stats()['created'], 1)
+        self.assertEqual(pool.stats()['reused'], 1)
+    
+    def test_overflow_when_exhausted(self):
+        """测试池满时等待超时后使用临时连接，归还时关闭"""
+        pool = self.make_pool(size=1, timeout=0.01)
+        first = pool.acquire()
+        overflow = pool.acquire()
+        self.assertIsNot(overflow, first)
+        pool.release(overflow)
+        self.assertTrue(overflow.closed)
+        pool.release(first)
+        self.assertFalse(first.closed)
+        self.assertEqual(pool.stats(), {
+            'size': 1, 'idle': 1, 'checkedOut': 0, 'created': 1,
+            'reused': 0, 'overflowed': 1, 'discarded': 0,
+        })
+    
+    def test_health_checks(self):
+        """测试空闲过久的连接先 ping，失效或超龄的连接被替换"""
+        pool = self.make_pool(size=1, ping_after=0, recycle=None)
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual(first.pings, 1)
+        pool.release(first)
+        
+        first.broken = True
+        second = pool.acquire()
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        
+        # 回滚失败的连接不放回池中
+        second.broken = True
+        pool.release(second)
+        self.assertTrue(second.closed)
+        self.assertEqual(pool.stats()['idle'], 0)
+        
+        pool = self.make_pool(size=1, ping_after=None, recycle=0)
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIsNot(pool.acquire(), first)
+    
+    def test_inherited_connections_dropped_after_fork(self):
+        """测试 fork 出的子进程归还继承来的连接时既不回滚也不关闭，也不再复用"""
+        pool = self.make_pool(size=2)
+        idle, borrowed = pool.acquire(), pool.acquire()
+        pool.release(idle)
+        rollbacks = idle.rollbacks
+        with mock.patch('os.getpid', return_value=os.getpid() + 1):
+            pool.release(borrowed)
+            self.assertEqual(borrowed.rollbacks, 0)
+            self.assertFalse(borrowed.closed)
+            fresh = pool.acquire()
+            self.assertNotIn(fresh, (idle, borrowed))
+        self.assertEqual(idle.rollbacks, rollbacks)
+        self.assertFalse(idle.closed)
+
+
+class HeatEngineTestCase(TestCase):
+    """书籍热度引擎测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        heat.heat_buffer.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.book = Book.objects.create(
+            title='测试书籍', author='测试作者', genre='测试', cover='http://example.com/cover.jpg',
+            description='简介', heat=100
+        )
+    
+    def tearDown(self):
+        heat.heat_buffer.clear()
+    
+    @override_settings(HEAT_WEIGHTS={'view': 1, 'shelf': 5, 'progress': 0.2, 'comment': 10})
+    def test_events_only_counted_in_memory(self):
+        """测试浏览、加入书架、评论只累加内存计数，不写书籍表"""
+        self.client.force_authenticate(user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f'/api/books/{self.book.id}/')
+            self.client.get(f'/api/books/{self.book.id}/')
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE')])
+        self.client.post('/api/bookshelf/', {'book_id': self.book.id}, format='json')
+        self.client.post('/api/comments/', {'book': self.book.id, 'content': '好书', 'rating': 5})
+        heat.record(self.book.id, 'progress')
+        self.assertAlmostEqual(heat.heat_buffer.get(self.book.id), 2 + 5 + 10 + 0.2)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.heat, 100)
+    
+    @override_settings(HEAT_HALF_LIFE_HOURS=10)
+    def test_flush_applies_decay(self):
+        """测试写回时先按半衰期衰减再累加"""
+        earlier = timezone.now() - timedelta(hours=10)
+        Book.objects.filter(pk=self.book.pk).update(heat_score=100, heat_updated_at=earlier)
+        heat.heat_buffer.add(self.book.id, 7)
+        heat.heat_buffer.flush()
+        self.book.refresh_from_db()
+        self.assertAlmostEqual(self.book.heat_score, 57, places=2)
+        self.assertEqual(self.book.heat, 57)
+    
+    def test_flush_keeps_validators_when_heat_unchanged(self):
+        """测试热度取整后不变时不推后 updated_at，也不清除详情缓存"""
+        version = response_cache.get_version(f'book:{self.book.id}')
+        heat.heat_buffer.add(self.book.id, 0.2)
+        heat.heat_buffer.flush()
+        book = Book.objects.get(pk=self.book.pk)
+        self.assertAlmostEqual(book.heat_score, 100.2, places=2)
+        self.assertEqual(book.heat, 100)
+        self.assertEqual(book.updated_at, self.book.updated_at)
+        self.assertEqual(response_cache.get_version(f'book:{self.book.id}'), version)
+        
+        heat.heat_buffer.add(self.book.id, 1)
+        heat.heat_buffer.flush()
+        book.refresh_from_db()
+        self.assertEqual(book.heat, 101)
+        self.assertGreater(book.updated_at, self.book.updated_at)
+        self.assertNotEqual(response_cache.get_version(f'book:{self.book.id}'), version)
+    
+    @override_settings(HEAT_HALF_LIFE_HOURS=10)
+    def test_decay_all(self):
+        """测试没有新行为的书籍热度随时间下降"""
+        idle = Book.objects.create(
+            title='冷门书籍', author='测试作者', genre='测试', cover='http://example.com/cover.jpg',
+            description='简介', heat=0
+        )
+        earlier = timezone.now() - timedelta(hours=20)
+        Book.objects.filter(pk=self.book.pk).update(heat_score=100, heat_updated_at=earlier)
+        call_command('decay_heat', stdout=StringIO())
+        self.book.refresh_from_db()
+        idle.refresh_from_db()
+        self.assertEqual(self.book.heat, 25)
+        self.assertEqual(idle.heat, 0)
+        self.assertIsNotNone(idle.heat_updated_at)
+
+
+class ReaderCountTestCase(TestCase):
+    """独立读者数测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        readers.readers_buffer.clear()
+        self.book = Book.objects.create(
+            title='测试书籍', author='测试作者', genre='测试', cover='http://example.com/cover.jpg',
+            description='简介', reading='1.2万'
+        )
+        self.users = [
+            User.objects.create_user(username=f'reader{i}', password='testpass123') for i in range(3)
+        ]
+    
+    def tearDown(self):
+        readers.readers_buffer.clear()
+        progress_buffer.clear()
+    
+    def test_legacy_reading_string(self):
+        """测试旧的 reading 字符串解析为数字，输出时再格式化"""
+        self.assertEqual((self.book.readers, self.book.readers_base), (12000, 12000))
+        response = APIClient().get(f'/api/books/{self.book.id}/')
+        self.assertEqual(response.data['readers'], 12000)
+        self.assertEqual(response.data['reading'], '1.2万')
+        self.assertEqual(Book(readers=999).reading, '999')
+        self.assertEqual(Book(readers=123456789).reading, '1.2亿')
+    
+    def test_hyperloglog_estimate(self):
+        """测试草图估计误差与合并"""
+        first, second = HyperLogLog(), HyperLogLog()
+        first.update(range(20000))
+        second.update(range(10000, 30000))
+        self.assertAlmostEqual(first.count(), 20000, delta=20000 * 0.1)
+        self.assertAlmostEqual(first.merge(second).count(), 30000, delta=30000 * 0.1)
+        self.assertEqual(len(bytes(first)), 1024)
+    
+    def test_unique_readers_from_activity(self):
+        """测试同一用户多次上报只计一次，阅读人数在历史基数上累加"""
+        client = APIClient()
+        for user in self.users:
+            client.force_authenticate(user=user)
+            for progress in (10, 20):
+                client.post('/api/reading-progress/', {'book_id': self.book.id, 'progress': progress}, format='json')
+        client.force_authenticate(user=self.users[0])
+        client.post('/api/bookshelf/', {'book_id': self.book.id}, format='json')
+        self.assertFalse(ReaderSketch.objects.exists())
+        
+        readers.readers_buffer.flush()
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.readers, 12003)
+        self.assertEqual(readers.unique_readers(self.book.id), 3)
+        self.assertEqual(readers.unique_readers(self.book.id, days=7), 3)
+        self.assertEqual(ReaderSketch.objects.filter(book=self.book).count(), 2)
+        
+        # 重建得到相同结果
+        call_command('rebuild_readers', stdout=StringIO())
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.readers, 12003)
+    
+    def test_pending_readers_kept_as_sketch(self):
+        """测试缓冲中按天保存草图，内存不随读者人数增长，记录时不在请求线程落库"""
+        with CaptureQueriesContext(connection) as queries:
+            for user_id in range(5000):
+                readers.record(self.book.id, user_id)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(len(readers.readers_buffer), 1)
+        pending = readers.readers_buffer.get((self.book.id, timezone.localdate().isoformat()))
+        self.assertEqual(len(bytes(pending)), 1024)
+        readers.readers_buffer.flush()
+        self.assertAlmostEqual(readers.unique_readers(self.book.id), 5000, delta=5000 * 0.1)
+    
+    def test_sketch_updated_at_follows_merge(self):
+        """测试并入新读者后草图的更新时间随之更新"""
+        readers.record(self.book.id, self.users[0].id)
+        readers.readers_buffer.flush()
+        earlier = timezone.now() - timedelta(days=1)
+        ReaderSketch.objects.update(updated_at=earlier)
+        readers.record(self.book.id, self.users[1].id)
+        readers.readers_buffer.flush()
+        for sketch in ReaderSketch.objects.filter(book=self.book):
+            self.assertGreater(sketch.updated_at, earlier)
+
+
+class RecommendationTestCase(TestCase):
+    """个性化推荐测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        cache.clear()
+        self.client = APIClient()
+        self.books = {
+            name: Book.objects.create(
+                title=f'书籍{name}', author='测试作者', genre=genre, rating=rating,
+                cover='http://example.com/cover.jpg', description='简介'
+            )
+            for name, genre, rating in [
+                ('a', '历史', 4.0), ('b', '历史', 3.0), ('c', '文学', 2.0),
+                ('d', '科幻', 4.5), ('e', '文学', 5.0),
+            ]
+        }
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        readers = [User.objects.create_user(username=f'reader{i}') for i in range(3)]
+        for user, names in [(readers[0], 'ab'), (readers[2], 'bc'), (self.user, 'a')]:
+            for name in names:
+                BookShelf.objects.create(user=user, book=self.books[name])
+        for name in 'abc':
+            ReadingProgress.objects.create(user=readers[1], book=self.books[name], progress=10)
+        call_command('build_recommendations', chunk_size=2, stdout=StringIO())
+    
+    def ids(self, names):
+        return [self.books[name].id for name in names]
+    
+    def test_cooccurrence_neighbors(self):
+        """测试共同读者相似度（余弦）与排序"""
+        neighbors = BookNeighbors.objects.get(book=self.books['a'], kind=BookNeighbors.COOCCURRENCE).neighbors
+        self.assertEqual(neighbors, [[self.books['b'].id, 0.6667], [self.books['c'].id, 0.4082]])
+        self.assertFalse(BookNeighbors.objects.filter(book=self.books['d']).exists())
+    
+    def test_personalized_for_reader(self):
+        """测试有阅读记录的用户先推荐相似书籍，再用全站推荐补齐，不推荐已读过的书"""
+        self.client.force_authenticate(user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/books/recommended/')
+        self.assertEqual([book['id'] for book in response.data], self.ids('bced'))
+        self.assertLessEqual(len(queries), 10)
+        
+        response = self.client.get('/api/books/recommended/', {'category': '文学'})
+        self.assertEqual([book['id'] for book in response.data], self.ids('ce'))
+    
+    def test_interests_and_anonymous(self):
+        """测试没有阅读记录的用户按兴趣推荐，未登录用户使用全站推荐书单"""
+        response = self.client.get('/api/books/recommended/')
+        self.assertEqual([book['id'] for book in response.data], self.ids('edabc'))
+        
+        newcomer = User.objects.create_user(username='newcomer')
+        newcomer.profile.interests = ['历史']
+        newcomer.profile.save()
+        self.client.force_authenticate(user=newcomer)
+        response = self.client.get('/api/books/recommended/')
+        self.assertEqual([book['id'] for book in response.data], self.ids('abedc'))
+
+
+class SimilarBooksTestCase(TestCase):
+    """内容相似书籍测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.client = APIClient()
+        self.books = {
+            title: Book.objects.create(
+                title=title, author=author, genre=genre, description=description,
+                cover='http://example.com/cover.jpg'
+            )
+            for title, author, genre, description in [
+                ('三体', '刘慈欣', '科幻', '地球文明与三体文明的第一次接触，宇宙社会学与黑暗森林法则'),
+                ('球状闪电', '刘慈欣', '科幻', '一个关于球状闪电的故事，物理学与宏电子武器'),
+                ('人类简史', '尤瓦尔·赫拉利', '历史', '从认知革命到农业革命，重新解读人类发展史'),
+                ('明朝那些事儿', '当年明月', '历史', '用轻松的语言讲述明朝三百年的历史'),
+            ]
+        }
+    
+    def similar(self, title, **params):
+        response = self.client.get(f"/api/books/{self.books[title].id}/similar/", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book['title'] for book in response.data]
+    
+    def test_similar_books(self):
+        """测试按作者、类型与简介计算的相似书籍，未计算时退回同类型书籍"""
+        self.assertEqual(self.similar('三体'), ['球状闪电'])
+        call_command('build_similar_books', stdout=StringIO())
+        self.assertEqual(self.similar('三体')[0], '球状闪电')
+        self.assertEqual(self.similar('人类简史')[0], '明朝那些事儿')
+        self.assertEqual(len(self.similar('三体', limit=1)), 1)
+        response = self.client.get(f"/api/books/{self.books['三体'].id}/similar/", {'limit': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_incremental_refresh(self):
+        """测试增量刷新只重算内容变化的书籍，并更新其他书籍的书单"""
+        call_command('build_similar_books', stdout=StringIO())
+        out = StringIO()
+        call_command('build_similar_books', incremental=True, stdout=out)
+        self.assertIn('重新计算 0 本', out.getvalue())
+        
+        book = self.books['明朝那些事儿']
+        book.author, book.genre = '刘慈欣', '科幻'
+        book.description = '宇宙社会学与黑暗森林法则'
+        book.save()
+        out = StringIO()
+        call_command('build_similar_books', incremental=True, stdout=out)
+        self.assertIn('重新计算 1 本', out.getvalue())
+        self.assertEqual(self.similar('三体')[0], '明朝那些事儿')
+        self.assertNotIn('明朝那些事儿', self.similar('人类简史'))
+
+
+class SuggestTestCase(TestCase):
+    """搜索框自动补全测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.client = APIClient()
+        for title, author, heat in [
+            ('三体', '刘慈欣', 90), ('三国演义', '罗贯中', 95), ('球状闪电', '刘慈欣', 60),
+            ('JavaScript高级程序设计', '尼古拉斯·泽卡斯', 80),
+        ]:
+            Book.objects.create(
+                title=title, author=author, heat=heat, genre='测试',
+                cover='http://example.com/cover.jpg', description='简介'
+            )
+        suggest.build()
+    
+    def titles(self, query, **params):
+        response = self.client.get('/api/books/suggest/', {'q': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book['title'] for book in response.data]
+    
+    def test_prefix_match_ranked_by_heat(self):
+        """测试书名、作者、拼音前缀匹配并按热度排序"""
+        self.assertEqual(self.titles('三'), ['三国演义', '三体'])
+        self.assertEqual(self.titles('刘慈'), ['三体', '球状闪电'])
+        self.assertEqual(self.titles('java'), ['JavaScript高级程序设计'])
+        self.assertEqual(self.titles(' 三 体 '), ['三体'])
+        self.assertEqual(self.titles('三', limit=1), ['三国演义'])
+        self.assertEqual(self.titles(''), [])
+        if suggest.lazy_pinyin is not None:
+            self.assertEqual(self.titles('santi'), ['三体'])
+            self.assertEqual(self.titles('qzsd'), ['球状闪电'])
+        with CaptureQueriesContext(connection) as queries:
+            self.titles('三')
+        self.assertEqual(len(queries), 1)
+    
+    def test_heavy_prefixes_precomputed(self):
+        """测试覆盖大量键的前缀使用预先算好的结果"""
+        rows = [(i, i % 100, f'书{i}', '作者', '', '') for i in range(1, 3001)]
+        with mock.patch.object(suggest, 'SCAN_LIMIT', 100):
+            index = suggest.PrefixIndex(rows)
+        self.assertIn('书'.encode(), index.top)
+        self.assertEqual(index.lookup('书', limit=3), [99, 199, 299])
+        self.assertEqual(index.lookup('书29'), sorted(
+            [29, *range(290, 300), *range(2900, 3000)], key=lambda i: (-(i % 100), i)
+        )[:10])
+    
+    @override_settings(SUGGEST_CHECK_INTERVAL=0)
+    def test_changes_overlaid_without_rebuild(self):
+        """测试书籍增删改只更新叠加层，不全量重建；没有变更记录时在后台重建"""
+        with mock.patch.object(suggest, '_build_in_background') as rebuild:
+            suggest.get_index()
+            book = Book.objects.get(title='三体')
+            book.title = '三体II'
+            book.heat = 99
+            book.save()
+            Book.objects.filter(title='三国演义').delete()
+            Book.objects.create(
+                title='三生三世', author='唐七', heat=70, genre='测试',
+                cover='http://example.com/cover.jpg', description='简介'
+            )
+            Book.objects.filter(title='球状闪电').get().save(update_fields=['description'])
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.titles('三'), ['三体II', '三生三世'])
+            self.assertEqual(len(queries), 2)
+            self.assertEqual(self.titles('刘慈'), ['三体II', '球状闪电'])
+            self.assertEqual(self.titles('唐'), ['三生三世'])
+            self.assertEqual(len(suggest.get_index().overlay), 3)
+            rebuild.assert_not_called()
+            
+            suggest.invalidate()
+            suggest.get_index()
+            rebuild.assert_called_once()
+    
+    def test_pinyin_refreshed_on_partial_save(self):
+        """测试只保存书名时拼音随之更新，只保存其他字段时不重新计算"""
+        book = Book.objects.get(title='三体')
+        book.title = '球'
+        with mock.patch.object(suggest, 'pinyin_keys', return_value=('qiu', 'q')) as pinyin_keys:
+            book.save(update_fields=['title'])
+            book.save(update_fields=['heat'])
+        pinyin_keys.assert_called_once_with('球')
+        book.refresh_from_db()
+        self.assertEqual((book.title, book.title_pinyin, book.title_initials), ('球', 'qiu', 'q'))
@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import BookViewSet, CategoryViewSet, CommentViewSet, BookShelfViewSet, ReadingProgressViewSet
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'books', BookViewSet, basename='book')
@@ -11,4 +12,11 @@ router.register(r'reading-progress', ReadingProgressViewSet, basename='reading-p
 
 urlpatterns = [
     path('', include(router.urls)),
+    
+    # 异步只读接口（ASGI 部署时使用）
+    path('async/books/', async_views.book_list, name='async-book-list'),
+    path('async/books/recommended/', async_views.book_recommended, name='async-book-recommended'),
+    path('async/books/popular/', async_views.book_popular, name='async-book-popular'),
+    path('async/books/<int:pk>/', async_views.book_detail, name='async-book-detail'),
+    path('async/comments/', async_views.comment_list, name='async-comment-list'),
 ]
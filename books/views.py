@@ -1,97 +1,199 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
-from django.db.models import Q
-from .models import Book, Category, Comment, BookShelf, ReadingProgress
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticatedOrReadOnly, IsAuthenticated
+from django.db import transaction
+from django.db.models import Count, Max
+from .models import Book, Category, Comment, CommentVote, BookShelf, ReadingProgress
 from .serializers import (
-    BookSerializer, CategorySerializer, CommentSerializer,
+    BookSerializer, BookSuggestionSerializer, CategorySerializer, CommentSerializer,
     BookShelfSerializer, ReadingProgressSerializer
 )
+from . import feeds, heat, readers, recommend
+from .conditional import ConditionalMixin, rows_state
+from .response_cache import CachedResponseMixin
+from .fastpath import FastReadMixin, serialize
+from .counters import vote_comment
+from .pagination import BookPagination, CommentPagination
+from .progress import (
+    flush_user as flush_user_progress, overlay_pending as overlay_pending_progress,
+    pending_for_user as pending_progress, record_progress,
+)
+from .queries import filter_books, parse_is_premium, plan_queryset
+from .search import search_books
+from .suggest import suggest as suggest_books
 
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(CachedResponseMixin, ConditionalMixin, FastReadMixin, viewsets.ReadOnlyModelViewSet):
     """分类视图集"""
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     lookup_field = 'slug'
+    
+    def get_cache_scope(self, action, kwargs):
+        if action == 'list':
+            return 'categories'
+        return f"category:{kwargs['slug']}"
 
 
-class BookViewSet(viewsets.ReadOnlyModelViewSet):
+class BookViewSet(CachedResponseMixin, ConditionalMixin, FastReadMixin, viewsets.ReadOnlyModelViewSet):
     """书籍视图集"""
     queryset = Book.objects.all()
     serializer_class = BookSerializer
+    pagination_class = BookPagination
     
     def get_queryset(self):
-        queryset = Book.objects.all()
-        
-        # 按分类筛选
-        category = self.request.query_params.get('category', None)
-        if category:
-            queryset = queryset.filter(Q(genre=category) | Q(categories__slug=category))
+        params = self.request.query_params
+        queryset = filter_books(
+            Book.objects.all(),
+            category=params.get('category', None),
+            is_premium=parse_is_premium(params.get('is_premium', None)),
+        )
         
-        # 搜索
-        search = self.request.query_params.get('search', None)
+        # 搜索（走倒排索引，按相关度排序）
+        search = params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) | 
-                Q(author__icontains=search) |
-                Q(description__icontains=search)
-            )
-        
-        # 是否会员专享
-        is_premium = self.request.query_params.get('is_premium', None)
-        if is_premium is not None:
-            queryset = queryset.filter(is_premium=is_premium.lower() == 'true')
+            queryset = search_books(queryset, search)
         
-        return queryset.distinct()
+        return plan_queryset(queryset, self.get_serializer_class())
+    
+    def get_cache_scope(self, action, kwargs):
+        # 列表接口变化频繁、参数组合多，只缓存详情
+        if action == 'retrieve':
+            return f"book:{kwargs['pk']}"
+        return None
+    
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        # 命中缓存或返回 304 同样算一次浏览
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            heat.record(kwargs['pk'], 'view')
+        return response
+    
+    def get_conditional_states(self, rows):
+        states = super().get_conditional_states(rows)
+        # 书籍输出中嵌套了分类。详情的分类已随书籍预加载；
+        # 列表只取了书籍的主键等字段，分类关联变化会更新书籍的 updated_at，
+        # 这里只需一次聚合发现本页书籍所属分类的改名或删除
+        if self.action == 'retrieve':
+            categories = sorted({category for book in rows for category in book.categories.all()}, key=lambda c: c.pk)
+            return states + [rows_state(categories)]
+        book_ids = [row['pk'] for row in rows]
+        if not book_ids:
+            return states
+        return states + [
+            Category.objects.filter(books__in=book_ids)
+            .aggregate(memberships=Count('pk'), last_modified=Max('updated_at'))
+        ]
+    
+    def _feed(self, name):
+        params = self.request.query_params
+        # 搜索结果不缓存，直接查询
+        if params.get('search', None):
+            ordering = feeds.FEEDS[name]
+            books = self.get_queryset().order_by(*ordering)[:feeds.FEED_SIZE]
+            return Response(serialize(books, self.get_serializer_class()))
+        data = feeds.get_feed(
+            name,
+            category=params.get('category', None),
+            is_premium=parse_is_premium(params.get('is_premium', None)),
+        )
+        return Response(data)
     
     @action(detail=False, methods=['get'])
     def recommended(self, request):
-        """推荐书籍"""
-        books = self.get_queryset().order_by('-rating', '-heat')[:20]
-        serializer = self.get_serializer(books, many=True)
-        return Response(serializer.data)
+        """推荐书籍（登录用户按阅读记录个性化）"""
+        params = request.query_params
+        if request.user.is_authenticated and not params.get('search', None):
+            return Response(recommend.recommend(
+                request.user,
+                category=params.get('category', None),
+                is_premium=parse_is_premium(params.get('is_premium', None)),
+            ))
+        return self._feed('recommended')
+    
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """内容相似的书籍，limit 参数控制数量"""
+        try:
+            limit = int(request.query_params.get('limit', recommend.SIMILAR_SIZE))
+        except ValueError:
+            raise ValidationError({'limit': '必须是整数'})
+        limit = max(1, min(limit, recommend.MAX_SIMILAR_SIZE))
+        return Response(recommend.similar(self.get_object(), limit))
+    
+    @action(detail=False, methods=['get'])
+    def suggest(self, request):
+        """搜索框自动补全：书名、作者、书名拼音前缀匹配，按热度排序"""
+        query = request.query_params.get('q', '')
+        try:
+            limit = int(request.query_params.get('limit', 8))
+        except ValueError:
+            raise ValidationError({'limit': '必须是整数'})
+        book_ids = suggest_books(query, max(1, limit))
+        if not book_ids:
+            return Response([])
+        fields = BookSuggestionSerializer.Meta.fields
+        books = Book.objects.filter(pk__in=book_ids).only(*fields).in_bulk()
+        return Response(serialize([books[pk] for pk in book_ids if pk in books], BookSuggestionSerializer))
     
     @action(detail=False, methods=['get'])
     def popular(self, request):
         """热门书籍"""
-        books = self.get_queryset().order_by('-heat', '-reviews')[:20]
-        serializer = self.get_serializer(books, many=True)
-        return Response(serializer.data)
+        return self._feed('popular')
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ConditionalMixin, FastReadMixin, viewsets.ModelViewSet):
     """评论视图集"""
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
+    pagination_class = CommentPagination
     permission_classes = [IsAuthenticatedOrReadOnly]
+    # 点赞/点踩计数不更新 updated_at；用户名变化通过版本号体现
+    conditional_fields = ('likes', 'dislikes')
+    conditional_versions = ('usernames',)
     
     def get_queryset(self):
         queryset = Comment.objects.all()
         book_id = self.request.query_params.get('book_id', None)
         if book_id:
             queryset = queryset.filter(book_id=book_id)
-        return queryset
+        return plan_queryset(queryset, self.get_serializer_class())
     
+    # 评论与书籍评分聚合在同一个事务中更新
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        comment = serializer.save(user=self.request.user)
+        heat.record(comment.book_id, 'comment')
+    
+    @transaction.atomic
+    def perform_update(self, serializer):
+        serializer.save()
+    
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+    
+    def _vote(self, value, field):
+        comment = self.get_object()
+        count = vote_comment(comment, self.request.user, value)
+        if count is None:
+            return Response(
+                {'detail': '您已经评价过该评论'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({field: count})
     
     @action(detail=True, methods=['post'])
     def like(self, request, pk=None):
         """点赞评论"""
-        comment = self.get_object()
-        comment.likes += 1
-        comment.save()
-        return Response({'likes': comment.likes})
+        return self._vote(CommentVote.LIKE, 'likes')
     
     @action(detail=True, methods=['post'])
     def dislike(self, request, pk=None):
         """点踩评论"""
-        comment = self.get_object()
-        comment.dislikes += 1
-        comment.save()
-        return Response({'dislikes': comment.dislikes})
+        return self._vote(CommentVote.DISLIKE, 'dislikes')
 
 
 class BookShelfViewSet(viewsets.ModelViewSet):
@@ -100,7 +202,8 @@ class BookShelfViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return BookShelf.objects.filter(user=self.request.user)
+        queryset = BookShelf.objects.filter(user=self.request.user)
+        return plan_queryset(queryset, self.get_serializer_class())
     
     def perform_create(self, serializer):
         book_id = serializer.validated_data.get('book_id')
@@ -115,6 +218,8 @@ class BookShelfViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         serializer.save(user=self.request.user, book_id=book_id)
+        heat.record(book_id, 'shelf')
+        readers.record(book_id, self.request.user.pk)
     
     @action(detail=False, methods=['delete'])
     def remove_book(self, request):
@@ -145,19 +250,39 @@ class ReadingProgressViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return ReadingProgress.objects.filter(user=self.request.user)
+        queryset = ReadingProgress.objects.filter(user=self.request.user)
+        return plan_queryset(queryset, self.get_serializer_class())
+    
+    def get_object(self):
+        # 修改、删除前先写入该用户缓冲中的进度；读取时叠加尚未落库的最新进度
+        if self.request.method not in SAFE_METHODS:
+            flush_user_progress(self.request.user.pk)
+        instance = super().get_object()
+        pending = pending_progress(self.request.user.pk).get(instance.book_id)
+        if pending is not None:
+            instance.progress, instance.updated_at = pending
+        return instance
+    
+    def list(self, request, *args, **kwargs):
+        # 尚未落库的进度不写库，直接叠加在第一页最前面
+        pending, queryset = overlay_pending_progress(self.filter_queryset(self.get_queryset()), request.user.pk)
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(self.get_serializer(pending + list(queryset), many=True).data)
+        if self.paginator.page.number == 1:
+            page = pending + page
+        response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        response.data['count'] += len(pending)
+        return response
     
     def perform_create(self, serializer):
         book_id = serializer.validated_data.get('book_id')
         progress = serializer.validated_data.get('progress', 0)
         
-        # 更新或创建
-        obj, created = ReadingProgress.objects.update_or_create(
-            user=self.request.user,
-            book_id=book_id,
-            defaults={'progress': progress}
-        )
-        return Response(
-            ReadingProgressSerializer(obj).data,
-            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
-        )
+        if not Book.objects.filter(pk=book_id).exists():
+            raise ValidationError({'book_id': '书籍不存在'})
+        
+        # 更新或创建（开启写后缓冲时先写入内存，定期批量落库）
+        record_progress(self.request.user.pk, book_id, progress)
+        heat.record(book_id, 'progress')
+        readers.record(book_id, self.request.user.pk)
@@ -0,0 +1,92 @@
+"""
+BookHub 同步/异步接口压测脚本
+对比 WSGI 部署的同步接口与 ASGI 部署的异步接口在大量并发（慢）客户端下的表现
+
+用法示例：
+    gunicorn bookhub_backend.wsgi -w 1 --threads 8 -b :8000
+    uvicorn bookhub_backend.asgi:application --workers 1 --port 8001
+    python load_test.py --target wsgi=http://localhost:8000/api/books/ \
+                        --target asgi=http://localhost:8001/api/async/books/ \
+                        --concurrency 200 --requests 2000 --slow 0.5
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+async def fetch(url, slow):
+    """发送一次 GET 请求，slow 秒内分两次发送请求头以模拟慢客户端"""
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    start = time.perf_counter()
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n'.encode())
+        await writer.drain()
+        if slow:
+            await asyncio.sleep(slow)
+        writer.write(b'Connection: close\r\n\r\n')
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+        status = int(status_line.split()[1])
+    finally:
+        writer.close()
+    return status, time.perf_counter() - start
+
+
+async def run(url, concurrency, total, slow):
+    """以固定并发数发送 total 个请求"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            try:
+                status, latency = await fetch(url, slow)
+            except OSError:
+                errors += 1
+                return
+            if status == 200:
+                latencies.append(latency)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def report(name, latencies, errors, elapsed):
+    """打印压测结果"""
+    print(f"\n{'='*60}")
+    print(f"目标: {name}")
+    print(f"成功: {len(latencies)}  失败: {errors}  总耗时: {elapsed:.2f}s")
+    if latencies:
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"吞吐: {len(latencies) / elapsed:.1f} 请求/秒")
+        print(f"延迟: 中位数 {statistics.median(latencies) * 1000:.1f}ms  p95 {p95 * 1000:.1f}ms")
+    print('='*60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对比同步/异步接口的并发表现')
+    parser.add_argument('--target', action='append', required=True, help='名称=URL，可以指定多个')
+    parser.add_argument('--concurrency', type=int, default=100, help='并发连接数')
+    parser.add_argument('--requests', type=int, default=1000, help='每个目标的请求总数')
+    parser.add_argument('--slow', type=float, default=0.0, help='模拟慢客户端：请求头分两次发送的间隔秒数')
+    args = parser.parse_args()
+
+    for target in args.target:
+        name, _, url = target.partition('=')
+        latencies, errors, elapsed = asyncio.run(run(url, args.concurrency, args.requests, args.slow))
+        report(name, latencies, errors, elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+带缓存的 Token 认证
+
+TokenAuthentication 每个请求都要 Token + User 联表查询一次。这里先查进程内 LRU 缓存（带过期时间），
+再查可选的共享缓存（Django cache），都未命中时才访问数据库。
+登出（删除 Token）、用户修改或停用时通过信号清除对应缓存；
+其他进程的进程内缓存最多在 TOKEN_CACHE_TTL 秒后过期。
+
+缓存中只保存 Token 的创建时间和用户除密码外的字段值，每次命中都重新构造 Token 与 User，
+请求之间不共享同一个对象，也就不会共享其上的关联缓存（如 user.profile）或被某个请求改动的属性。
+密码字段为延迟加载，真正用到时才查询。
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class TokenCache:
+    """token key -> 缓存条目（见 CachedTokenAuthentication）的缓存"""
+
+    def __init__(self, max_size, ttl, shared=False, shared_ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared = shared
+        self.shared_ttl = shared_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.shared_hits = self.misses = 0
+
+    @staticmethod
+    def _shared_key(key):
+        # v2：条目由 Token 对象改为字段值，旧格式的共享缓存不再读取
+        return f'auth:token:v2:{key}'
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                token, expires = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return token
+                del self._entries[key]
+
+        if self.shared:
+            token = cache.get(self._shared_key(key))
+            if token is not None:
+                self._store(key, token)
+                self.shared_hits += 1
+                return token
+
+        self.misses += 1
+        return None
+
+    def set(self, key, token):
+        self._store(key, token)
+        if self.shared:
+            cache.set(self._shared_key(key), token, self.shared_ttl)
+
+    def _store(self, key, token):
+        with self._lock:
+            self._entries[key] = (token, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+        if self.shared and keys:
+            cache.delete_many([self._shared_key(key) for key in keys])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.shared_hits = self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'sharedHits': self.shared_hits,
+            'misses': self.misses,
+            'hitRatio': round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0,
+        }
+
+
+token_cache = TokenCache(
+    max_size=settings.TOKEN_CACHE_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL,
+    shared=settings.TOKEN_CACHE_SHARED,
+    shared_ttl=settings.TOKEN_CACHE_SHARED_TTL,
+)
+
+
+def _user_fields(model):
+    return [field.attname for field in model._meta.concrete_fields if field.attname != 'password']
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """先查缓存的 Token 认证"""
+
+    def authenticate_credentials(self, key):
+        entry = token_cache.get(key)
+        if entry is None:
+            user, token = super().authenticate_credentials(key)
+            fields = _user_fields(type(user))
+            token_cache.set(key, (token.created, [getattr(user, name) for name in fields]))
+            return (user, token)
+
+        created, values = entry
+        model = Token._meta.get_field('user').related_model
+        user = model.from_db(DEFAULT_DB_ALIAS, _user_fields(model), values)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('用户已停用或被删除')
+        return (user, Token(key=key, user=user, created=created))
@@ -1,7 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .authentication import token_cache
 
 
 class UserProfile(models.Model):
@@ -39,3 +41,16 @@ def save_user_profile(sender, instance, **kwargs):
     """保存用户时同时保存用户资料"""
     if hasattr(instance, 'profile'):
         instance.profile.save()
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Token 删除（登出）后清除认证缓存"""
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """用户修改或停用后清除其 Token 的认证缓存"""
+    if not created:
+        token_cache.invalidate(*Token.objects.filter(user=instance).values_list('key', flat=True))
@@ -1,5 +1,15 @@
+from datetime import timedelta
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework import status
+from books.models import Book, BookShelf, Comment, ReadingProgress
+from .authentication import CachedTokenAuthentication, token_cache
 from .models import UserProfile
 
 
@@ -25,3 +35,106 @@ class UserProfileTestCase(TestCase):
         self.assertFalse(profile.is_vip)
         self.assertEqual(profile.bio, '')
         self.assertEqual(profile.gender, '')
+
+
+class CachedTokenAuthenticationTestCase(TestCase):
+    """Token 认证缓存测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        token_cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+    
+    def token_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/user/stats')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [q['sql'] for q in context if 'authtoken_token' in q['sql']]
+    
+    def test_token_lookup_cached(self):
+        """测试第二次请求不再查询 Token"""
+        self.assertEqual(len(self.token_queries()), 1)
+        self.assertEqual(self.token_queries(), [])
+        self.assertEqual(token_cache.stats()['hits'], 1)
+    
+    def test_cache_hit_builds_fresh_user(self):
+        """测试缓存命中时每次构造新的用户对象，不共享关联缓存，也不缓存密码"""
+        authentication = CachedTokenAuthentication()
+        first, _ = authentication.authenticate_credentials(self.token.key)
+        first.profile
+        self.assertNotIn(self.user.password, str(token_cache.get(self.token.key)))
+        
+        second, token = authentication.authenticate_credentials(self.token.key)
+        third, _ = authentication.authenticate_credentials(self.token.key)
+        self.assertIsNot(second, third)
+        self.assertEqual((second.pk, token.key, token.user), (self.user.pk, self.token.key, second))
+        with self.assertNumQueries(1):
+            second.profile
+        second.first_name = '改名'
+        self.assertEqual(third.first_name, '')
+        
+        # 保存时只写入已加载的字段，不会清空密码
+        second.save()
+        self.assertTrue(User.objects.get(pk=self.user.pk).check_password('testpass123'))
+    
+    def test_logout_invalidates_cache(self):
+        """测试登出后缓存失效"""
+        self.token_queries()
+        response = self.client.post('/api/logout')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get('/api/user/stats')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_deactivation_invalidates_cache(self):
+        """测试停用用户后缓存失效"""
+        self.token_queries()
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/user/stats')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class UserStatsTestCase(TestCase):
+    """用户统计测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        books = [
+            Book.objects.create(
+                title=f'测试书籍{i}', author='测试作者', genre='测试',
+                cover='http://example.com/cover.jpg', description='简介'
+            )
+            for i in range(3)
+        ]
+        BookShelf.objects.create(user=self.user, book=books[0])
+        ReadingProgress.objects.create(user=self.user, book=books[0], progress=80)
+        ReadingProgress.objects.create(user=self.user, book=books[1], progress=20)
+        old = ReadingProgress.objects.create(user=self.user, book=books[2], progress=100)
+        ReadingProgress.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timedelta(days=40))
+        Comment.objects.create(user=self.user, book=books[0], content='好书', rating=5)
+        Comment.objects.create(user=self.user, book=books[1], content='一般', rating=2)
+    
+    def test_stats_single_query(self):
+        """测试统计接口只执行一条查询"""
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/user/stats')
+        self.assertEqual(response.data, {
+            'total': 3,
+            'thisMonth': 1,
+            'avgRating': 3.5,
+            'bookshelfCount': 1,
+            'commentsCount': 2,
+        })
+    
+    def test_stats_empty(self):
+        """测试没有任何记录时的统计"""
+        self.client.force_authenticate(user=User.objects.create_user(username='newuser'))
+        response = self.client.get('/api/user/stats')
+        self.assertEqual(response.data['avgRating'], 0)
+        self.assertEqual(response.data['total'], 0)
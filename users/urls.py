@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import (
-    login_view, register_view, logout_view,
+    login_view, register_view, logout_view, token_cache_stats_view,
     profile_view, update_profile_view, user_stats_view,
     my_shelf_view, my_reading_view, my_comments_view
 )
@@ -10,6 +10,7 @@ urlpatterns = [
     path('login', login_view, name='login'),
     path('register', register_view, name='register'),
     path('logout', logout_view, name='logout'),
+    path('auth/token-cache', token_cache_stats_view, name='token-cache-stats'),
     
     # 用户资料
     path('profile', profile_view, name='profile'),
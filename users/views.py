@@ -1,10 +1,14 @@
 from rest_framework import status, generics
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
+from django.db.models import Avg, Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .authentication import token_cache
 from .models import UserProfile
 from .serializers import (
     UserSerializer, LoginSerializer, RegisterSerializer,
@@ -12,6 +16,9 @@ from .serializers import (
 )
 from books.models import BookShelf, ReadingProgress, Comment
 from books.serializers import BookShelfSerializer, ReadingProgressSerializer, CommentSerializer
+from books.progress import overlay_pending as overlay_pending_progress, pending_for_user as pending_progress
+from books.queries import plan_queryset
+from books.streaming import stream_json_list
 
 
 @api_view(['POST'])
@@ -71,6 +78,13 @@ def logout_view(request):
     return Response({'detail': '登出成功'})
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def token_cache_stats_view(request):
+    """Token 认证缓存命中统计（本进程）"""
+    return Response(token_cache.stats())
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def profile_view(request):
@@ -93,37 +107,42 @@ def update_profile_view(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _user_subquery(queryset, aggregate):
+    """按当前用户聚合的标量子查询"""
+    return Subquery(
+        queryset.filter(user=OuterRef('pk')).order_by()
+        .values('user').annotate(value=aggregate).values('value')
+    )
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_stats_view(request):
     """获取用户统计信息"""
-    user = request.user
-    
-    # 书架统计
-    bookshelf_count = BookShelf.objects.filter(user=user).count()
+    month_start = timezone.localtime().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    # 尚未落库的进度不在库中统计，单独计入
+    pending = pending_progress(request.user.pk)
+    progress = ReadingProgress.objects.exclude(book_id__in=list(pending))
     
-    # 阅读进度统计
-    reading_progress = ReadingProgress.objects.filter(user=user)
-    total_books = reading_progress.count()
-    
-    # 计算本月阅读数（简化版，实际应该按月份统计）
-    this_month = reading_progress.filter(progress__gte=50).count()
-    
-    # 评论统计
-    comments_count = Comment.objects.filter(user=user).count()
-    
-    # 平均评分
-    avg_rating = 0
-    if comments_count > 0:
-        ratings = Comment.objects.filter(user=user).values_list('rating', flat=True)
-        avg_rating = round(sum(ratings) / len(ratings), 1)
+    # 书架、阅读进度、评论统计合并为一条查询，评分均值在数据库中计算
+    stats = User.objects.filter(pk=request.user.pk).annotate(
+        bookshelf_count=Coalesce(_user_subquery(BookShelf.objects.all(), Count('pk')), 0),
+        total=Coalesce(_user_subquery(progress, Count('pk')), 0),
+        # 本月阅读数：本月有进度更新且进度过半的书籍
+        this_month=Coalesce(_user_subquery(
+            progress.filter(progress__gte=50, updated_at__gte=month_start),
+            Count('pk')
+        ), 0),
+        comments_count=Coalesce(_user_subquery(Comment.objects.all(), Count('pk')), 0),
+        avg_rating=_user_subquery(Comment.objects.all(), Avg('rating')),
+    ).values('bookshelf_count', 'total', 'this_month', 'comments_count', 'avg_rating').get()
     
     return Response({
-        'total': total_books,
-        'thisMonth': this_month,
-        'avgRating': avg_rating,
-        'bookshelfCount': bookshelf_count,
-        'commentsCount': comments_count
+        'total': stats['total'] + len(pending),
+        'thisMonth': stats['this_month'] + sum(value >= 50 for value, _ in pending.values()),
+        'avgRating': round(stats['avg_rating'], 1) if stats['avg_rating'] is not None else 0,
+        'bookshelfCount': stats['bookshelf_count'],
+        'commentsCount': stats['comments_count']
     })
 
 
@@ -131,24 +150,25 @@ def user_stats_view(request):
 @permission_classes([IsAuthenticated])
 def my_shelf_view(request):
     """获取我的书架"""
-    bookshelf = BookShelf.objects.filter(user=request.user)
-    serializer = BookShelfSerializer(bookshelf, many=True)
-    return Response(serializer.data)
+    bookshelf = plan_queryset(BookShelf.objects.filter(user=request.user), BookShelfSerializer)
+    return stream_json_list(bookshelf, BookShelfSerializer, ordering=('-added_at', '-id'), request=request)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def my_reading_view(request):
     """获取我的阅读进度"""
-    reading = ReadingProgress.objects.filter(user=request.user)
-    serializer = ReadingProgressSerializer(reading, many=True)
-    return Response(serializer.data)
+    reading = plan_queryset(ReadingProgress.objects.filter(user=request.user), ReadingProgressSerializer)
+    pending, reading = overlay_pending_progress(reading, request.user.pk)
+    return stream_json_list(
+        reading, ReadingProgressSerializer, ordering=('-updated_at', '-id'), leading=pending,
+        request=request,
+    )
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def my_comments_view(request):
     """获取我的评论"""
-    comments = Comment.objects.filter(user=request.user)
-    serializer = CommentSerializer(comments, many=True)
-    return Response(serializer.data)
+    comments = plan_queryset(Comment.objects.filter(user=request.user), CommentSerializer)
+    return stream_json_list(comments, CommentSerializer, ordering=('-created_at', '-id'), request=request)